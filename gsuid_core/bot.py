@@ -1,13 +1,28 @@
+import time
 import asyncio
 import inspect
-from typing import Dict, List, Union, Literal, Optional
+from itertools import count
+from collections import deque
+from contextvars import ContextVar
+from contextlib import asynccontextmanager
+from typing import (
+    Any,
+    Set,
+    Dict,
+    List,
+    Deque,
+    Union,
+    Literal,
+    Optional,
+    Coroutine,
+)
 
 from fastapi import WebSocket
-from msgspec import json as msgjson
 
 from gsuid_core.logger import logger
 from gsuid_core.gs_logger import GsLogger
-from gsuid_core.global_val import get_global_val
+from gsuid_core.global_val import get_counter
+from gsuid_core.codec import WsCodec, json_codec
 from gsuid_core.message_models import Button, ButtonType
 from gsuid_core.models import Event, Message, MessageSend
 from gsuid_core.load_template import (
@@ -30,6 +45,10 @@ from gsuid_core.segment import (
 )
 
 button_row_num: int = sp_config.get_config('ButtonRow').data
+max_task_num: int = sp_config.get_config('MaxTaskNum').data
+max_bot_task_num: int = sp_config.get_config('MaxBotTaskNum').data
+max_session_task_num: int = sp_config.get_config('MaxSessionTaskNum').data
+max_queue_size: int = sp_config.get_config('MaxQueueSize').data
 
 sp_msg_id: str = send_security_config.get_config('SpecificMsgId').data
 is_sp_msg_id: str = send_security_config.get_config('EnableSpecificMsgId').data
@@ -48,14 +67,81 @@ enable_markdown_platform = ism
 enable_Template_platform = isc
 
 
+# 排队超过该秒数时输出警告
+SLOW_WAIT_SECONDS = 3.0
+
+_global_semaphore: Optional[asyncio.Semaphore] = None
+_task_seq = count()
+
+
+def get_global_semaphore() -> asyncio.Semaphore:
+    # 延迟创建, 保证绑定到运行中的事件循环
+    global _global_semaphore
+    if _global_semaphore is None:
+        _global_semaphore = asyncio.Semaphore(max_task_num)
+    return _global_semaphore
+
+
+class TaskItem:
+    __slots__ = (
+        'priority',
+        'seq',
+        'session_id',
+        'coro',
+        'put_time',
+        'running',
+    )
+
+    def __init__(
+        self,
+        coro: Coroutine[Any, Any, Any],
+        priority: int = 5,
+        session_id: str = '',
+    ):
+        self.priority = priority
+        self.seq = next(_task_seq)
+        self.session_id = session_id
+        self.coro = coro
+        self.put_time = time.perf_counter()
+        # 是否占用着并发名额, 等待用户回复时会暂时让出
+        self.running = False
+
+    def __lt__(self, other: 'TaskItem') -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+# 当前协程所属的任务, 供等待回复时让出并发名额
+_current_item: ContextVar[Optional[TaskItem]] = ContextVar(
+    '_current_item', default=None
+)
+
+
 class _Bot:
-    def __init__(self, _id: str, ws: Optional[WebSocket] = None):
+    def __init__(
+        self,
+        _id: str,
+        ws: Optional[WebSocket] = None,
+        codec: WsCodec = json_codec,
+    ):
         self.bot_id = _id
         self.bot = ws
-        self.logger = GsLogger(self.bot_id, ws)
-        self.queue = asyncio.queues.Queue()
+        self.codec = codec
+        self.logger = GsLogger(self.bot_id, ws, codec)
+        self.queue = asyncio.PriorityQueue()
         self.send_dict = {}
         self.bg_tasks = set()
+        # 经由该连接收到过消息的平台bot_id, 用于推送时选择连接
+        self.platforms: Set[str] = set()
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        # 每个会话正在执行的任务数, 以及因超出会话并发而暂缓的任务
+        self.session_running: Dict[str, int] = {}
+        self.session_pending: Dict[str, Deque[TaskItem]] = {}
+        self.task_stats = {
+            'total': 0,
+            'shed': 0,
+            'wait_sum': 0.0,
+            'wait_max': 0.0,
+        }
 
     async def target_send(
         self,
@@ -70,12 +156,17 @@ class _Bot:
         group_id: Optional[str] = None,
         task_id: str = '',
         task_event: Optional[asyncio.Event] = None,
+        is_converted: bool = False,
     ):
-        _message = await convert_message(
-            message,
-            bot_id,
-            bot_self_id,
-        )
+        if is_converted:
+            # 已经过convert_message转换, 例如推送时同一消息仅转换一次
+            _message: List[Message] = message  # type: ignore
+        else:
+            _message = await convert_message(
+                message,
+                bot_id,
+                bot_self_id,
+            )
 
         if bot_id in enable_markdown_platform:
             _message = await to_markdown(
@@ -146,13 +237,11 @@ class _Bot:
                 msg_id=msg_id,
             )
 
-            local_val = await get_global_val(bot_id, bot_self_id)
-
-            local_val['send'] += 1
+            get_counter(bot_id, bot_self_id).send += 1
 
             logger.info(f'[发送消息to] {bot_id} - {target_type} - {target_id}')
             if self.bot:
-                body = msgjson.encode(send)
+                body = self.codec.encode(send)
                 await self.bot.send_bytes(body)
             else:
                 self.send_dict[task_id] = send
@@ -169,12 +258,133 @@ class _Bot:
         del self.send_dict[task_id]
         return result
 
+    @property
+    def pending_num(self) -> int:
+        return self.queue.qsize() + sum(
+            len(i) for i in self.session_pending.values()
+        )
+
+    def put_task(
+        self,
+        coro: Coroutine[Any, Any, Any],
+        priority: int = 5,
+        session_id: str = '',
+    ) -> bool:
+        '''
+        将任务按优先级放入队列, 优先级数字越小越先执行
+
+        队列已满时丢弃该任务并返回`False`
+        '''
+        if self.pending_num >= max_queue_size:
+            coro.close()
+            self.task_stats['shed'] += 1
+            logger.warning(
+                f'[GsCore][任务队列] {self.bot_id} 队列已满, 已丢弃任务...'
+            )
+            return False
+        self.queue.put_nowait(TaskItem(coro, priority, session_id))
+        return True
+
     async def _process(self):
+        global_semaphore = get_global_semaphore()
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(max_bot_task_num)
+        semaphore = self.semaphore
+
         while True:
-            data = await self.queue.get()
-            asyncio.create_task(data)
+            await semaphore.acquire()
+            item = await self.queue.get()
             self.queue.task_done()
 
+            running = self.session_running.get(item.session_id, 0)
+            if running >= max_session_task_num:
+                # 该会话并发已满, 暂缓执行, 让出给其他会话
+                if item.session_id not in self.session_pending:
+                    self.session_pending[item.session_id] = deque()
+                self.session_pending[item.session_id].append(item)
+                semaphore.release()
+                continue
+
+            self.session_running[item.session_id] = running + 1
+            await global_semaphore.acquire()
+            item.running = True
+
+            wait = time.perf_counter() - item.put_time
+            stats = self.task_stats
+            stats['total'] += 1
+            stats['wait_sum'] += wait
+            if wait > stats['wait_max']:
+                stats['wait_max'] = wait
+            if wait >= SLOW_WAIT_SECONDS:
+                logger.warning(
+                    f'[GsCore][任务队列] {self.bot_id} 任务排队 {wait:.2f}s, '
+                    f'平均 {stats["wait_sum"] / stats["total"]:.3f}s, '
+                    f'最长 {stats["wait_max"]:.2f}s, '
+                    f'当前排队 {self.pending_num}'
+                )
+            else:
+                logger.trace(f'[GsCore][任务队列] 任务排队耗时 {wait:.3f}s')
+
+            task = asyncio.create_task(self._run_task(item))
+            self.bg_tasks.add(task)
+            task.add_done_callback(self.bg_tasks.discard)
+
+    async def _run_task(self, item: TaskItem):
+        _current_item.set(item)
+        try:
+            await item.coro
+        finally:
+            if item.running:
+                self._release_slots(item)
+
+    def _release_slots(self, item: TaskItem):
+        item.running = False
+        get_global_semaphore().release()
+        if self.semaphore is not None:
+            self.semaphore.release()
+
+        session_id = item.session_id
+        self.session_running[session_id] -= 1
+        pending = self.session_pending.get(session_id)
+        if pending:
+            self.queue.put_nowait(pending.popleft())
+        if not pending:
+            self.session_pending.pop(session_id, None)
+        if self.session_running[session_id] <= 0:
+            del self.session_running[session_id]
+
+    async def _acquire_slots(self, item: TaskItem):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(max_bot_task_num)
+        await self.semaphore.acquire()
+        try:
+            await get_global_semaphore().acquire()
+        except BaseException:
+            self.semaphore.release()
+            raise
+        # 恢复执行的任务不受会话并发限制, 避免与排队任务互相等待
+        session_id = item.session_id
+        self.session_running[session_id] = (
+            self.session_running.get(session_id, 0) + 1
+        )
+        item.running = True
+
+    @asynccontextmanager
+    async def suspend_slots(self):
+        '''
+        等待用户回复期间让出当前任务占用的并发名额, 结束后重新占用
+        '''
+        item = _current_item.get()
+        if item is None or not item.running:
+            yield
+            return
+
+        self._release_slots(item)
+        try:
+            yield
+        finally:
+            await self._acquire_slots(item)
+
 
 class Bot:
     instances: Dict[str, "Bot"] = {}
@@ -410,8 +620,9 @@ class Bot:
 
                 self.mutiply_event = asyncio.Event()
 
-            while self.mutiply_resp == []:
-                await asyncio.wait_for(self.mutiply_event.wait(), timeout)
+            async with self.bot.suspend_slots():
+                while self.mutiply_resp == []:
+                    await asyncio.wait_for(self.mutiply_event.wait(), timeout)
 
             self.mutiply_event = asyncio.Event()
             return self.mutiply_resp.pop(0)
@@ -419,7 +630,8 @@ class Bot:
             self.receive_tag = True
             self.instances[self.session_id] = self
             self.event = asyncio.Event()
-            return await self.wait_for_key(timeout)
+            async with self.bot.suspend_slots():
+                return await self.wait_for_key(timeout)
 
     async def send(
         self,
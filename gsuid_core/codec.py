@@ -0,0 +1,73 @@
+from binascii import Error
+from base64 import b64decode
+from typing import List, Optional
+
+from msgspec import msgpack
+from msgspec import json as msgjson
+
+from gsuid_core.models import Message, MessageSend, MessageReceive
+
+# 以二进制形式发送的消息类型, 其`base64://`数据会被还原为原始bytes
+BINARY_TYPES = ('image', 'record')
+
+
+class WsCodec:
+    '''
+    WS连接的消息编解码
+
+    - json: 默认格式, 图片等以`base64://`字符串传输
+    - msgpack: 连接时以`/ws/{bot_id}?format=msgpack`协商,
+      图片等以msgpack的bin类型直接传输原始bytes
+    '''
+
+    def __init__(self, format: str = 'json'):
+        self.format = format
+        self.binary = format == 'msgpack'
+        if self.binary:
+            self._encoder = msgpack.Encoder()
+            self._decoder = msgpack.Decoder(MessageReceive)
+        else:
+            self._encoder = msgjson.Encoder()
+            self._decoder = msgjson.Decoder(MessageReceive)
+
+    def decode(self, data: bytes) -> MessageReceive:
+        return self._decoder.decode(data)
+
+    def encode(self, send: MessageSend) -> bytes:
+        if self.binary and send.content:
+            send = MessageSend(
+                bot_id=send.bot_id,
+                bot_self_id=send.bot_self_id,
+                msg_id=send.msg_id,
+                target_type=send.target_type,
+                target_id=send.target_id,
+                content=to_binary(send.content),
+            )
+        return self._encoder.encode(send)
+
+
+def to_binary(content: List[Message]) -> List[Message]:
+    result = []
+    for msg in content:
+        data = msg.data
+        if (
+            msg.type in BINARY_TYPES
+            and isinstance(data, str)
+            and data.startswith('base64://')
+        ):
+            try:
+                msg = Message(type=msg.type, data=b64decode(data[9:]))
+            except Error:
+                pass
+        elif msg.type == 'node' and isinstance(data, list):
+            msg = Message(type='node', data=to_binary(data))
+        result.append(msg)
+    return result
+
+
+json_codec = WsCodec()
+msgpack_codec = WsCodec('msgpack')
+
+
+def get_codec(format: Optional[str]) -> WsCodec:
+    return msgpack_codec if format == 'msgpack' else json_codec
@@ -12,52 +12,54 @@ from fastapi import WebSocket, WebSocketDisconnect
 sys.path.append(str(Path(__file__).resolve().parent))
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-from gsuid_core.gss import gss  # noqa: E402
-from gsuid_core.bot import _Bot  # noqa: E402
-from gsuid_core.web_app import app  # noqa: E402
-from gsuid_core.logger import logger  # noqa: E402
-from gsuid_core.config import core_config  # noqa: E402
-from gsuid_core.handler import handle_event  # noqa: E402
-from gsuid_core.models import MessageReceive  # noqa: E402
-from gsuid_core.utils.database.startup import exec_list  # noqa: E402
-
-HOST = core_config.get_config('HOST')
-PORT = int(core_config.get_config('PORT'))
-ENABLE_HTTP = core_config.get_config('ENABLE_HTTP')
 HTTP_SERVER_STATUS = False
 
-exec_list.extend(
-    [
-        'ALTER TABLE GsBind ADD COLUMN group_id TEXT',
-        'ALTER TABLE GsBind ADD COLUMN sr_uid TEXT',
-        'ALTER TABLE GsUser ADD COLUMN sr_uid TEXT',
-        'ALTER TABLE GsUser ADD COLUMN sr_region TEXT',
-        'ALTER TABLE GsUser ADD COLUMN zzz_region TEXT',
-        'ALTER TABLE GsUser ADD COLUMN bb_region TEXT',
-        'ALTER TABLE GsUser ADD COLUMN bbb_region TEXT',
-        'ALTER TABLE GsUser ADD COLUMN wd_region TEXT',
-        'ALTER TABLE GsUser ADD COLUMN fp TEXT',
-        'ALTER TABLE GsUser ADD COLUMN device_id TEXT',
-        'ALTER TABLE GsUser ADD COLUMN bb_uid TEXT',
-        'ALTER TABLE GsUser ADD COLUMN bbb_uid TEXT',
-        'ALTER TABLE GsUser ADD COLUMN zzz_uid TEXT',
-        'ALTER TABLE GsUser ADD COLUMN wd_uid TEXT',
-        'ALTER TABLE GsBind ADD COLUMN bb_uid TEXT',
-        'ALTER TABLE GsBind ADD COLUMN bbb_uid TEXT',
-        'ALTER TABLE GsBind ADD COLUMN zzz_uid TEXT',
-        'ALTER TABLE GsBind ADD COLUMN wd_uid TEXT',
-        'ALTER TABLE GsUser ADD COLUMN device_info TEXT',
-        'ALTER TABLE GsUser ADD COLUMN sr_sign_switch TEXT DEFAULT "off"',
-        'ALTER TABLE GsUser ADD COLUMN zzz_sign_switch TEXT DEFAULT "off"',
-        'ALTER TABLE GsUser ADD COLUMN sr_push_switch TEXT DEFAULT "off"',
-        'ALTER TABLE GsUser ADD COLUMN zzz_push_switch TEXT DEFAULT "off"',
-        'ALTER TABLE GsUser ADD COLUMN draw_switch TEXT DEFAULT "off"',
-        'ALTER TABLE GsCache ADD COLUMN sr_uid TEXT',
-    ]
-)
+DB_EXEC_LIST = [
+    'ALTER TABLE GsBind ADD COLUMN group_id TEXT',
+    'ALTER TABLE GsBind ADD COLUMN sr_uid TEXT',
+    'ALTER TABLE GsUser ADD COLUMN sr_uid TEXT',
+    'ALTER TABLE GsUser ADD COLUMN sr_region TEXT',
+    'ALTER TABLE GsUser ADD COLUMN zzz_region TEXT',
+    'ALTER TABLE GsUser ADD COLUMN bb_region TEXT',
+    'ALTER TABLE GsUser ADD COLUMN bbb_region TEXT',
+    'ALTER TABLE GsUser ADD COLUMN wd_region TEXT',
+    'ALTER TABLE GsUser ADD COLUMN fp TEXT',
+    'ALTER TABLE GsUser ADD COLUMN device_id TEXT',
+    'ALTER TABLE GsUser ADD COLUMN bb_uid TEXT',
+    'ALTER TABLE GsUser ADD COLUMN bbb_uid TEXT',
+    'ALTER TABLE GsUser ADD COLUMN zzz_uid TEXT',
+    'ALTER TABLE GsUser ADD COLUMN wd_uid TEXT',
+    'ALTER TABLE GsBind ADD COLUMN bb_uid TEXT',
+    'ALTER TABLE GsBind ADD COLUMN bbb_uid TEXT',
+    'ALTER TABLE GsBind ADD COLUMN zzz_uid TEXT',
+    'ALTER TABLE GsBind ADD COLUMN wd_uid TEXT',
+    'ALTER TABLE GsUser ADD COLUMN device_info TEXT',
+    'ALTER TABLE GsUser ADD COLUMN sr_sign_switch TEXT DEFAULT "off"',
+    'ALTER TABLE GsUser ADD COLUMN zzz_sign_switch TEXT DEFAULT "off"',
+    'ALTER TABLE GsUser ADD COLUMN sr_push_switch TEXT DEFAULT "off"',
+    'ALTER TABLE GsUser ADD COLUMN zzz_push_switch TEXT DEFAULT "off"',
+    'ALTER TABLE GsUser ADD COLUMN draw_switch TEXT DEFAULT "off"',
+    'ALTER TABLE GsCache ADD COLUMN sr_uid TEXT',
+]
 
 
 def main():
+    # 在此处才加载插件等模块, 渲染进程池的子进程导入本模块时不会产生副作用
+    from gsuid_core.gss import gss
+    from gsuid_core.bot import _Bot
+    from gsuid_core.web_app import app
+    from gsuid_core.logger import logger
+    from gsuid_core.config import core_config
+    from gsuid_core.handler import handle_event
+    from gsuid_core.models import MessageReceive
+    from gsuid_core.utils.database.startup import exec_list
+
+    HOST = core_config.get_config('HOST')
+    PORT = int(core_config.get_config('PORT'))
+    ENABLE_HTTP = core_config.get_config('ENABLE_HTTP')
+
+    exec_list.extend(DB_EXEC_LIST)
+
     @app.websocket('/ws/{bot_id}')
     async def websocket_endpoint(websocket: WebSocket, bot_id: str):
         try:
@@ -67,7 +69,7 @@ def main():
                 try:
                     while True:
                         data = await websocket.receive_bytes()
-                        msg = msgjson.decode(data, type=MessageReceive)
+                        msg = bot.codec.decode(data)
                         await handle_event(bot, msg)
                 except WebSocketDisconnect:
                     await gss.disconnect(bot_id)
@@ -1,13 +1,23 @@
+import sys
 import json
+import asyncio
 import datetime
 from copy import deepcopy
-from typing import Dict, List, Optional, TypedDict
-
-import aiofiles
+from functools import partial
+from typing import Any, Dict, List, Tuple, Union, Callable, Optional, TypedDict
 
+from gsuid_core.logger import logger
 from gsuid_core.data_store import get_res_path
+from gsuid_core.utils.stats_store import (
+    COUNTERS,
+    KIND_USER,
+    KIND_GROUP,
+    UsageRow,
+    StatsStore,
+)
 
 global_val_path = get_res_path(['GsCore', 'global'])
+stats_store = StatsStore(global_val_path / 'GlobalVal.db')
 
 
 class PlatformVal(TypedDict):
@@ -19,8 +29,14 @@ class PlatformVal(TypedDict):
     user: Dict[str, Dict[str, int]]
 
 
-GlobalVal = Dict[str, PlatformVal]
-BotVal = Dict[str, GlobalVal]
+class DailySummary(TypedDict):
+    receive: int
+    send: int
+    command: int
+    image: int
+    group: int
+    user: int
+
 
 platform_val: PlatformVal = {
     'receive': 0,
@@ -31,28 +47,187 @@ platform_val: PlatformVal = {
     'user': {},
 }
 
+
+class PlatformCounter:
+    '''
+    单个机器人当日的统计
+
+    消息处理时直接修改属性即可, 无需await;
+    同时支持`counter['receive']`形式的读写, 可以当作`PlatformVal`使用
+    '''
+
+    __slots__ = (
+        'receive',
+        'send',
+        'command',
+        'image',
+        'group',
+        'user',
+        'dirty',
+    )
+
+    def __init__(self, val: Optional[PlatformVal] = None):
+        val = val or platform_val
+        self.receive: int = val['receive']
+        self.send: int = val['send']
+        self.command: int = val['command']
+        self.image: int = val['image']
+        self.group: Dict[str, Dict[str, int]] = {
+            k: dict(v) for k, v in val['group'].items()
+        }
+        self.user: Dict[str, Dict[str, int]] = {
+            k: dict(v) for k, v in val['user'].items()
+        }
+        # 上次保存后是否有变化
+        self.dirty = False
+
+    def __getitem__(self, key: str) -> Any:
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any):
+        setattr(self, key, value)
+
+    def add_command(
+        self, keyword: str, group_id: Optional[str], user_id: Optional[str]
+    ):
+        self.command += 1
+        # 命令关键词数量有限, 驻留后各群/用户的计数共用同一个字符串
+        keyword = sys.intern(keyword)
+        if group_id:
+            keywords = self.group.get(group_id)
+            if keywords is None:
+                keywords = self.group[group_id] = {}
+            keywords[keyword] = keywords.get(keyword, 0) + 1
+        if user_id:
+            keywords = self.user.get(user_id)
+            if keywords is None:
+                keywords = self.user[user_id] = {}
+            keywords[keyword] = keywords.get(keyword, 0) + 1
+
+    def to_dict(self) -> PlatformVal:
+        '''当前统计的快照, 可安全地修改或序列化'''
+        return {
+            'receive': self.receive,
+            'send': self.send,
+            'command': self.command,
+            'image': self.image,
+            'group': {k: dict(v) for k, v in self.group.items()},
+            'user': {k: dict(v) for k, v in self.user.items()},
+        }
+
+
+GlobalVal = Dict[str, PlatformCounter]
+BotVal = Dict[str, GlobalVal]
+
 bot_val: BotVal = {}
 
 
-def get_platform_val(bot_id: str, bot_self_id: str):
-    global bot_val
+def get_day_key(date: Optional[datetime.date] = None) -> int:
+    '''日期在统计库中的编号, 形如20240101'''
+    date = date or datetime.date.today()
+    return date.year * 10000 + date.month * 100 + date.day
+
+
+# 内存中`bot_val`所属的日期
+val_day = get_day_key()
+
+# (bot_id, bot_self_id, val_day): {日期: 用户位图}
+_bitmap_cache: Dict[Tuple[str, str, int], Dict[int, int]] = {}
+
+# 定期保存统计的间隔(秒), 崩溃时最多丢失这段时间内的统计
+CHECKPOINT_INTERVAL = 60
+# 单次事务最多写入的条目数, 避免长时间占用数据库
+CHECKPOINT_CHUNK_SIZE = 2000
+
+# 上次保存时各条目的调用次数, 只写入与之不同的条目
+_saved: Dict[Tuple[str, str], Dict[Tuple[int, str, str], int]] = {}
+_checkpoint_task: Optional[asyncio.Task] = None
+
+
+async def _run(func: Callable[..., Any], *args) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(func, *args))
+
 
-    if bot_id not in bot_val:
-        bot_val[bot_id] = {}
-    if bot_self_id not in bot_val[bot_id]:
-        bot_val[bot_id][bot_self_id] = deepcopy(platform_val)
+def to_usage(local_val: Union[PlatformCounter, PlatformVal]) -> List[UsageRow]:
+    usage: List[UsageRow] = []
+    for kind, key in ((KIND_GROUP, 'group'), (KIND_USER, 'user')):
+        for target, keywords in local_val[key].items():
+            for keyword, count in keywords.items():
+                usage.append((kind, target, keyword, count))
+    return usage
 
-    return bot_val[bot_id][bot_self_id]
+
+def from_usage(counters: Dict[str, int], usage: List[UsageRow]) -> PlatformVal:
+    local_val: PlatformVal = {
+        **counters,  # type: ignore
+        'group': {},
+        'user': {},
+    }
+    for kind, target, keyword, count in usage:
+        key = 'group' if kind == KIND_GROUP else 'user'
+        local_val[key].setdefault(target, {})[keyword] = count
+    return local_val
+
+
+def get_counter(bot_id: str, bot_self_id: str) -> PlatformCounter:
+    '''获取当日统计, 同步调用, 用于消息处理等热路径'''
+    counters = bot_val.get(bot_id)
+    if counters is None:
+        counters = bot_val[bot_id] = {}
+    counter = counters.get(bot_self_id)
+    if counter is None:
+        counter = counters[bot_self_id] = PlatformCounter()
+
+    # 获取当日统计的调用方都会修改它, 视为有变化
+    counter.dirty = True
+    if _checkpoint_task is None or _checkpoint_task.done():
+        _start_checkpoint()
+    return counter
+
+
+def get_platform_val(bot_id: str, bot_self_id: str) -> PlatformCounter:
+    return get_counter(bot_id, bot_self_id)
+
+
+def _start_checkpoint():
+    global _checkpoint_task
+    try:
+        _checkpoint_task = asyncio.get_running_loop().create_task(
+            _checkpoint_loop()
+        )
+    except RuntimeError:
+        pass
+
+
+async def _checkpoint_loop():
+    while True:
+        await asyncio.sleep(CHECKPOINT_INTERVAL)
+        if get_day_key() != val_day:
+            await rollover_global_val()
+            continue
+
+        dirty = [
+            (bot_id, bot_self_id)
+            for bot_id, counters in bot_val.items()
+            for bot_self_id, counter in counters.items()
+            if counter.dirty
+        ]
+        for bot_id, bot_self_id in dirty:
+            try:
+                await save_global_val(bot_id, bot_self_id)
+            except Exception as e:
+                logger.warning(
+                    f'[GsCore][统计] 保存{bot_self_id}统计失败: {e}'
+                )
 
 
 def get_all_bot_dict():
-    data = {}
-    for bot_id_path in global_val_path.iterdir():
-        if bot_id_path.is_dir():
-            data[bot_id_path.name] = []
-            for self_id_path in bot_id_path.iterdir():
-                if self_id_path.is_dir():
-                    data[bot_id_path.name].append(self_id_path.name)
+    data = stats_store.bots()
+    for bot_id in bot_val:
+        for bot_self_id in bot_val[bot_id]:
+            if bot_self_id and bot_self_id not in data.get(bot_id, []):
+                data.setdefault(bot_id, []).append(bot_self_id)
     return data
 
 
@@ -70,118 +245,255 @@ async def get_value_analysis(
     return result
 
 
-async def get_global_analysis(bot_id: str, bot_self_id: str):
-    seven_data = await get_value_analysis(bot_id, bot_self_id)
+async def get_daily_summary(
+    bot_id: str, bot_self_id: str, day: int = 7
+) -> Dict[str, DailySummary]:
+    '''
+    :说明:
+      获取近`day`天每日的计数器与活跃群/用户数, 直接在统计库中聚合,
+      不会读取完整的每日数据。
+    :参数:
+      * bot_id (str): 平台。
+      * bot_self_id (str): 机器人ID。
+      * day (int): 天数, 包括今天。
+    :返回:
+      * result: `{日期: DailySummary}`, 由今天开始倒序排列。
+    '''
+    if bot_self_id in bot_val.get(bot_id, {}):
+        await save_global_val(bot_id, bot_self_id)
 
-    group_data = []
-    user_data = []
+    today = datetime.date.today()
+    start = get_day_key(today - datetime.timedelta(days=day - 1))
+    summary = await _run(
+        stats_store.summary, bot_id, bot_self_id, start, get_day_key(today)
+    )
+
+    result: Dict[str, DailySummary] = {}
+    for i in range(day):
+        date = today - datetime.timedelta(days=i)
+        data = summary.get(get_day_key(date))
+        result[date.strftime("%Y_%d_%b")] = data or {  # type: ignore
+            **dict.fromkeys(COUNTERS, 0),
+            'group': 0,
+            'user': 0,
+        }
+    return result
 
-    user_list: List[List[str]] = []
-    user_all_list: List[str] = []
 
-    for day in seven_data:
-        local_val = seven_data[day]
-        if local_val['receive'] == 0 and local_val['send'] == 0:
-            continue
+def count_bits(bitmap: int) -> int:
+    return bin(bitmap).count('1')
 
-        _user_list = list(local_val['user'].keys())
 
-        user_list.append(_user_list)
-        user_all_list.extend(_user_list)
+async def get_global_analysis(bot_id: str, bot_self_id: str):
+    seven_data = await get_daily_summary(bot_id, bot_self_id)
 
-        group_data.append(len(local_val['group']))
-        user_data.append(len(local_val['user']))
+    today = datetime.date.today()
+    days = [
+        get_day_key(today - datetime.timedelta(days=i))
+        for i in range(len(seven_data))
+    ]
+
+    # 已结束日期的位图当天内不会变化, 跨天时随`val_day`一同失效
+    key = (bot_id, bot_self_id, val_day)
+    if key not in _bitmap_cache:
+        _bitmap_cache[key] = await _run(
+            stats_store.user_bitmaps, bot_id, bot_self_id, days[1:]
+        )
+    bitmaps = dict(_bitmap_cache[key])
+    bitmaps.update(
+        await _run(
+            stats_store.user_bitmaps, bot_id, bot_self_id, days[:1], False
+        )
+    )
 
-    user_before_list = [user for users in user_list[:-1] for user in users]
-    user_after_list = [user for users in user_list[1:] for user in users]
+    group_data = []
+    user_data = []
+    user_list: List[int] = []
+    for day, local_val in zip(days, seven_data.values()):
+        if local_val['receive'] == 0 and local_val['send'] == 0:
+            continue
+        user_list.append(bitmaps.get(day, 0))
+        group_data.append(local_val['group'])
+        user_data.append(local_val['user'])
 
-    out_user = []
-    new_user = []
-    for i in user_list[0]:
-        if i not in user_before_list:
-            out_user.append(i)
+    if not user_list:
+        return {'DAU': '0.00', 'DAG': '0.00', 'NU': '0', 'OU': '0.00%'}
 
-    for i in user_list[-1]:
-        if i not in user_after_list:
-            new_user.append(i)
+    # user_list由新到旧排列
+    older = newer = 0
+    for users in user_list[1:]:
+        older |= users
+    for users in user_list[:-1]:
+        newer |= users
 
-    _user_all_list = list(set(user_all_list))
+    # 新增: 最近一天中此前从未出现的用户; 流失: 最早一天之后再未出现的用户
+    new_user = user_list[0] & ~older
+    out_user = user_list[-1] & ~newer if len(user_list) > 1 else 0
+    all_user = count_bits(older | user_list[0])
 
     data = {
         'DAU': '{0:.2f}'.format(sum(user_data) / len(user_data)),
         'DAG': '{0:.2f}'.format(sum(group_data) / len(group_data)),
-        'NU': str(len(new_user)),
+        'NU': str(count_bits(new_user)),
         'OU': (
-            '{0:.2f}%'.format((len(out_user) / len(_user_all_list)) * 100)
-            if len(_user_all_list) != 0
+            '{0:.2f}%'.format((count_bits(out_user) / all_user) * 100)
+            if all_user != 0
             else "0.00%"
         ),
     }
     return data
 
 
+def migrate_json_global_val():
+    '''将旧版按日保存的JSON统计导入统计库'''
+    for path in global_val_path.glob('*/*/GlobalVal_*.json'):
+        try:
+            date = datetime.datetime.strptime(path.stem[10:], '%Y_%d_%b')
+            with open(path, 'rb') as fp:
+                data: PlatformVal = json.loads(fp.read())
+            stats_store.save(
+                path.parent.parent.name,
+                path.parent.name,
+                get_day_key(date.date()),
+                {i: data[i] for i in COUNTERS},
+                to_usage(data),
+            )
+            path.unlink()
+        except Exception as e:
+            logger.warning(f'[GsCore][统计] 导入{path.name}失败: {e}')
+
+
 async def load_all_global_val():
-    global bot_val
-    today = datetime.date.today()
-    date_format = today.strftime("%Y_%d_%b")
+    global val_day
 
-    for bot_id_path in global_val_path.iterdir():
-        if bot_id_path.stem not in bot_val:
-            bot_val[bot_id_path.stem] = {}
-        for self_id_path in bot_id_path.iterdir():
-            path = self_id_path / f'GlobalVal_{date_format}.json'
-            if self_id_path.is_dir() and path.exists():
-                async with aiofiles.open(path, 'rb') as fp:
-                    data = json.loads(await fp.read())
-                    bot_val[bot_id_path.stem][self_id_path.stem] = data
+    await _run(migrate_json_global_val)
+
+    val_day = get_day_key()
+    for bot_id, self_ids in (await _run(stats_store.bots)).items():
+        for bot_self_id in self_ids:
+            data = await _run(stats_store.load, bot_id, bot_self_id, val_day)
+            if data is not None:
+                bot_val.setdefault(bot_id, {})[bot_self_id] = PlatformCounter(
+                    from_usage(*data)
+                )
+                _saved[(bot_id, bot_self_id)] = {i[:3]: i[3] for i in data[1]}
 
 
 async def save_all_global_val():
-    global bot_val
-    for bot_id in bot_val:
-        for bot_self_id in bot_val[bot_id]:
+    for bot_id in list(bot_val):
+        for bot_self_id in list(bot_val[bot_id]):
             await save_global_val(bot_id, bot_self_id)
 
 
+async def rollover_global_val():
+    '''保存当前统计, 并开始新一天的统计'''
+    global bot_val, val_day, _saved
+
+    if val_day == get_day_key():
+        return
+
+    # 先切换到新一天, 保存期间收到的消息计入新一天, 不会丢失
+    old_val, old_day, old_saved = bot_val, val_day, _saved
+    bot_val = {}
+    val_day = get_day_key()
+    _saved = {}
+    _bitmap_cache.clear()
+
+    for bot_id, counters in old_val.items():
+        for bot_self_id, counter in counters.items():
+            if not bot_self_id:
+                continue
+            await _save_counter(
+                bot_id,
+                bot_self_id,
+                counter,
+                old_day,
+                old_saved.setdefault((bot_id, bot_self_id), {}),
+            )
+
+
+async def stop_checkpoint():
+    '''停止定期保存, 用于关闭前的最终保存'''
+    global _checkpoint_task
+    task, _checkpoint_task = _checkpoint_task, None
+    if task is None or task.done():
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
 async def get_global_val(
     bot_id: str, bot_self_id: str, day: Optional[int] = None
 ) -> PlatformVal:
+    '''
+    :说明:
+      获取某天统计的快照, 可以安全地读取或序列化。
+      返回值是副本, 修改它不会计入统计;
+      需要计数时请使用`get_counter`(或`get_platform_val`)获取当日计数器。
+    :参数:
+      * bot_id (str): 平台。
+      * bot_self_id (str): 机器人ID。
+      * day (Optional[int]): 几天前, 为空或0时为今天。
+    :返回:
+      * local_val (PlatformVal): 统计数据。
+    '''
     if day is None or day == 0:
-        return get_platform_val(bot_id, bot_self_id)
+        counter = bot_val.get(bot_id, {}).get(bot_self_id)
+        if counter is None:
+            return deepcopy(platform_val)
+        return counter.to_dict()
     else:
         today = datetime.date.today()
         endday = today - datetime.timedelta(days=day)
-        endday_format = endday.strftime("%Y_%d_%b")
-        _path = global_val_path / bot_id / bot_self_id
-        path = _path / f'GlobalVal_{endday_format}.json'
-        if path.exists():
-            async with aiofiles.open(path, 'rb') as fp:
-                data = json.loads(await fp.read())
-                return data
+        data = await _run(
+            stats_store.load, bot_id, bot_self_id, get_day_key(endday)
+        )
+        if data is not None:
+            return from_usage(*data)
         else:
-            return platform_val
+            return deepcopy(platform_val)
 
 
 async def save_global_val(bot_id: str, bot_self_id: str):
     if not bot_self_id:
         return
 
-    local_val = get_platform_val(bot_id, bot_self_id)
+    local_val = bot_val.get(bot_id, {}).get(bot_self_id)
+    if local_val is None:
+        return
 
-    today = datetime.date.today()
-    date_format = today.strftime("%Y_%d_%b")
-
-    path = global_val_path / bot_id / bot_self_id
-    if not path.exists():
-        path.mkdir(parents=True, exist_ok=True)
-
-    async with aiofiles.open(
-        path / f'GlobalVal_{date_format}.json', 'w', encoding='utf8'
-    ) as fp:
-        await fp.write(
-            json.dumps(
-                local_val,
-                indent=4,
-                ensure_ascii=False,
+    await _save_counter(
+        bot_id,
+        bot_self_id,
+        local_val,
+        val_day,
+        _saved.setdefault((bot_id, bot_self_id), {}),
+    )
+
+
+async def _save_counter(
+    bot_id: str,
+    bot_self_id: str,
+    local_val: PlatformCounter,
+    day: int,
+    saved: Dict[Tuple[int, str, str], int],
+):
+    local_val.dirty = False
+    counters = {i: local_val[i] for i in COUNTERS}
+    usage = [i for i in to_usage(local_val) if saved.get(i[:3]) != i[3]]
+
+    # 分批写入, 每批为一个事务, 失败时保留变化待下次重试
+    for index in range(0, max(len(usage), 1), CHECKPOINT_CHUNK_SIZE):
+        chunk = usage[index : index + CHECKPOINT_CHUNK_SIZE]  # noqa: E203
+        try:
+            await _run(
+                stats_store.save, bot_id, bot_self_id, day, counters, chunk
             )
-        )
+        except Exception:
+            local_val.dirty = True
+            raise
+        for kind, target, keyword, count in chunk:
+            saved[(kind, target, keyword)] = count
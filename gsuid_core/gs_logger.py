@@ -1,16 +1,22 @@
 from typing import Literal, Optional
 
 from fastapi import WebSocket
-from msgspec import json as msgjson
 
 from gsuid_core.models import MessageSend
 from gsuid_core.segment import MessageSegment
+from gsuid_core.codec import WsCodec, json_codec
 
 
 class GsLogger:
-    def __init__(self, bot_id: str, ws: Optional[WebSocket]):
+    def __init__(
+        self,
+        bot_id: str,
+        ws: Optional[WebSocket],
+        codec: WsCodec = json_codec,
+    ):
         self.bot_id = bot_id
         self.bot = ws
+        self.codec = codec
 
     def get_msg_send(
         self, type: Literal['INFO', 'WARNING', 'ERROR', 'SUCCESS'], msg: str
@@ -27,13 +33,13 @@ class GsLogger:
             await self.bot.send_bytes(b)
 
     async def info(self, msg: str):
-        await self._send(msgjson.encode(self.get_msg_send('INFO', msg)))
+        await self._send(self.codec.encode(self.get_msg_send('INFO', msg)))
 
     async def warning(self, msg: str):
-        await self._send(msgjson.encode(self.get_msg_send('WARNING', msg)))
+        await self._send(self.codec.encode(self.get_msg_send('WARNING', msg)))
 
     async def error(self, msg: str):
-        await self._send(msgjson.encode(self.get_msg_send('ERROR', msg)))
+        await self._send(self.codec.encode(self.get_msg_send('ERROR', msg)))
 
     async def success(self, msg: str):
-        await self._send(msgjson.encode(self.get_msg_send('SUCCESS', msg)))
+        await self._send(self.codec.encode(self.get_msg_send('SUCCESS', msg)))
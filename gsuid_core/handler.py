@@ -1,5 +1,5 @@
 import asyncio
-from copy import deepcopy
+from copy import copy
 from typing import Dict, List
 
 from fastapi_amis_admin.admin.site import uuid
@@ -9,9 +9,9 @@ from gsuid_core.bot import Bot, _Bot
 from gsuid_core.logger import logger
 from gsuid_core.trigger import Trigger
 from gsuid_core.config import core_config
-from gsuid_core.global_val import get_global_val
+from gsuid_core.global_val import get_counter
 from gsuid_core.models import Event, Message, MessageReceive
-from gsuid_core.utils.database.models import CoreUser, CoreGroup
+from gsuid_core.utils.database.write_buffer import core_data_buffer
 from gsuid_core.utils.plugins_config.gs_config import core_plugins_config
 
 command_start = core_config.get_config('command_start')
@@ -33,15 +33,12 @@ async def handle_event(ws: _Bot, msg: MessageReceive, is_http: bool = False):
     msg.user_pm = user_pm = await get_user_pml(msg)
     event = await msg_process(msg)
     logger.info('[收到事件]', event=event)
+    ws.platforms.add(event.bot_id)
+    ws.platforms.add(event.real_bot_id)
 
-    local_val = await get_global_val(event.real_bot_id, event.bot_self_id)
-    local_val['receive'] += 1
+    get_counter(event.real_bot_id, event.bot_self_id).receive += 1
 
-    await CoreUser.insert_user(
-        event.real_bot_id, event.user_id, event.group_id
-    )
-    if event.group_id:
-        await CoreGroup.insert_group(event.real_bot_id, event.group_id)
+    core_data_buffer.add(event.real_bot_id, event.user_id, event.group_id)
 
     if event.at:
         for shield_id in shield_list:
@@ -91,75 +88,20 @@ async def handle_event(ws: _Bot, msg: MessageReceive, is_http: bool = False):
                 return
 
     valid_event: Dict[Trigger, int] = {}
-    pending = [
-        _check_command(
-            SL.lst[sv].TL[_type][tr],
-            SL.lst[sv].priority,
-            event,
-            valid_event,
-        )
-        for sv in SL.lst
-        for _type in SL.lst[sv].TL
-        for tr in SL.lst[sv].TL[_type]
-        if (
-            SL.lst[sv].plugins.enabled
-            and user_pm <= SL.lst[sv].plugins.pm
-            and msg.group_id not in SL.lst[sv].plugins.black_list
-            and msg.user_id not in SL.lst[sv].plugins.black_list
-            and (
-                True
-                if SL.lst[sv].plugins.area == 'SV'
-                or SL.lst[sv].plugins.area == 'ALL'
-                or (
-                    event.user_type == 'group'
-                    and SL.lst[sv].plugins.area == 'GROUP'
-                )
-                or (
-                    event.user_type == 'direct'
-                    and SL.lst[sv].plugins.area == 'DIRECT'
-                )
-                else False
-            )
-            and (
-                True
-                if (
-                    not SL.lst[sv].plugins.white_list
-                    or SL.lst[sv].plugins.white_list == ['']
-                )
-                else (
-                    msg.user_id in SL.lst[sv].plugins.white_list
-                    or msg.group_id in SL.lst[sv].plugins.white_list
-                )
-            )
-            and SL.lst[sv].enabled
-            and user_pm <= SL.lst[sv].pm
-            and msg.group_id not in SL.lst[sv].black_list
-            and msg.user_id not in SL.lst[sv].black_list
-            and (
-                True
-                if SL.lst[sv].area == 'ALL'
-                or (SL.lst[sv].plugins.area == 'ALL')
-                or (event.user_type == 'group' and SL.lst[sv].area == 'GROUP')
-                or (
-                    event.user_type == 'direct' and SL.lst[sv].area == 'DIRECT'
-                )
-                else False
-            )
-            and (
-                True
-                if (not SL.lst[sv].white_list or SL.lst[sv].white_list == [''])
-                else (
-                    msg.user_id in SL.lst[sv].white_list
-                    or msg.group_id in SL.lst[sv].white_list
-                )
-            )
-        )
-    ]
-    await asyncio.gather(*pending, return_exceptions=True)
+    index = SL.get_index()
+    eligible = SL.get_eligible(
+        user_pm,
+        event.user_type,
+        event.user_id,
+        event.group_id,
+    )
+    for _, sv, trigger in index.match(event):
+        if SL.is_eligible(eligible, sv):
+            valid_event[trigger] = sv.priority
+
     if len(valid_event) >= 1:
-        sorted_event = sorted(valid_event.items(), key=lambda x: x[1])
-        for trigger, _ in sorted_event:
-            _event = deepcopy(event)
+        for trigger, priority in valid_event.items():
+            _event = fork_event(event)
             message = await trigger.get_command(_event)
             _event.task_id = str(uuid.uuid4())
 
@@ -168,7 +110,7 @@ async def handle_event(ws: _Bot, msg: MessageReceive, is_http: bool = False):
 
             bot = Bot(ws, _event)
 
-            await count_data(event, trigger)
+            count_data(event, trigger)
 
             logger.info(
                 '[命令触发]',
@@ -176,14 +118,33 @@ async def handle_event(ws: _Bot, msg: MessageReceive, is_http: bool = False):
             )
             logger.info('[命令触发]', command=message)
 
-            ws.queue.put_nowait(trigger.func(bot, message))
+            is_put = ws.put_task(
+                trigger.func(bot, message),
+                priority,
+                f'{bot.bid}{bot.temp_gid}',
+            )
+            if not is_put:
+                await bot.send('[GsCore] 当前任务过多, 请稍后再试...')
+
             if _event.task_event:
                 return await ws.wait_task(_event.task_id, _event.task_event)
 
-            if trigger.block:
+            if trigger.block or not is_put:
                 break
 
 
+def fork_event(event: Event) -> Event:
+    # 浅拷贝Event, 共享file/image等只读负载,
+    # 仅各触发器会改写的字段(command/text/regex_*/task_*)相互独立
+    _event = copy(event)
+    _event.content = [*event.content]
+    _event.image_list = [*event.image_list]
+    _event.at_list = [*event.at_list]
+    _event.regex_dict = {}
+    _event.regex_group = ()
+    return _event
+
+
 async def get_user_pml(msg: MessageReceive) -> int:
     if msg.user_id in config_masters:
         return 0
@@ -240,32 +201,7 @@ async def msg_process(msg: MessageReceive) -> Event:
     return event
 
 
-async def count_data(event: Event, trigger: Trigger):
-    local_val = await get_global_val(event.real_bot_id, event.bot_self_id)
-    local_val['command'] += 1
-    if event.group_id:
-        if event.group_id not in local_val['group']:
-            local_val['group'][event.group_id] = {}
-
-        if trigger.keyword not in local_val['group'][event.group_id]:
-            local_val['group'][event.group_id][trigger.keyword] = 1
-        else:
-            local_val['group'][event.group_id][trigger.keyword] += 1
-
-    if event.user_id:
-        if event.user_id not in local_val['user']:
-            local_val['user'][event.user_id] = {}
-        if trigger.keyword not in local_val['user'][event.user_id]:
-            local_val['user'][event.user_id][trigger.keyword] = 1
-        else:
-            local_val['user'][event.user_id][trigger.keyword] += 1
-
-
-async def _check_command(
-    trigger: Trigger,
-    priority: int,
-    message: Event,
-    valid_event: Dict[Trigger, int],
-):
-    if trigger.check_command(message):
-        valid_event[trigger] = priority
+def count_data(event: Event, trigger: Trigger):
+    get_counter(event.real_bot_id, event.bot_self_id).add_command(
+        trigger.keyword, event.group_id, event.user_id
+    )
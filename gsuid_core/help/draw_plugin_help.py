@@ -5,9 +5,15 @@ from typing import Dict, List, Tuple, Callable, Optional
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
 
 from gsuid_core.data_store import get_res_path
-from gsuid_core.utils.image.convert import convert_img
 from gsuid_core.utils.image.image_tools import crop_center_img
+from gsuid_core.utils.image.convert import convert_img, encode_image
 from gsuid_core.utils.plugins_config.gs_config import pic_gen_config
+from gsuid_core.utils.image.render_pool import (
+    ImageLike,
+    image_ref,
+    open_image,
+    render_in_pool,
+)
 
 from .model import PluginHelp
 
@@ -80,6 +86,70 @@ async def get_help(
     if help_path.exists() and name in cache and cache[name] and enable_cache:
         return await convert_img(Image.open(help_path))
 
+    img_bytes = await render_in_pool(
+        draw_help,
+        name,
+        sub_text,
+        help_data,
+        # 插件传入的背景等图片一般直接打开自文件, 仅传递路径给渲染进程
+        image_ref(bg),
+        image_ref(icon),
+        image_ref(badge),
+        image_ref(banner),
+        image_ref(button),
+        font,
+        is_dark,
+        text_color,
+        sub_c,
+        op_color,
+        title_color,
+        sub_title_color,
+        sv_color,
+        sv_desc_color,
+        column,
+        is_gaussian,
+        gaussian_blur,
+        is_icon,
+        ICON_PATH,
+        extra_message,
+        help_path if enable_cache else None,
+    )
+    if enable_cache:
+        cache[name] = 1
+
+    return img_bytes
+
+
+def draw_help(
+    name: str,
+    sub_text: str,
+    help_data: Dict[str, PluginHelp],
+    bg: ImageLike,
+    icon: ImageLike,
+    badge: ImageLike,
+    banner: ImageLike,
+    button: ImageLike,
+    font: Callable[[int], ImageFont.FreeTypeFont],
+    is_dark: bool,
+    text_color: Tuple[int, int, int],
+    sub_c: Optional[Tuple[int, int, int]],
+    op_color: Optional[Tuple[int, int, int]],
+    title_color: Tuple[int, int, int],
+    sub_title_color: Tuple[int, int, int],
+    sv_color: Tuple[int, int, int],
+    sv_desc_color: Tuple[int, int, int],
+    column: int,
+    is_gaussian: bool,
+    gaussian_blur: int,
+    is_icon: bool,
+    ICON_PATH: Optional[Path],
+    extra_message: Optional[List[str]],
+    save_path: Optional[Path],
+) -> bytes:
+    # 同步绘制帮助图, 由渲染进程池执行
+    bg, icon, badge, banner, button = (
+        open_image(i) for i in (bg, icon, badge, banner, button)
+    )
     if sub_c is None and is_dark:
         sub_c = tuple(
             x - 50 if x > 50 else x for x in text_color
@@ -208,14 +278,12 @@ async def get_help(
     img = Image.alpha_composite(all_white, img)
 
     img = img.convert('RGB')
-    help_path = get_res_path('help') / f'{name}.jpg'
-    if enable_cache:
+    if save_path is not None:
         img.save(
-            help_path,
+            save_path,
             'JPEG',
             quality=pic_quality,
             subsampling=0,
         )
-        cache[name] = 1
 
-    return await convert_img(img)
+    return encode_image(img)
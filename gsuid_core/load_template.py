@@ -1,6 +1,7 @@
 import re
 import json
-from typing import Dict, List, TypedDict
+import time
+from typing import Dict, List, Tuple, Optional, TypedDict
 
 from gsuid_core.logger import logger
 from gsuid_core.models import Message
@@ -17,10 +18,29 @@ class MarkdownTemplates(TypedDict):
     para: List[str]
 
 
+class CompiledTemplate:
+    __slots__ = ('template_id', 'pattern', 'size', 'rank')
+
+    def __init__(self, template_id: str, pattern: 're.Pattern', rank: int):
+        self.template_id = template_id
+        self.pattern = pattern
+        # 可匹配的参数数量上限
+        self.size = len(pattern.groupindex)
+        # 参数数量相同时, 排序靠后(正则较短)的模板优先
+        self.rank = rank
+
+
+# 距上次检查超过该秒数时, 检查模板文件是否变化
+RELOAD_CHECK_INTERVAL = 5
+
 button_templates: Dict[str, ButtonType] = {}
 markdown_templates: Dict[str, MarkdownTemplates] = {}
+compiled_templates: List[CompiledTemplate] = []
 custom_buttons: Dict[str, Message] = {}
 
+_template_mtime = 0.0
+_check_time = 0.0
+
 
 def template_button_to_buttons(button_data: Dict):
     btl = []
@@ -38,23 +58,21 @@ def template_button_to_buttons(button_data: Dict):
     return btl
 
 
-def parse_button(buttons):
-    fake_buttons = []
-    for i in buttons:
-        if isinstance(i, Button):
-            fake_buttons.append(i)
-        elif isinstance(i, List):
-            fake_buttons.extend(i)
-    return fake_buttons
+def get_template_mtime() -> float:
+    return max(
+        [
+            markdown_template_path.stat().st_mtime,
+            *(i.stat().st_mtime for i in markdown_template_path.iterdir()),
+        ]
+    )
 
 
-try:
-    for button_template in buttons_template_path.iterdir():
-        with open(button_template, 'r', encoding='UTF-8') as f:
-            button_data = json.load(f)
-            btl = template_button_to_buttons(button_data)
-            button_templates[button_template.stem] = btl
+def load_markdown_templates():
+    global _template_mtime, _check_time
 
+    _template_mtime = get_template_mtime()
+    _check_time = time.monotonic()
+    templates: Dict[str, MarkdownTemplates] = {}
     for markdown_template in markdown_template_path.iterdir():
         with open(markdown_template, 'r') as file:
             file_content = file.read()
@@ -78,17 +96,103 @@ try:
                     '$$', rf'(?P<{para.replace(".", "")}>[\s\S]+)', 1
                 )
 
-            markdown_templates[rep] = {
+            templates[rep] = {
                 'template_id': markdown_template.stem,
                 'para': [i[1:] for i in para_list],
             }
 
-    markdown_templates = dict(
-        sorted(
-            markdown_templates.items(), key=lambda x: len(x[0]), reverse=True
-        )
+    markdown_templates.clear()
+    markdown_templates.update(
+        sorted(templates.items(), key=lambda x: len(x[0]), reverse=True)
     )
 
+    compiled = []
+    for rank, (rep, template) in enumerate(markdown_templates.items()):
+        try:
+            pattern = re.compile(rep)
+        except re.error as e:
+            logger.warning(
+                f'[加载模板] MD模板{template["template_id"]}无效: {e}'
+            )
+            continue
+        compiled.append(
+            CompiledTemplate(template['template_id'], pattern, rank)
+        )
+
+    compiled.sort(key=lambda x: (x.size, x.rank), reverse=True)
+    compiled_templates[:] = compiled
+
+
+def check_markdown_templates():
+    '''模板文件有变化时重新加载'''
+    global _check_time
+
+    if time.monotonic() - _check_time < RELOAD_CHECK_INTERVAL:
+        return
+    _check_time = time.monotonic()
+    try:
+        if get_template_mtime() != _template_mtime:
+            load_markdown_templates()
+            logger.info('[GsCore] MD模板文件变化, 已重新加载...')
+    except Exception as e:
+        logger.warning(f'[GsCore] 重新加载MD模板失败: {e}')
+
+
+def match_markdown_template(
+    text: str,
+) -> Optional[Tuple[str, Dict[str, str]]]:
+    '''
+    :说明:
+      找出匹配参数最多的MD模板, 数量相同时选择正则较短的模板。
+
+      模板按可匹配的参数数量从多到少依次尝试,
+      剩余模板不可能优于当前结果时即停止。
+    :参数:
+      * text (str): markdown文本。
+    :返回:
+      * (模板ID, 参数), 无匹配时为None。
+    '''
+    check_markdown_templates()
+
+    result = None
+    best = (-1, -1)
+    for template in compiled_templates:
+        if (template.size, template.rank) <= best:
+            break
+        match = template.pattern.fullmatch(text)
+        if match is None:
+            continue
+
+        match_para = match.groupdict()
+        size = len([i for i in match_para.values() if i is not None])
+        if (size, template.rank) > best:
+            best = (size, template.rank)
+            result = (
+                template.template_id,
+                {k: v for k, v in match_para.items() if v},
+            )
+    return result
+
+
+def parse_button(buttons):
+    fake_buttons = []
+    for i in buttons:
+        if isinstance(i, Button):
+            fake_buttons.append(i)
+        elif isinstance(i, List):
+            fake_buttons.extend(i)
+    return fake_buttons
+
+
+try:
+    for button_template in buttons_template_path.iterdir():
+        with open(button_template, 'r', encoding='UTF-8') as f:
+            button_data = json.load(f)
+            btl = template_button_to_buttons(button_data)
+            button_templates[button_template.stem] = btl
+
+    load_markdown_templates()
+
     for custom_button in custom_buttons_template.iterdir():
         with open(custom_button, 'r', encoding='UTF-8') as f:
             button_data = json.load(f)
@@ -6,9 +6,10 @@ import gsuid_core.global_val as gv
 from gsuid_core.models import Event
 from gsuid_core.aps import scheduler
 from gsuid_core.logger import logger
+from gsuid_core.server import on_core_start, on_core_shutdown
 from gsuid_core.utils.database.models import CoreUser, CoreGroup
 
-from .command_global_val import save_global_val
+from .command_global_val import load_global_val, save_global_val
 
 sv_core_status = SV('Core状态', pm=0)
 
@@ -16,7 +17,12 @@ template = '''收:{}
 发:{}
 命令调用:{}
 生成图片：{}
-当前会话调用：{}'''
+当前会话调用：{}
+任务排队：平均{:.3f}s / 最长{:.2f}s / 丢弃{}'''
+
+
+on_core_start(load_global_val)
+on_core_shutdown(save_global_val)
 
 
 async def count_group_user():
@@ -38,9 +44,7 @@ async def count_group_user():
 
 @scheduler.scheduled_job('cron', hour='0', minute='0')
 async def scheduled_save_global_val():
-    global bot_val
-    await save_global_val()
-    gv.bot_val = {}
+    await gv.rollover_global_val()
     await count_group_user()
 
 
@@ -65,6 +69,8 @@ async def send_core_status_msg(bot: Bot, ev: Event):
         _command = sum(list(local_val['user'][ev.user_id].values()))
 
     if local_val is not None:
+        stats = bot.bot.task_stats
+        avg_wait = stats['wait_sum'] / stats['total'] if stats['total'] else 0
         await bot.send(
             template.format(
                 local_val['receive'],
@@ -72,6 +78,9 @@ async def send_core_status_msg(bot: Bot, ev: Event):
                 local_val['command'],
                 local_val['image'],
                 _command,
+                avg_wait,
+                stats['wait_max'],
+                stats['shed'],
             )
         )
     else:
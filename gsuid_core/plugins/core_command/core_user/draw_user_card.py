@@ -6,7 +6,8 @@ from PIL import Image, ImageDraw
 
 from gsuid_core.models import Event
 from gsuid_core.utils.fonts.fonts import core_font
-from gsuid_core.utils.image.convert import convert_img
+from gsuid_core.utils.image.convert import encode_image
+from gsuid_core.utils.image.render_pool import in_render_pool
 from gsuid_core.utils.database.base_models import Bind, Push, User
 from gsuid_core.utils.image.image_tools import (
     get_v4_bg,
@@ -92,7 +93,6 @@ def get_status_bool(data: Any):
 
 
 async def get_user_card(bot_id: str, ev: Event) -> Union[bytes, str]:
-    module_h = 80
     _line = 117
     id_line = 90
     ez = 20
@@ -221,10 +221,27 @@ async def get_user_card(bot_id: str, ev: Event) -> Union[bytes, str]:
 
     h += len(all_plugin_data) * 80
 
+    char_pic = await draw_pic_with_ring(await get_event_avatar(ev), 377)
+    return await draw_user_card(w, h, bot_id, user_id, char_pic, all_plugin)
+
+
+@in_render_pool
+def draw_user_card(
+    w: int,
+    h: int,
+    bot_id: str,
+    user_id: str,
+    char_pic: Image.Image,
+    all_plugin: Dict[str, Dict[str, Dict[str, Dict[str, Dict[str, Any]]]]],
+) -> bytes:
+    module_h = 80
+    _line = 117
+    id_line = 90
+    ez = 20
+
     # 开始绘图
     img = get_v4_bg(w, h, is_blur=True)
 
-    char_pic = await draw_pic_with_ring(await get_event_avatar(ev), 377)
     title = Image.open(TEXT_PATH / 'user_title.png')
     title.paste(char_pic, (411, 46), char_pic)
 
@@ -331,4 +348,4 @@ async def get_user_card(bot_id: str, ev: Event) -> Union[bytes, str]:
     footer = get_v4_footer()
     img.paste(footer, (0, h - 50), footer)
 
-    return await convert_img(img)
+    return encode_image(img)
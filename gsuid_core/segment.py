@@ -1,7 +1,4 @@
-import re
-import uuid
 import random
-from io import BytesIO
 from venv import logger
 from pathlib import Path
 from base64 import b64decode, b64encode
@@ -11,12 +8,24 @@ import msgspec
 from PIL import Image
 
 from gsuid_core.models import Message
-from gsuid_core.data_store import image_res
 from gsuid_core.message_models import Button
-from gsuid_core.global_val import get_global_val
-from gsuid_core.utils.image.convert import text2pic
-from gsuid_core.utils.image.image_tools import sget
-from gsuid_core.load_template import markdown_templates
+from gsuid_core.global_val import get_counter
+from gsuid_core.utils.ban_word import mask_ban_words
+from gsuid_core.utils.image.pic_store import pic_store
+from gsuid_core.utils.upload.utils import upload_image
+from gsuid_core.utils.image.render_pool import render_in_pool
+from gsuid_core.utils.image.convert import text2pic, encode_image
+from gsuid_core.utils.image.remote_cache import remote_image_cache
+from gsuid_core.load_template import (
+    markdown_templates,
+    match_markdown_template,
+)
+from gsuid_core.utils.image.image_size import (
+    get_url_size,
+    fetch_image_size,
+    probe_image_size,
+    remember_url_size,
+)
 from gsuid_core.utils.plugins_config.gs_config import (
     pic_gen_config,
     send_pic_config,
@@ -41,9 +50,6 @@ IS_UPLOAD = pic_upload_config.get_config('PicUpload').data
 
 pic_quality: int = pic_gen_config.get_config('PicQuality').data
 
-enabled_banlist = send_security_config.get_config('EnableBanList').data
-banlist = send_security_config.get_config('BanList').data
-
 pclient = None
 if IS_UPLOAD:
     if SERVER == 'smms':
@@ -60,9 +66,6 @@ if IS_UPLOAD:
         pclient = CUSTOM()
 
 
-URL_MAP = {}
-
-
 class MessageSegment:
     def __add__(self, other):
         return [self, other]
@@ -70,12 +73,7 @@ class MessageSegment:
     @staticmethod
     def image(img: Union[str, Image.Image, bytes, Path]) -> Message:
         if isinstance(img, Image.Image):
-            img = img.convert('RGB')
-            result_buffer = BytesIO()
-            img.save(
-                result_buffer, format='PNG', quality=pic_quality, subsampling=0
-            )
-            img = result_buffer.getvalue()
+            img = encode_image(img)
         elif isinstance(img, bytes):
             pass
         elif isinstance(img, Path):
@@ -99,6 +97,20 @@ class MessageSegment:
         msg = Message(type='image', data=data)
         return msg
 
+    @staticmethod
+    def lazy_image(img: Image.Image) -> Message:
+        '''
+        :说明:
+          延迟到发送时在渲染池中按各平台配置的格式编码图片, 不阻塞事件循环。
+          保存的是图片副本, 之后修改原图不影响发送内容;
+          返回的消息在发送前不是`base64://`字符串, 无法直接序列化。
+        :参数:
+          * img (Image): 图片。
+        :返回:
+          * msg: 图片消息。
+        '''
+        return Message(type='image', data=img.copy())
+
     @staticmethod
     def text(content: str) -> Message:
         return Message(type='text', data=content)
@@ -229,14 +241,13 @@ async def _image_to_remote_url(image: Union[bytes, str]) -> List[Message]:
             image_bytes = image
         assert isinstance(image_bytes, bytes)
 
-        bio = BytesIO(image_bytes)
-        img = Image.open(bio)
-        bio.seek(0)
-        img_url = await pclient.upload(f'{uuid.uuid4()}.jpg', bio)
-        _message = [
-            MessageSegment.image(img_url if img_url else image_bytes),
-            MessageSegment.image_size(img.size),
-        ]
+        size = probe_image_size(image_bytes)
+        img_url = await upload_image(pclient, image_bytes)
+        _message = [MessageSegment.image(img_url if img_url else image_bytes)]
+        if size is not None:
+            if img_url:
+                remember_url_size(img_url, size)
+            _message.append(MessageSegment.image_size(size))
         return _message
 
     return []
@@ -253,16 +264,22 @@ async def _image_to_local_url(image: Union[bytes, str]) -> List[Message]:
     else:
         image_bytes = image
 
-    bio = BytesIO(image_bytes)
-    _image = Image.open(bio)
-    name = f'{uuid.uuid1()}.jpg'
-    path = image_res / name
-    path.write_bytes(image_bytes)
-    data = f'link://{pic_srv}/genshinuid/image/{name}'
-    return [
-        Message(type='image', data=data),
-        MessageSegment.image_size(_image.size),
-    ]
+    size = probe_image_size(image_bytes)
+    image_id = pic_store.put(image_bytes)
+    url = f'{pic_srv}/genshinuid/image/{image_id}.jpg'
+    _message = [Message(type='image', data=f'link://{url}')]
+    if size is not None:
+        remember_url_size(url, size)
+        _message.append(MessageSegment.image_size(size))
+    return _message
+
+
+async def _get_url_image_size(url: str) -> Optional[Tuple[int, int]]:
+    try:
+        return await fetch_image_size(url)
+    except Exception as e:
+        logger.warning(f'[GsCore] 获取图片{url}大小失败: {e}')
+        return None
 
 
 async def _image_to_url(
@@ -278,6 +295,14 @@ async def _image_to_url(
         return [message]
 
 
+def _get_pic_format(bot_id: str) -> Optional[str]:
+    key = f'{bot_id}_format'
+    if key not in send_pic_config.config_list:
+        return None
+    fmt = send_pic_config.get_config(key).data
+    return None if fmt == '默认' else fmt
+
+
 async def _convert_message_to_image(
     message: Message, bot_id: str, bot_self_id: str
 ) -> List[Message]:
@@ -292,37 +317,35 @@ async def _convert_message_to_image(
         and is_text2pic
         and len(message.data) >= int(text2pic_limit)
     ):
-        image_bytes = await text2pic(message.data)
+        image_bytes = await text2pic(message.data, fmt=_get_pic_format(bot_id))
         message = Message(type='image', data=image_bytes)
 
     if message.type == 'image':
-        local_val = await get_global_val(bot_id, bot_self_id)
-        local_val['image'] += 1
-        img: Union[bytes, str] = message.data  # type: ignore
-        if isinstance(img, str) and img.startswith('base64://'):
+        get_counter(bot_id, bot_self_id).image += 1
+        img: Union[bytes, str, Image.Image] = message.data  # type: ignore
+        if isinstance(img, Image.Image):
+            image_bytes = await render_in_pool(
+                encode_image, img, _get_pic_format(bot_id)
+            )
+        elif isinstance(img, str) and img.startswith('base64://'):
             image_b64 = img
             image_bytes = b64decode(img[9:])
         elif isinstance(img, str) and img.startswith('link://'):
             if send_type == 'base64':
                 url = img.replace('link://', '')
-                if url in URL_MAP:
-                    image_b64 = URL_MAP[url]
-                else:
-                    resp = await sget(url)
-                    image_b64 = b64encode(resp.content).decode('utf-8')
-                    URL_MAP[url] = image_b64
-                return [Message(type='image', data=image_b64)]
+                image_bytes = await remote_image_cache.get(url)
+                return [MessageSegment.image(image_bytes)]
             else:
                 return [Message(type='image', data=img)]
         else:
             image_bytes = img
     else:
-        if enabled_banlist and message.data:
-            d: str = message.data
-            for ban_word in banlist:
-                if ban_word in message.data:
-                    d = d.replace(ban_word, '*' * len(ban_word))
-            message = Message(type='text', data=d)
+        # 每次读取, 修改配置后即时生效
+        if (
+            message.data
+            and send_security_config.get_config('EnableBanList').data
+        ):
+            message = Message(type='text', data=mask_ban_words(message.data))
         return [message]
 
     assert isinstance(image_bytes, bytes)
@@ -413,41 +436,23 @@ async def markdown_to_template_markdown(
     _message = []
     for m in message:
         if m.type == 'markdown':
-            _t = {}
             if markdown_templates:
-                for mdt in markdown_templates:
-                    match = re.fullmatch(mdt, str(m.data).strip())
-                    if match:
-                        match_para = match.groupdict()
-
-                        _send_group = {}
-                        for i in match_para:
-                            if match_para[i]:
-                                if is_lf:
-                                    send_data = match_para[i].replace(
-                                        '\n', '\r'
-                                    )
-                                else:
-                                    send_data = match_para[i]
-                                _send_group[f'{i}'] = send_data
-
-                        match_values = match.groupdict().values()
-                        size = len([i for i in match_values if i is not None])
-                        if _t == {} or (_t and size >= list(_t.keys())[-1]):
-                            _t[size] = [
-                                markdown_templates[mdt]['template_id'],
-                                _send_group,
-                            ]
-                if _t:
-                    t_values = list(_t.values())[-1]
-
-                    logger.debug(f'[GsCore] MD模板发送使用模板{t_values[0]}')
-                    logger.debug(t_values[1])
+                matched = match_markdown_template(str(m.data).strip())
+                if matched:
+                    template_id, _send_group = matched
+                    if is_lf:
+                        _send_group = {
+                            k: v.replace('\n', '\r')
+                            for k, v in _send_group.items()
+                        }
+
+                    logger.debug(f'[GsCore] MD模板发送使用模板{template_id}')
+                    logger.debug(_send_group)
 
                     _message.extend(
                         MessageSegment.template_markdown(
-                            t_values[0],
-                            t_values[1],
+                            template_id,
+                            _send_group,
                         )
                     )
                 else:
@@ -471,7 +476,6 @@ async def to_markdown(
 ) -> List[Message]:
     _markdown_list = []
     _message: List[Message] = []
-    url = None
     size = None
     send_type = send_pic_config.get_config(bot_id, 'base64').data
 
@@ -485,19 +489,30 @@ async def to_markdown(
     for m in message:
         if m.type == 'image':
             if isinstance(m.data, str):
+                url = None
+                img_size = None
                 if m.data.startswith('link://'):
                     url = m.data.replace('link://', '')
-                    if not size:
+                    img_size = get_url_size(url) or size
+                    if not img_size:
+                        img_size = await _get_url_image_size(url)
+                    if not img_size:
                         logger.warning(
                             '[to_markdown] 你传入了URL图片但并未规定图片大小，'
                             '请在消息列表中额外传入MessageSegment.image_size()!'
                         )
                 elif m.data.startswith('base64://'):
-                    url = await _image_to_url(m.data, send_type, m)
-
-                if url and size:
+                    for i in await _image_to_url(m.data, send_type, m):
+                        if i.type == 'image_size':
+                            img_size = i.data
+                        elif isinstance(i.data, str) and i.data.startswith(
+                            'link://'
+                        ):
+                            url = i.data.replace('link://', '')
+
+                if url and img_size:
                     _markdown_list.append(
-                        f'![图片 #{size[0]}px #{size[1]}px]({url})'
+                        f'![图片 #{img_size[0]}px #{img_size[1]}px]({url})'
                     )
 
         elif m.type == 'text':
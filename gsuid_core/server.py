@@ -12,6 +12,7 @@ from fastapi import WebSocket
 
 from gsuid_core.bot import _Bot
 from gsuid_core.logger import logger
+from gsuid_core.codec import get_codec
 from gsuid_core.utils.plugins_update._plugins import check_start_tool
 from gsuid_core.utils.plugins_config.gs_config import core_plugins_config
 
@@ -148,9 +149,10 @@ class GsServer:
 
     async def connect(self, websocket: WebSocket, bot_id: str) -> _Bot:
         await websocket.accept()
+        codec = get_codec(websocket.query_params.get('format'))
         self.active_ws[bot_id] = websocket
-        self.active_bot[bot_id] = bot = _Bot(bot_id, websocket)
-        logger.info(f'{bot_id}已连接！')
+        self.active_bot[bot_id] = bot = _Bot(bot_id, websocket, codec)
+        logger.info(f'{bot_id}已连接！(消息格式: {codec.format})')
         try:
             _task = [_def() for _def in self.bot_connect_def]
             asyncio.gather(*_task)
@@ -5,25 +5,168 @@ import traceback
 from pathlib import Path
 from copy import deepcopy
 from functools import wraps
-from typing import Dict, List, Tuple, Union, Literal, Callable, Optional
+from typing import (
+    Any,
+    Set,
+    Dict,
+    List,
+    Tuple,
+    Union,
+    Literal,
+    Callable,
+    Optional,
+    FrozenSet,
+)
 
 from gsuid_core.bot import Bot
 from gsuid_core.models import Event
 from gsuid_core.logger import logger
 from gsuid_core.trigger import Trigger
+from gsuid_core.trigger_index import TriggerIndex
 from gsuid_core.config import core_config, plugins_sample
 
+USER_TYPES = ('group', 'direct', 'channel', 'sub_channel')
+# (user_pm, user_type, user_id, group_id)
+EligibleKey = Tuple[int, str, str, Optional[str]]
+
+
+def _to_set(data: List) -> FrozenSet[Any]:
+    _set = frozenset(data)
+    # 空列表和['']均视为未设置白名单
+    if _set == frozenset(['']):
+        return frozenset()
+    return _set
+
+
+class SVRule:
+    __slots__ = (
+        'bit',
+        'enabled',
+        'pm',
+        'user_types',
+        'black_list',
+        'plugins_white_list',
+        'white_list',
+    )
+
+    def __init__(self, sv: SV, bit: int):
+        plugins = sv.plugins
+        self.bit = bit
+        self.enabled: bool = plugins.enabled and sv.enabled
+        self.pm: int = min(plugins.pm, sv.pm)
+
+        user_types: Set[str] = set()
+        for user_type in USER_TYPES:
+            if (
+                plugins.area in ('SV', 'ALL')
+                or (user_type == 'group' and plugins.area == 'GROUP')
+                or (user_type == 'direct' and plugins.area == 'DIRECT')
+            ) and (
+                sv.area == 'ALL'
+                or plugins.area == 'ALL'
+                or (user_type == 'group' and sv.area == 'GROUP')
+                or (user_type == 'direct' and sv.area == 'DIRECT')
+            ):
+                user_types.add(user_type)
+        self.user_types = frozenset(user_types)
+
+        self.black_list = frozenset(plugins.black_list) | frozenset(
+            sv.black_list
+        )
+        self.plugins_white_list = _to_set(plugins.white_list)
+        self.white_list = _to_set(sv.white_list)
+
+    def check(
+        self,
+        user_pm: int,
+        user_type: str,
+        user_id: str,
+        group_id: Optional[str],
+    ) -> bool:
+        if not self.enabled or user_pm > self.pm:
+            return False
+        if user_type not in self.user_types:
+            return False
+        if user_id in self.black_list or group_id in self.black_list:
+            return False
+        for white_list in (self.plugins_white_list, self.white_list):
+            if (
+                white_list
+                and user_id not in white_list
+                and group_id not in white_list
+            ):
+                return False
+        return True
+
 
 class SVList:
     def __init__(self):
         self.lst: Dict[str, SV] = {}
         self.plugins: Dict[str, Plugins] = {}
         self.detail_lst: Dict[Plugins, List[SV]] = {}
+        self.index = TriggerIndex()
+        self.rules: Dict[str, SVRule] = {}
+        self.eligible_cache: Dict[EligibleKey, int] = {}
+        self.eligible_cache_size = 20000
 
     @property
     def get_lst(self):
         return self.lst
 
+    def mark_dirty(self):
+        self.index.is_dirty = True
+        self.rules = {}
+        self.eligible_cache = {}
+
+    def get_eligible(
+        self,
+        user_pm: int,
+        user_type: str,
+        user_id: str,
+        group_id: Optional[str],
+    ) -> int:
+        '''
+        返回当前用户可用SV的位图, 第`SVRule.bit`位为1即该SV可被触发
+
+        结果按(user_pm, user_type, user_id, group_id)缓存,
+        SV/Plugins配置变动后自动失效
+        '''
+        key = (user_pm, user_type, user_id, group_id)
+        if key in self.eligible_cache:
+            return self.eligible_cache[key]
+
+        if not self.rules:
+            self.rules = {
+                name: SVRule(sv, bit)
+                for bit, (name, sv) in enumerate(self.lst.items())
+            }
+
+        bitmap = 0
+        for rule in self.rules.values():
+            if rule.check(user_pm, user_type, user_id, group_id):
+                bitmap |= 1 << rule.bit
+
+        if len(self.eligible_cache) >= self.eligible_cache_size:
+            self.eligible_cache.clear()
+        self.eligible_cache[key] = bitmap
+        return bitmap
+
+    def is_eligible(self, bitmap: int, sv: SV) -> bool:
+        rule = self.rules.get(sv.name)
+        return rule is not None and bool(bitmap >> rule.bit & 1)
+
+    def get_index(self) -> TriggerIndex:
+        if self.index.is_dirty:
+            index = TriggerIndex()
+            for sv in self.lst.values():
+                for _type in sv.TL:
+                    for tr in sv.TL[_type].values():
+                        index.add(tr, sv, sv.priority)
+            index.build()
+            self.index = index
+            logger.debug(f'[触发器索引] 已重建, 共{index.size}个触发器')
+        return self.index
+
 
 SL = SVList()
 config_sv = core_config.get_config('sv')
@@ -129,6 +272,7 @@ class Plugins:
             setattr(self, var, kwargs[var])
             plugin_config[var] = kwargs[var]
         core_config.set_config('plugins', config_plugins)
+        SL.mark_dirty()
 
 
 class SV:
@@ -303,6 +447,7 @@ class SV:
             setattr(self, var, kwargs[var])
             plugin_sv_config[self.name][var] = kwargs[var]
         core_config.set_config('plugins', config_plugins)
+        SL.mark_dirty()
 
     def enable(self):
         self.set(enabled=True)
@@ -375,6 +520,8 @@ class SV:
                         )
                         logger.trace(f'载入{type}触发器【{_k}】!')
 
+            SL.mark_dirty()
+
             @wraps(func)
             async def wrapper(bot: Bot, msg) -> Optional[Callable]:
                 result = await func(bot, msg)
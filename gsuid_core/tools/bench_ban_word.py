@@ -0,0 +1,34 @@
+'''
+违禁词屏蔽的微基准
+
+在仓库根目录运行: python -m gsuid_core.tools.bench_ban_word
+'''
+
+import random
+import timeit
+
+from gsuid_core.utils.ban_word import BanWordMasker
+
+words = [
+    ''.join(random.choices('abcdefghijklmnopqrstuvwxyz', k=k))
+    for k in random.choices(range(2, 8), k=5000)
+]
+text = ' '.join(random.choices(words + ['hello', 'world'] * 5000, k=200))
+masker = BanWordMasker(words)
+
+
+# 修改前: 逐个违禁词在文本中查找并替换
+def naive():
+    d = text
+    for ban_word in words:
+        if ban_word in text:
+            d = d.replace(ban_word, '*' * len(ban_word))
+    return d
+
+
+if __name__ == '__main__':
+    naive_time = timeit.timeit(naive, number=20) / 20 * 1000
+    masker_time = timeit.timeit(lambda: masker.mask(text), number=20) / 20
+    print(f'{len(words)}个违禁词, 文本长度{len(text)}')
+    print(f'逐词替换: {naive_time:.2f}ms')
+    print(f'单次扫描: {masker_time * 1000:.2f}ms')
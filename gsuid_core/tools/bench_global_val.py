@@ -0,0 +1,60 @@
+'''
+单条消息统计开销的微基准
+
+在仓库根目录运行: python -m gsuid_core.tools.bench_global_val
+'''
+
+import timeit
+import asyncio
+from typing import Dict
+from copy import deepcopy
+
+from gsuid_core.global_val import PlatformVal, get_counter, platform_val
+
+N = 100000
+group_ids = [str(i % 1000) for i in range(N)]
+user_ids = [str(i % 5000) for i in range(N)]
+old_val: Dict[str, Dict[str, PlatformVal]] = {}
+
+
+# 修改前: 每条消息await两次get_global_val并逐层判断嵌套字典
+async def old_get_global_val(bot_id: str, bot_self_id: str) -> PlatformVal:
+    if bot_id not in old_val:
+        old_val[bot_id] = {}
+    if bot_self_id not in old_val[bot_id]:
+        old_val[bot_id][bot_self_id] = deepcopy(platform_val)
+    return old_val[bot_id][bot_self_id]
+
+
+async def old_loop():
+    for group_id, user_id in zip(group_ids, user_ids):
+        local_val = await old_get_global_val('bench', 'bench')
+        local_val['receive'] += 1
+        local_val = await old_get_global_val('bench', 'bench')
+        local_val['command'] += 1
+        if group_id not in local_val['group']:
+            local_val['group'][group_id] = {}
+        if 'keyword' not in local_val['group'][group_id]:
+            local_val['group'][group_id]['keyword'] = 1
+        else:
+            local_val['group'][group_id]['keyword'] += 1
+        if user_id not in local_val['user']:
+            local_val['user'][user_id] = {}
+        if 'keyword' not in local_val['user'][user_id]:
+            local_val['user'][user_id]['keyword'] = 1
+        else:
+            local_val['user'][user_id]['keyword'] += 1
+
+
+# 修改后: 同步获取计数器并直接修改属性
+async def new_loop():
+    for group_id, user_id in zip(group_ids, user_ids):
+        get_counter('bench', 'bench').receive += 1
+        get_counter('bench', 'bench').add_command('keyword', group_id, user_id)
+
+
+if __name__ == '__main__':
+    old_time = timeit.timeit(lambda: asyncio.run(old_loop()), number=1)
+    new_time = timeit.timeit(lambda: asyncio.run(new_loop()), number=1)
+    print(f'修改前: {old_time / N * 1e6:.2f}us/条')
+    print(f'修改后: {new_time / N * 1e6:.2f}us/条')
@@ -0,0 +1,181 @@
+from collections import deque
+from typing import Any, Dict, List, Deque, Tuple, Optional
+
+from gsuid_core.models import Event
+from gsuid_core.trigger import Trigger
+
+# (优先级, 载入顺序), 所属SV, 触发器
+IndexEntry = Tuple[Tuple[int, int], Any, Trigger]
+
+
+class _TrieNode:
+    __slots__ = ('children', 'entries', 'fail', 'out')
+
+    def __init__(self):
+        self.children: Dict[str, _TrieNode] = {}
+        self.entries: List[IndexEntry] = []
+        self.fail: Optional[_TrieNode] = None
+        self.out: Tuple[_TrieNode, ...] = ()
+
+    def insert(self, key: str) -> '_TrieNode':
+        node = self
+        for ch in key:
+            child = node.children.get(ch)
+            if child is None:
+                child = node.children[ch] = _TrieNode()
+            node = child
+        return node
+
+
+class TriggerIndex:
+    '''
+    触发器分发索引
+
+    - prefix/command/fullmatch: 以 `前缀+关键词` 建立的前缀树
+    - suffix: 以反转关键词建立的后缀树
+    - keyword: Aho-Corasick 多模式自动机
+    - regex/file: 按插件前缀/文件类型分桶, 仅检查可能命中的触发器
+    '''
+
+    def __init__(self):
+        self.is_dirty = True
+        self.clear()
+
+    def clear(self):
+        self.prefix_trie = _TrieNode()
+        self.suffix_trie = _TrieNode()
+        self.keyword_ac = _TrieNode()
+        self.regex: Dict[str, List[IndexEntry]] = {}
+        self.file: Dict[str, List[IndexEntry]] = {}
+        self.other: List[IndexEntry] = []
+        self.size = 0
+
+    def add(self, trigger: Trigger, owner: Any, priority: int):
+        entry: IndexEntry = ((priority, self.size), owner, trigger)
+        self.size += 1
+
+        if trigger.type in ('prefix', 'command', 'fullmatch'):
+            key = trigger.prefix + trigger.keyword
+            self.prefix_trie.insert(key).entries.append(entry)
+        elif trigger.type == 'suffix':
+            key = trigger.keyword[::-1]
+            self.suffix_trie.insert(key).entries.append(entry)
+        elif trigger.type == 'keyword':
+            self.keyword_ac.insert(trigger.keyword).entries.append(entry)
+        elif trigger.type == 'regex':
+            self.regex.setdefault(trigger.prefix, []).append(entry)
+        elif trigger.type == 'file':
+            self.file.setdefault(trigger.keyword, []).append(entry)
+        else:
+            self.other.append(entry)
+
+    def build(self):
+        # 构建AC自动机的失配指针与输出链
+        root = self.keyword_ac
+        root.fail = root
+        root.out = (root,) if root.entries else ()
+        queue: Deque[_TrieNode] = deque()
+        for child in root.children.values():
+            child.fail = root
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            fail_out = node.fail.out if node.fail else ()
+            node.out = ((node,) + fail_out) if node.entries else fail_out
+            for ch, child in node.children.items():
+                fail = node.fail
+                while fail is not root and ch not in fail.children:
+                    fail = fail.fail  # type: ignore
+                child.fail = fail.children.get(ch, root)  # type: ignore
+                queue.append(child)
+
+        self.is_dirty = False
+
+    def match(self, ev: Event) -> List[IndexEntry]:
+        msg = ev.raw_text
+        hits: List[IndexEntry] = []
+
+        self._match_prefix(msg, hits)
+        self._match_suffix(msg, hits)
+        self._match_keyword(msg, hits)
+
+        for prefix in self.regex:
+            if msg.startswith(prefix):
+                for entry in self.regex[prefix]:
+                    if entry[2].check_command(ev):
+                        hits.append(entry)
+
+        if ev.file and ev.file_name:
+            for entry in self.file.get(ev.file_name.split('.')[-1], []):
+                if entry[2].check_command(ev):
+                    hits.append(entry)
+
+        for entry in self.other:
+            if entry[2].check_command(ev):
+                hits.append(entry)
+
+        if not ev.is_tome:
+            hits = [entry for entry in hits if not entry[2].to_me]
+
+        hits.sort(key=lambda x: x[0])
+        return hits
+
+    def _match_prefix(self, msg: str, hits: List[IndexEntry]):
+        node = self.prefix_trie
+        length = len(msg)
+        depth = 0
+        while True:
+            for entry in node.entries:
+                _type = entry[2].type
+                if _type == 'command':
+                    hits.append(entry)
+                elif _type == 'fullmatch':
+                    if depth == length:
+                        hits.append(entry)
+                elif depth != length:
+                    hits.append(entry)
+
+            if depth == length:
+                break
+            node = node.children.get(msg[depth])
+            if node is None:
+                break
+            depth += 1
+
+    def _match_suffix(self, msg: str, hits: List[IndexEntry]):
+        node = self.suffix_trie
+        length = len(msg)
+        depth = 0
+        while True:
+            for entry in node.entries:
+                trigger = entry[2]
+                if (
+                    msg.startswith(trigger.prefix)
+                    and msg != trigger.prefix + trigger.keyword
+                ):
+                    hits.append(entry)
+
+            if depth == length:
+                break
+            node = node.children.get(msg[length - depth - 1])
+            if node is None:
+                break
+            depth += 1
+
+    def _match_keyword(self, msg: str, hits: List[IndexEntry]):
+        root = self.keyword_ac
+        found: Dict[int, _TrieNode] = {id(n): n for n in root.out}
+
+        node = root
+        for ch in msg:
+            while node is not root and ch not in node.children:
+                node = node.fail  # type: ignore
+            node = node.children.get(ch, root)
+            for out in node.out:
+                found[id(out)] = out
+
+        for out in found.values():
+            for entry in out.entries:
+                if msg.startswith(entry[2].prefix):
+                    hits.append(entry)
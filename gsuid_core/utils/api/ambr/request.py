@@ -10,7 +10,8 @@ from typing import Dict, Union, Literal, Optional, cast
 
 import aiofiles
 from PIL import Image
-from httpx import AsyncClient
+
+from gsuid_core.utils.http_client import get_client
 
 from ..types import AnyDict
 from ..utils import _HEADER, cache_data
@@ -188,18 +189,18 @@ async def get_ambr_icon(
         async with aiofiles.open(file_path, 'rb') as f:
             return Image.open(BytesIO(await f.read()))
 
-    async with AsyncClient(timeout=None) as client:
-        req = await client.get(
-            url,
-            headers=_HEADER,
-        )
-        if req.status_code == 200:
-            content = req.read()
-            async with aiofiles.open(file_path, 'wb') as f:
-                await f.write(content)
-            return Image.open(BytesIO(content))
-        else:
-            return Image.new('RGBA', (256, 256), (0, 0, 0))
+    req = await get_client().get(
+        url,
+        headers=_HEADER,
+        timeout=None,
+    )
+    if req.status_code == 200:
+        content = req.read()
+        async with aiofiles.open(file_path, 'wb') as f:
+            await f.write(content)
+        return Image.open(BytesIO(content))
+    else:
+        return Image.new('RGBA', (256, 256), (0, 0, 0))
 
 
 async def _ambr_request(
@@ -209,11 +210,15 @@ async def _ambr_request(
     params: Optional[AnyDict] = None,
     data: Optional[AnyDict] = None,
 ) -> Optional[AnyDict]:
-    async with AsyncClient(timeout=None) as client:
-        req = await client.request(
-            method, url=url, headers=header, params=params, json=data
-        )
-        data = req.json()
-        if data and 'code' in data:
-            data['response'] = data['code']
-        return data
+    req = await get_client().request(
+        method,
+        url=url,
+        headers=header,
+        params=params,
+        json=data,
+        timeout=None,
+    )
+    data = req.json()
+    if data and 'code' in data:
+        data['response'] = data['code']
+    return data
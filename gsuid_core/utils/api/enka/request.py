@@ -6,7 +6,7 @@ from __future__ import annotations
 
 from typing import Literal
 
-from httpx import AsyncClient
+from gsuid_core.utils.http_client import get_client
 
 from ..utils import _HEADER
 from .models import EnkaData
@@ -29,10 +29,10 @@ async def get_enka_info(
     Returns:
         EnkaData: Enka Network 响应数据
     '''  # noqa: E501
-    async with AsyncClient(
-        base_url=ADDRESS[address],
+    client = get_client(base_url=ADDRESS[address])
+    req = await client.get(
+        url=f'/api/uid/{uid}',
         headers=_HEADER,
         timeout=None,
-    ) as client:
-        req = await client.get(url=f'/api/uid/{uid}')
-        return req.json()
+    )
+    return req.json()
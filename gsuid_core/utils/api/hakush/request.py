@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from typing import Dict, Union, Literal, Optional, cast
 
-from httpx import AsyncClient
+from gsuid_core.utils.http_client import get_client
 
 from ..types import AnyDict
 from ..utils import _HEADER
@@ -54,9 +54,13 @@ async def _hakush_request(
     params: Optional[AnyDict] = None,
     data: Optional[AnyDict] = None,
 ) -> Optional[AnyDict]:
-    async with AsyncClient(timeout=None) as client:
-        req = await client.request(
-            method, url=url, headers=header, params=params, json=data
-        )
-        data = req.json()
-        return data
+    req = await get_client().request(
+        method,
+        url=url,
+        headers=header,
+        params=params,
+        json=data,
+        timeout=None,
+    )
+    data = req.json()
+    return data
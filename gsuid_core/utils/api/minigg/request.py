@@ -12,7 +12,7 @@ from enum import Enum
 from pathlib import Path
 from typing import Any, Dict, List, Union, Literal, Optional, cast, overload
 
-from httpx import AsyncClient
+from gsuid_core.utils.http_client import get_client
 
 from ..types import AnyDict
 from ..utils import cache_data
@@ -96,15 +96,15 @@ async def get_map_data(
     Returns:
         bytes: 图片。
     '''
-    async with AsyncClient(timeout=None) as client:
-        req = await client.get(
-            url=MINIGG_MAP_URL,
-            params={
-                'resource_name': resource_name,
-                'map_id': map_id,
-                'is_cluster': is_cluster,
-            },
-        )
+    req = await get_client().get(
+        url=MINIGG_MAP_URL,
+        params={
+            'resource_name': resource_name,
+            'map_id': map_id,
+            'is_cluster': is_cluster,
+        },
+        timeout=None,
+    )
     if req.headers['content-type'] == 'image/jpeg':
         return req.content
     else:
@@ -125,15 +125,15 @@ async def get_audio_info(
         str: 语音 URL。
     '''
     warnings.warn('Audio API is already deprecated.', DeprecationWarning)
-    async with AsyncClient(timeout=None) as client:
-        req = await client.get(
-            url=MINIGG_AUDIO_URL,
-            params={
-                'characters': name,
-                'audioid': audio_id,
-                'language': language,
-            },
-        )
+    req = await get_client().get(
+        url=MINIGG_AUDIO_URL,
+        params={
+            'characters': name,
+            'audioid': audio_id,
+            'language': language,
+        },
+        timeout=None,
+    )
     return req.text
 
 
@@ -170,18 +170,18 @@ async def minigg_request(
     }
     if match_categories:
         params['matchCategories'] = '1'
-    async with AsyncClient(base_url=MINIGG_URL, timeout=1.3) as client:
-        req = await client.get(endpoint, params=params)
-        try:
-            data = req.json()
-        except json.decoder.JSONDecodeError:
-            return -11
-        if 'retcode' in data:
-            retcode: int = data['retcode']
-            return retcode
-        if req.status_code == 404:
-            raise MiniggNotFoundError(**data)
-        return data
+    client = get_client(base_url=MINIGG_URL)
+    req = await client.get(endpoint, params=params, timeout=1.3)
+    try:
+        data = req.json()
+    except json.decoder.JSONDecodeError:
+        return -11
+    if 'retcode' in data:
+        retcode: int = data['retcode']
+        return retcode
+    if req.status_code == 404:
+        raise MiniggNotFoundError(**data)
+    return data
 
 
 @cache_data
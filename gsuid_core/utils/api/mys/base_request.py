@@ -15,8 +15,10 @@ import httpx
 from gsuid_core.bot import call_bot
 from gsuid_core.logger import logger
 from gsuid_core.utils.database.api import DBSqla
-from gsuid_core.utils.database.models import GsUID, GsUser
+from gsuid_core.utils.database.models import GsUser
+from gsuid_core.utils.http_client import get_client
 from gsuid_core.utils.database.utils import SR_SERVER, ZZZ_SERVER
+from gsuid_core.utils.database.mys_context import mys_context_cache
 from gsuid_core.utils.database.utils import SERVER as RECOGNIZE_SERVER
 from gsuid_core.utils.plugins_config.gs_config import core_plugins_config
 
@@ -79,8 +81,8 @@ class BaseMysApi:
         uid: str,
         game_name: Optional[str] = None,
     ):
-        uid = await GsUID.get_main_uid(uid, game_name)
-        return uid
+        ctx = await mys_context_cache.get(uid, game_name)
+        return ctx.main_uid
 
     @abstractmethod
     async def get_ck(
@@ -117,9 +119,8 @@ class BaseMysApi:
                 condition=condition,
             )
         else:
-            return await GsUser.get_user_cookie_by_uid(
-                uid, game_name=game_name
-            )
+            ctx = await mys_context_cache.get(uid, game_name)
+            return ctx.cookie
 
     async def get_stoken(
         self, uid: str, game_name: Optional[str] = None
@@ -130,12 +131,8 @@ class BaseMysApi:
     async def get_user_fp(
         self, uid: str, game_name: Optional[str] = None
     ) -> Optional[str]:
-        uid = await self.get_uid(uid, game_name)
-        data = await GsUser.get_user_attr_by_uid(
-            uid,
-            'fp',
-            game_name,
-        )
+        ctx = await mys_context_cache.get(uid, game_name)
+        uid, data = ctx.main_uid, ctx.fp
         if data is None:
             seed_id, seed_time = self.get_seed()
             device_id = self.get_device_id()
@@ -150,12 +147,8 @@ class BaseMysApi:
     async def get_user_device_id(
         self, uid: str, game_name: Optional[str] = None
     ) -> Optional[str]:
-        uid = await self.get_uid(uid, game_name)
-        data = await GsUser.get_user_attr_by_uid(
-            uid,
-            'device_id',
-            game_name,
-        )
+        ctx = await mys_context_cache.get(uid, game_name)
+        uid, data = ctx.main_uid, ctx.device_id
         if data is None:
             data = self.get_device_id()
             await GsUser.update_data_by_uid_without_bot_id(
@@ -269,7 +262,7 @@ class BaseMysApi:
             "simState": "5",
             "ramRemain": "239814",
             "appUpdateTimeDiff": 1702604034882,
-            "deviceInfo": f"XiaoMi {info["device_name"]}OP5913L1: 13SKQ1.221119.001T.118e6c7 - 5aa23 - 73911: userrelease - keys",
+            "deviceInfo": f"XiaoMi {info['device_name']}OP5913L1: 13SKQ1.221119.001T.118e6c7 - 5aa23 - 73911: userrelease - keys",
             "vaid": "",
             "buildType": "user",
             "sdkVersion": "34",
@@ -293,7 +286,7 @@ class BaseMysApi:
             "debugStatus": 1,
             "ramCapacity": "469679",
             "magnetometer": "20.081251x-27.457501x2.1937501",
-            "display": f"{info["product"]}_13.1.0.181(CN01)",
+            "display": f"{info['product']}_13.1.0.181(CN01)",
             "appInstallTimeDiff": 1688455751496,
             "packageVersion": self.mysVersion,
             "gyroscope": "0.030226856x-0.014647375x-0.0013732915",
@@ -508,128 +501,119 @@ class BaseMysApi:
         else:
             proxy = None
 
-        async with httpx.AsyncClient(
-            verify=ssl_verify,
-            proxies=proxy,
-            base_url=base_url,
-        ) as client:
-            raw_data = {}
-            uid = None
-            if params and 'role_id' in params:
-                uid = params['role_id']
-            elif data and 'role_id' in data:
-                uid = data['role_id']
-            elif params and 'uid' in params:
-                uid = params['uid']
-
-            if uid is not None:
-                device_id = await self.get_user_device_id(
-                    uid,
-                    game_name,
-                )
-                header['x-rpc-device_fp'] = await self.get_user_fp(
-                    uid,
-                    game_name,
-                )
-                if device_id is not None:
-                    header['x-rpc-device_id'] = device_id
+        client = get_client(proxy, ssl_verify, base_url)
+        raw_data = {}
+        uid = None
+        if params and 'role_id' in params:
+            uid = params['role_id']
+        elif data and 'role_id' in data:
+            uid = data['role_id']
+        elif params and 'uid' in params:
+            uid = params['uid']
+
+        if uid is not None:
+            device_id = await self.get_user_device_id(
+                uid,
+                game_name,
+            )
+            header['x-rpc-device_fp'] = await self.get_user_fp(
+                uid,
+                game_name,
+            )
+            if device_id is not None:
+                header['x-rpc-device_id'] = device_id
 
-                dfp: Optional[str] = await GsUser.get_user_attr_by_uid(
-                    uid, 'device_info', 'sr' if self.is_sr else game_name
+            ctx = await mys_context_cache.get(
+                uid, 'sr' if self.is_sr else game_name
+            )
+            dfp = ctx.device_info
+            if dfp is not None:
+                df = dfp.split('/')
+                header['User-Agent'] = (
+                    f"Mozilla/5.0 (Linux; Android 13; {df[1]} {df[3]}"
+                    "; wv)AppleWebKit/537.36 (KHTML, like Gecko) "
+                    "Version/4.0 Chrome/104.0.5112.97"
+                    f"Mobile Safari/537.36 miHoYoBBS/2{mys_version}"
                 )
-                if dfp is not None:
-                    df = dfp.split('/')
-                    header['User-Agent'] = (
-                        f"Mozilla/5.0 (Linux; Android 13; {df[1]} {df[3]}"
-                        "; wv)AppleWebKit/537.36 (KHTML, like Gecko) "
-                        "Version/4.0 Chrome/104.0.5112.97"
-                        f"Mobile Safari/537.36 miHoYoBBS/2{mys_version}"
-                    )
 
-            logger.debug(header)
-            for _ in range(2):
-                try:
-                    resp = await client.request(
-                        method,
-                        url=url,
-                        headers=header,
-                        params=params,
-                        json=data,
-                        timeout=300,
+        logger.debug(header)
+        for _ in range(2):
+            try:
+                resp = await client.request(
+                    method,
+                    url=url,
+                    headers=header,
+                    params=params,
+                    json=data,
+                    timeout=300,
+                )
+            except httpx.ConnectError:
+                await call_bot().send('[mys_request] 请求连接错误...')
+                continue
+            except:  # noqa
+                await call_bot().send('[mys_request] 请求错误, 请检查日志！')
+                continue
+
+            try:
+                raw_data = resp.json()
+            except (
+                httpx.ConnectError,
+                httpx.RequestError,
+                json.decoder.JSONDecodeError,
+            ):
+                _raw_data = resp.text
+                raw_data = {'retcode': -999, 'data': _raw_data}
+
+            logger.debug(raw_data)
+
+            # 判断retcode
+            if 'retcode' in raw_data:
+                retcode = raw_data['retcode']
+            elif 'code' in raw_data:
+                retcode = raw_data['code']
+            else:
+                retcode = 0
+
+            # 做特殊处理
+            if retcode in _DEAD_CODE:
+                if uid:
+                    header['x-rpc-challenge_game'] = '6' if self.is_sr else '2'
+                    header['x-rpc-page'] = (
+                        'v1.4.1-rpg_#/rpg' if self.is_sr else 'v4.1.5-ys_#ys'
                     )
-                except httpx.ConnectError:
-                    await call_bot().send('[mys_request] 请求连接错误...')
-                    continue
-                except:  # noqa
-                    await call_bot().send(
-                        '[mys_request] 请求错误, 请检查日志！'
+                    header['x-rpc-tool-verison'] = (
+                        'v1.4.1-rpg' if self.is_sr else 'v4.1.5-ys'
                     )
-                    continue
-
-                try:
-                    raw_data = resp.json()
-                except (
-                    httpx.ConnectError,
-                    httpx.RequestError,
-                    json.decoder.JSONDecodeError,
-                ):
-                    _raw_data = resp.text
-                    raw_data = {'retcode': -999, 'data': _raw_data}
-
-                logger.debug(raw_data)
-
-                # 判断retcode
-                if 'retcode' in raw_data:
-                    retcode = raw_data['retcode']
-                elif 'code' in raw_data:
-                    retcode = raw_data['code']
-                else:
-                    retcode = 0
-
-                # 做特殊处理
-                if retcode in _DEAD_CODE:
-                    if uid:
-                        header['x-rpc-challenge_game'] = (
-                            '6' if self.is_sr else '2'
-                        )
-                        header['x-rpc-page'] = (
-                            'v1.4.1-rpg_#/rpg'
-                            if self.is_sr
-                            else 'v4.1.5-ys_#ys'
-                        )
-                        header['x-rpc-tool-verison'] = (
-                            'v1.4.1-rpg' if self.is_sr else 'v4.1.5-ys'
-                        )
 
-                    if core_plugins_config.get_config('MysPass').data:
-                        pass_header = copy.deepcopy(header)
-                        vl, ch = await self._upass(pass_header)
-                        if vl == '':
-                            return ch
-                        else:
-                            header['x-rpc-challenge'] = ch
-                            header['x-rpc-validate'] = vl
-                            header['x-rpc-seccode'] = f'{vl}|jordan'
-
-                    if 'DS' in header:
-                        if isinstance(params, Dict):
-                            q = '&'.join(
-                                [
-                                    f'{k}={v}'
-                                    for k, v in sorted(
+                if core_plugins_config.get_config('MysPass').data:
+                    pass_header = copy.deepcopy(header)
+                    vl, ch = await self._upass(pass_header)
+                    if vl == '':
+                        return ch
+                    else:
+                        header['x-rpc-challenge'] = ch
+                        header['x-rpc-validate'] = vl
+                        header['x-rpc-seccode'] = f'{vl}|jordan'
+
+                if 'DS' in header:
+                    if isinstance(params, Dict):
+                        q = '&'.join(
+                            [
+                                f'{k}={v}'
+                                for k, v in sorted(
                                     params.items(),
                                     key=lambda x: x[0],
                                 )
-                                ]
-                            )
-                        else:
-                            q = ''
-                        header['DS'] = get_ds_token(q, data)
-
-                    logger.debug(f'[米游社请求] Header: {header}')
-                elif retcode != 0:
-                    return retcode
-                else:
-                    return raw_data
+                            ]
+                        )
+                    else:
+                        q = ''
+                    header['DS'] = get_ds_token(q, data)
+
+                logger.debug(f'[米游社请求] Header: {header}')
+            elif retcode != 0:
+                return retcode
             else:
-                return -999
+                return raw_data
+        else:
+            return -999
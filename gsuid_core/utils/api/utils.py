@@ -1,46 +1,177 @@
-import json
+import time
+import asyncio
+import hashlib
+import inspect
 from pathlib import Path
-from typing import TypeVar, Callable, Optional, Awaitable
+from collections import OrderedDict
+from functools import wraps, partial
+from typing import (
+    Any,
+    Set,
+    Dict,
+    Tuple,
+    TypeVar,
+    Callable,
+    Optional,
+    Awaitable,
+)
 
 import aiofiles
+from msgspec import DecodeError
+from msgspec import json as msgjson
 
+from gsuid_core.logger import logger
 from gsuid_core.version import __version__
 from gsuid_core.data_store import data_cache_path
 
 T = TypeVar('T')
 _HEADER = {'User-Agent': f'gsuid-utils/{__version__}'}
 
+# 默认缓存有效期(秒), 过期后先返回旧数据并在后台刷新
+DEFAULT_TTL = 3 * 86400
+# 内存中最多保存的缓存文件数
+MEMORY_CACHE_SIZE = 1024
 
-def cache_data(func: Callable[..., Awaitable[T]]):
+# 缓存文件路径: (写入时间, 原始JSON)
+_memory: 'OrderedDict[str, Tuple[float, bytes]]' = OrderedDict()
+_refreshing: Set[str] = set()
+_bg_tasks: Set[asyncio.Task] = set()
+
+
+def _get_cache_file(
+    func: Callable,
+    sig: inspect.Signature,
+    args: Tuple,
+    kwargs: Dict[str, Any],
+) -> Path:
+    id = (
+        kwargs.get(
+            'id', kwargs.get('name', args[0] if args else func.__name__)
+        )
+        or func.__name__
+    )
+    cache_dir: Path = (
+        kwargs.get('cache_path', data_cache_path) or data_cache_path
+    )
+    cache_path = cache_dir / func.__name__
+    cache_path.mkdir(parents=True, exist_ok=True)
+
+    # 除首个参数外, 与默认值不同的参数也计入缓存键
+    extra = []
+    try:
+        bound = sig.bind(*args, **kwargs)
+    except TypeError:
+        bound = None
+    if bound is not None:
+        for index, (k, v) in enumerate(bound.arguments.items()):
+            if index == 0 or k in ('id', 'name', 'cache_path'):
+                continue
+            if v != sig.parameters[k].default:
+                extra.append(f'{k}={v!r}')
+
+    if extra:
+        digest = hashlib.sha1(','.join(extra).encode()).hexdigest()[:10]
+        return cache_path / f'{id}_{digest}.json'
+    return cache_path / f'{id}.json'
+
+
+def _remember(key: str, item: Tuple[float, bytes]):
+    _memory[key] = item
+    _memory.move_to_end(key)
+    while len(_memory) > MEMORY_CACHE_SIZE:
+        _memory.popitem(last=False)
+
+
+async def _load(cache_file: Path) -> Optional[Tuple[float, bytes]]:
+    key = str(cache_file)
+    item = _memory.get(key)
+    if item is not None:
+        _memory.move_to_end(key)
+        return item
+
+    try:
+        mtime = cache_file.stat().st_mtime
+    except OSError:
+        return None
+    async with aiofiles.open(cache_file, 'rb') as file:
+        item = (mtime, await file.read())
+    _remember(key, item)
+    return item
+
+
+async def _fetch(
+    func: Callable[..., Awaitable[T]],
+    cache_file: Path,
+    args: Tuple,
+    kwargs: Dict[str, Any],
+) -> T:
+    # 如果没有缓存，调用原始函数获取数据
+    result = await func(*args, **kwargs)
+
+    # 仅缓存成功获取的数据, 错误码与None不缓存
+    if isinstance(result, (dict, list)):
+        raw = msgjson.encode(result)
+        async with aiofiles.open(cache_file, 'wb') as file:
+            await file.write(raw)
+        _remember(str(cache_file), (time.time(), raw))
+    return result
+
+
+async def _refresh(
+    func: Callable[..., Awaitable[Any]],
+    cache_file: Path,
+    args: Tuple,
+    kwargs: Dict[str, Any],
+):
+    try:
+        await _fetch(func, cache_file, args, kwargs)
+    except Exception as e:
+        logger.warning(f'[GsCore][数据缓存] 刷新{cache_file.name}失败: {e}')
+    finally:
+        _refreshing.discard(str(cache_file))
+
+
+def cache_data(
+    func: Optional[Callable[..., Awaitable[T]]] = None,
+    *,
+    ttl: float = DEFAULT_TTL,
+):
+    '''
+    :说明:
+      将函数返回的JSON数据缓存至内存与磁盘, 可直接`@cache_data`使用,
+      或`@cache_data(ttl=...)`指定有效期。
+
+      超过有效期的数据仍会立即返回, 同时在后台重新获取并更新缓存。
+    :参数:
+      * ttl (float): 缓存有效期(秒)。
+    '''
+    if func is None:
+        return partial(cache_data, ttl=ttl)
+
+    sig = inspect.signature(func)
+
+    @wraps(func)
     async def wrapper(*args, **kwargs) -> Optional[T]:
-        id = (
-            kwargs.get(
-                'id', kwargs.get('name', args[0] if args else func.__name__)
+        cache_file = _get_cache_file(func, sig, args, kwargs)
+        item = await _load(cache_file)
+        if item is None:
+            return await _fetch(func, cache_file, args, kwargs)
+
+        key = str(cache_file)
+        if time.time() - item[0] > ttl and key not in _refreshing:
+            _refreshing.add(key)
+            task = asyncio.create_task(
+                _refresh(func, cache_file, args, kwargs)
             )
-            or func.__name__
-        )
-        cache_dir: Path = (
-            kwargs.get('cache_path', data_cache_path) or data_cache_path
-        )
-        cache_path = cache_dir / func.__name__
-        cache_path.mkdir(parents=True, exist_ok=True)
-
-        if cache_path and cache_path.exists() and cache_path.is_dir():
-            cache_file = cache_path / f'{id}.json'
-            if cache_file.exists():
-                async with aiofiles.open(cache_file, 'r') as file:
-                    data = await file.read()
-                    return json.loads(data)  # 返回已缓存的数据
-
-        # 如果没有缓存，调用原始函数获取数据
-        result = await func(*args, **kwargs)
-
-        # 如果获取了数据，保存到缓存文件
-        if cache_path and cache_path.exists() and cache_path.is_dir():
-            cache_file = cache_path / f'{id}.json'
-            async with aiofiles.open(cache_file, 'w') as file:
-                await file.write(json.dumps(result))
-
-        return result
+            _bg_tasks.add(task)
+            task.add_done_callback(_bg_tasks.discard)
+
+        # 每次返回新解析的对象, 调用方修改结果不会污染缓存
+        try:
+            return msgjson.decode(item[1])  # 返回已缓存的数据
+        except DecodeError:
+            logger.warning(f'[GsCore][数据缓存] {cache_file.name}已损坏')
+            _memory.pop(key, None)
+            return await _fetch(func, cache_file, args, kwargs)
 
     return wrapper
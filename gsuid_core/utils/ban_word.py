@@ -0,0 +1,89 @@
+import re
+from typing import Dict, List, Optional
+
+from gsuid_core.utils.plugins_config.gs_config import send_security_config
+
+# 全角ASCII转半角, 英文字母统一小写, 每个字符一一对应以保证替换位置不变
+NORMALIZE_TABLE = {
+    **{i: i + 0x20 for i in range(ord('A'), ord('Z') + 1)},
+    **{i: i - 0xFEE0 for i in range(0xFF01, 0xFF5F)},
+    **{i: i - 0xFEE0 + 0x20 for i in range(0xFF21, 0xFF3B)},
+    0x3000: 0x20,
+}
+
+
+def _trie_pattern(node: Dict[str, Dict]) -> str:
+    alts = [
+        re.escape(char) + _trie_pattern(child)
+        for char, child in sorted(node.items())
+        if char
+    ]
+    if not alts:
+        return ''
+    body = alts[0] if len(alts) == 1 else f'(?:{"|".join(alts)})'
+    # 当前节点已是完整的词时, 后续部分可选且优先匹配更长的词
+    return f'(?:{body})?' if '' in node else body
+
+
+class BanWordMasker:
+    '''
+    违禁词屏蔽
+
+    将全部违禁词构建为前缀树形式的单个正则, 每段文本只需扫描一遍,
+    同一位置优先屏蔽最长的违禁词
+    '''
+
+    def __init__(self, words: List[str], normalize: bool = False):
+        self.normalize = normalize
+        trie: Dict[str, Dict] = {}
+        for word in words:
+            if normalize:
+                word = word.translate(NORMALIZE_TABLE)
+            if not word:
+                continue
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[''] = {}
+
+        self.pattern = re.compile(_trie_pattern(trie)) if trie else None
+
+    def mask(self, text: str) -> str:
+        if self.pattern is None:
+            return text
+
+        target = text.translate(NORMALIZE_TABLE) if self.normalize else text
+        result = []
+        last = 0
+        for match in self.pattern.finditer(target):
+            start, end = match.span()
+            result.append(text[last:start])
+            result.append('*' * (end - start))
+            last = end
+
+        if not result:
+            return text
+        result.append(text[last:])
+        return ''.join(result)
+
+
+_masker: Optional[BanWordMasker] = None
+_source: Optional[List[str]] = None
+_source_normalize = False
+
+
+def mask_ban_words(text: str) -> str:
+    '''按配置`BanList`屏蔽文本中的违禁词, 配置变更后自动重建'''
+    global _masker, _source, _source_normalize
+
+    words = send_security_config.get_config('BanList').data
+    normalize = send_security_config.get_config('BanListNormalize').data
+    if (
+        _masker is None
+        or words is not _source
+        or normalize != _source_normalize
+    ):
+        _masker = BanWordMasker(words, normalize)
+        _source = words
+        _source_normalize = normalize
+    return _masker.mask(text)
@@ -1,48 +1,126 @@
-import random
+import time
 import asyncio
+from typing import Dict, List, Tuple, Literal
 
 from gsuid_core.gss import gss
 from gsuid_core.logger import logger
+from gsuid_core.models import Message
+from gsuid_core.segment import convert_message
+from gsuid_core.utils.rate_limit import TokenBucket
+from gsuid_core.utils.plugins_config.gs_config import core_plugins_config
 
 from .models import BoardCastMsgDict
 
+boardcast_rate: int = core_plugins_config.get_config(
+    'BoardCastRatePerMinute'
+).data
+
+# 单条消息发送失败后的最大重试次数, 第n次重试前等待2^n秒
+MAX_RETRY = 3
+
+# (目标类型, 目标ID, 平台bot_id, 消息)
+SendJob = Tuple[Literal['direct', 'group'], str, str, List[Message]]
+
+
+def route_bot(platform: str) -> List[str]:
+    '''找出收到过该平台消息的连接, 未知时退回为全部连接'''
+    owner = [
+        bot_id
+        for bot_id, bot in gss.active_bot.items()
+        if platform in bot.platforms
+    ]
+    return owner or list(gss.active_bot)
+
 
 async def send_board_cast_msg(msgs: BoardCastMsgDict):
     logger.info('[推送] 任务启动...')
-    private_msg_list = msgs['private_msg_dict']
-    group_msg_list = msgs['group_msg_dict']
-    # 执行私聊推送
-    for qid in private_msg_list:
-        try:
-            for bot_id in gss.active_bot:
-                for single in private_msg_list[qid]:
-                    await gss.active_bot[bot_id].target_send(
-                        single['messages'],
-                        'direct',
-                        qid,
-                        single['bot_id'],
-                        '',
-                        '',
-                    )
-        except Exception as e:
-            logger.warning(f'[推送] {qid} 私聊推送失败!错误信息:{e}')
-        await asyncio.sleep(0.5)
-    logger.info('[推送] 私聊推送完成!')
-
-    # 执行群聊推送
-    for gid in group_msg_list:
-        try:
-            for bot_id in gss.active_bot:
-                await gss.active_bot[bot_id].target_send(
-                    group_msg_list[gid]['messages'],
-                    'group',
-                    gid,
-                    group_msg_list[gid]['bot_id'],
+    start_time = time.perf_counter()
+
+    jobs: List[SendJob] = []
+    for qid, private_msgs in msgs['private_msg_dict'].items():
+        for single in private_msgs:
+            jobs.append(('direct', qid, single['bot_id'], single['messages']))
+    for gid, group_msg in msgs['group_msg_dict'].items():
+        jobs.append(('group', gid, group_msg['bot_id'], group_msg['messages']))
+
+    # 按所属连接分配到各自的发送队列
+    lanes: Dict[str, List[SendJob]] = {}
+    for job in jobs:
+        for bot_id in route_bot(job[2]):
+            lanes.setdefault(bot_id, []).append(job)
+
+    # 同一消息对同一平台只转换一次
+    # 以消息列表的id为键: msgs在推送期间持有全部列表, id不会被复用
+    # 内容相同但为不同列表对象的消息仍会各自转换一次
+    converted: Dict[Tuple[int, str], asyncio.Task] = {}
+    stats = {'success': 0, 'failed': 0}
+
+    await asyncio.gather(
+        *[
+            _send_lane(bot_id, lane, converted, stats)
+            for bot_id, lane in lanes.items()
+        ]
+    )
+    logger.info(
+        f'[推送] 任务结束! 共{len(jobs)}个目标, 成功{stats["success"]}条, '
+        f'失败{stats["failed"]}条, 耗时{time.perf_counter() - start_time:.1f}秒'
+    )
+
+
+async def _send_lane(
+    bot_id: str,
+    lane: List[SendJob],
+    converted: Dict[Tuple[int, str], asyncio.Task],
+    stats: Dict[str, int],
+):
+    bucket = TokenBucket(boardcast_rate / 60)
+    for index, (target_type, target_id, platform, messages) in enumerate(
+        lane, 1
+    ):
+        key = (id(messages), platform)
+
+        for retry in range(MAX_RETRY + 1):
+            bot = gss.active_bot.get(bot_id)
+            if bot is None:
+                logger.warning(f'[推送] {bot_id} 已断开连接, 停止推送...')
+                stats['failed'] += len(lane) - index + 1
+                return
+
+            if key not in converted:
+                converted[key] = asyncio.create_task(
+                    convert_message(messages, platform, '')
+                )
+            task = converted[key]
+
+            await bucket.acquire()
+            try:
+                try:
+                    message = await task
+                except Exception:
+                    # 转换失败时移除缓存, 重试时重新转换
+                    if converted.get(key) is task:
+                        del converted[key]
+                    raise
+                await bot.target_send(
+                    message,
+                    target_type,
+                    target_id,
+                    platform,
                     '',
                     '',
+                    is_converted=True,
                 )
-        except Exception as e:
-            logger.warning(f'[推送] 群 {gid} 推送失败!错误信息:{e}')
-        await asyncio.sleep(0.5 + random.randint(1, 3))
-    logger.info('[推送] 群聊推送完成!')
-    logger.info('[推送] 任务结束!')
+                stats['success'] += 1
+                break
+            except Exception as e:
+                if retry == MAX_RETRY:
+                    logger.warning(
+                        f'[推送] {target_type} {target_id} 推送失败!'
+                        f'错误信息:{e}'
+                    )
+                    stats['failed'] += 1
+                else:
+                    await asyncio.sleep(2 ** (retry + 1))
+
+        if index % 20 == 0 or index == len(lane):
+            logger.info(f'[推送] [{bot_id}] 进度 {index}/{len(lane)}')
@@ -1,176 +1,283 @@
+import sys
 import time
 import base64
+import asyncio
+import hashlib
 import inspect
 from pathlib import Path
 from functools import wraps
-from typing import Dict, List, Tuple, Union
+from collections import OrderedDict
+from typing import Any, Dict, Tuple, Optional
 
 import aiofiles
 from PIL import Image
 
 from gsuid_core.logger import logger
 from gsuid_core.data_store import get_res_path
-from gsuid_core.utils.image.convert import convert_img, convert_img_sync
+from gsuid_core.utils.image.render_pool import render_in_pool
+from gsuid_core.utils.image.convert import img_to_jpeg, convert_img_sync
 
 IMAGE_CACHE = get_res_path('IMAGE_CACHE')
 
-CACHE: Dict[float, Dict[str, Union[Path, str]]] = {}
-
-
-def gs_cache(expire_time=3600):
-    global CACHE
+# 后台清理过期缓存的间隔(秒)
+SWEEP_INTERVAL = 600
+# 不属于任何已注册函数的磁盘缓存(如旧版本遗留)的保留时间(秒)
+ORPHAN_EXPIRE_TIME = 86400
+
+_MISS = object()
+
+_caches: Dict[str, 'FuncCache'] = {}
+_sweeper: Optional[asyncio.Task] = None
+
+
+def canonical(arg: Any) -> Any:
+    '''将参数转换为稳定可哈希的形式, 无法识别的对象仅保留类型名'''
+    if arg is None or isinstance(arg, (str, int, float, bool)):
+        return arg
+    if isinstance(arg, Path):
+        return ('Path', str(arg))
+    if isinstance(arg, (list, tuple)):
+        return tuple(canonical(i) for i in arg)
+    if isinstance(arg, dict):
+        return tuple(
+            sorted(
+                ((str(k), canonical(v)) for k, v in arg.items()),
+                key=lambda x: x[0],
+            )
+        )
+    if isinstance(arg, (set, frozenset)):
+        return tuple(sorted(repr(canonical(i)) for i in arg))
+    return f'<{type(arg).__name__}>'
+
+
+def make_key(args: Tuple, kwargs: Dict[str, Any]) -> str:
+    raw = repr((canonical(args), canonical(kwargs)))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class FuncCache:
+    '''
+    单个函数的缓存
+
+    内存中按LRU保存编码后的结果, 总大小超过`max_bytes`时淘汰最久未使用的条目;
+    图片结果同时写入磁盘, 内存淘汰或重启后仍可在过期前从磁盘读取
+    '''
+
+    def __init__(self, name: str, expire_time: float, max_bytes: int):
+        self.name = name
+        self.prefix = hashlib.sha1(name.encode()).hexdigest()[:10]
+        self.expire_time = expire_time
+        self.max_bytes = max_bytes
+        # key: (过期时间, 值, 大小)
+        self.data: 'OrderedDict[str, Tuple[float, Any, int]]' = OrderedDict()
+        self.size = 0
+        self.stats = {'hit': 0, 'disk_hit': 0, 'miss': 0, 'evict': 0}
+
+    def get(self, key: str) -> Any:
+        item = self.data.get(key)
+        if item is None:
+            return _MISS
+        if item[0] < time.time():
+            self.pop(key)
+            return _MISS
+        self.data.move_to_end(key)
+        self.stats['hit'] += 1
+        return item[1]
+
+    def put(self, key: str, value: Any, expire_at: Optional[float] = None):
+        if isinstance(value, (str, bytes)):
+            size = len(value)
+        else:
+            size = sys.getsizeof(value)
+        if size > self.max_bytes:
+            return
+
+        self.pop(key)
+        if expire_at is None:
+            expire_at = time.time() + self.expire_time
+        self.data[key] = (expire_at, value, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            self.pop(next(iter(self.data)))
+            self.stats['evict'] += 1
+
+    def pop(self, key: str):
+        item = self.data.pop(key, None)
+        if item is not None:
+            self.size -= item[2]
+
+    def purge(self):
+        now = time.time()
+        for key in [k for k, v in self.data.items() if v[0] < now]:
+            self.pop(key)
+
+    def disk_path(self, key: str) -> Path:
+        return IMAGE_CACHE / f'{self.prefix}_{key}.jpg'
+
+    def disk_expire_at(self, path: Path) -> Optional[float]:
+        '''磁盘缓存有效时返回其过期时间'''
+        try:
+            expire_at = path.stat().st_mtime + self.expire_time
+        except OSError:
+            return None
+        return expire_at if expire_at > time.time() else None
+
+
+def to_image_bytes(result: Any) -> Optional[bytes]:
+    if isinstance(result, Image.Image):
+        return img_to_jpeg(result)
+    elif isinstance(result, bytes):
+        return result
+    elif isinstance(result, str) and result.startswith('base64://'):
+        return base64.b64decode(result[9:])
+    return None
+
+
+def to_base64(data: bytes) -> str:
+    return f'base64://{base64.b64encode(data).decode()}'
+
+
+def get_cache_stats() -> Dict[str, Dict[str, int]]:
+    return {
+        cache.name: {
+            **cache.stats,
+            'size': len(cache.data),
+            'bytes': cache.size,
+        }
+        for cache in _caches.values()
+    }
+
+
+def sweep_disk_cache():
+    now = time.time()
+    for path in IMAGE_CACHE.iterdir():
+        cache = _caches.get(path.name.split('_')[0])
+        expire_time = cache.expire_time if cache else ORPHAN_EXPIRE_TIME
+        try:
+            if now - path.stat().st_mtime > expire_time:
+                path.unlink()
+        except OSError:
+            continue
+
+
+async def _sweep_loop():
+    loop = asyncio.get_running_loop()
+    while True:
+        for cache in _caches.values():
+            cache.purge()
+        try:
+            await loop.run_in_executor(None, sweep_disk_cache)
+        except Exception as e:
+            logger.warning(f'[GsCore][缓存] 清理磁盘缓存失败: {e}')
+        await asyncio.sleep(SWEEP_INTERVAL)
+
+
+def _start_sweeper():
+    global _sweeper
+    if _sweeper is not None and not _sweeper.done():
+        return
+    try:
+        _sweeper = asyncio.get_running_loop().create_task(_sweep_loop())
+    except RuntimeError:
+        pass
+
+
+def gs_cache(
+    expire_time: float = 3600,
+    max_bytes: int = 32 * 1024 * 1024,
+):
+    '''
+    :说明:
+      缓存函数的返回值, 参数相同时直接返回缓存。
+
+      图片结果(`Image.Image`、bytes、base64)会同时存入磁盘,
+      命中缓存时统一返回`base64://`格式的字符串。
+    :参数:
+      * expire_time (float): 缓存有效时间(秒)。
+      * max_bytes (int): 该函数内存缓存的最大字节数。
+    '''
 
     def wrapper(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+        cache = FuncCache(name, expire_time, max_bytes)
+        _caches[cache.prefix] = cache
 
-        is_coroutine = inspect.iscoroutinefunction(func)
-
-        if is_coroutine:
+        if inspect.iscoroutinefunction(func):
 
             @wraps(func)
             async def inner_async(*args, **kwargs):
-                time_key = time.time()
-                all_args = list(args) + list(kwargs.values())
-                file_key = ''
-                for arg in all_args:
-                    if isinstance(arg, (str, int, float, bool, Tuple, Path)):
-                        file_key += '_' + repr(arg)
-                    elif isinstance(arg, (Dict, List)):
-                        file_key += '_' + str(hash(arg))
-                    else:
-                        continue
-
-                if not file_key:
-                    file_key = repr(func.__name__)
-
-                result = _value = None
-                WILL_DELETE = []
-
-                logger.trace(f'{func.__name__} 开始缓存...')
-                logger.trace(CACHE)
-
-                for key in CACHE:
-                    value = CACHE[key]
-                    if time_key - key <= expire_time:
-                        if file_key in value:
-                            _value = value[file_key]
-                            logger.trace(f'{func.__name__} 命中缓存 {_value}')
-                            break
-                    else:
-                        WILL_DELETE.append(key)
+                _start_sweeper()
+                key = make_key(args, kwargs)
+                value = cache.get(key)
+                if value is not _MISS:
+                    logger.trace(f'{func.__name__} 命中缓存 {key}')
+                    return value
+
+                path = cache.disk_path(key)
+                expire_at = cache.disk_expire_at(path)
+                if expire_at is not None:
+                    async with aiofiles.open(path, 'rb') as f:
+                        value = to_base64(await f.read())
+                    cache.put(key, value, expire_at)
+                    cache.stats['disk_hit'] += 1
+                    return value
+
+                cache.stats['miss'] += 1
+                result = await func(*args, **kwargs)
+                if result is None:
+                    return result
+
+                if isinstance(result, Image.Image):
+                    data = await render_in_pool(img_to_jpeg, result)
                 else:
-                    result = await func(*args, **kwargs)
-
-                if WILL_DELETE:
-                    for key in WILL_DELETE:
-                        if key in CACHE:
-                            del CACHE[key]
-
-                if _value is not None:
-                    if isinstance(_value, Path):
-                        result = await convert_img(_value)
-                    else:
-                        result = _value
-                elif result is not None:
-                    img_data = None
-                    cache_target = IMAGE_CACHE / f'{time_key}_{file_key}.jpg'
-                    if isinstance(result, Image.Image):
-                        result.save(cache_target)
-                    elif isinstance(result, bytes):
-                        img_data = result
-                    elif isinstance(result, str) and result.startswith(
-                        'base64://'
-                    ):
-                        img_data = base64.b64decode(result[9:])
-                    else:
-                        cache_target = result
-
-                    if img_data:
-                        async with aiofiles.open(cache_target, 'wb') as f:
-                            await f.write(img_data)
-
-                    if time_key not in CACHE:
-                        CACHE[time_key] = {}
-                    if file_key not in CACHE[time_key]:
-                        CACHE[time_key][file_key] = cache_target
-
-                    logger.trace(f'{func.__name__} 进入缓存...')
+                    data = to_image_bytes(result)
 
+                if data is None:
+                    cache.put(key, result)
+                else:
+                    async with aiofiles.open(path, 'wb') as f:
+                        await f.write(data)
+                    cache.put(key, to_base64(data))
+                logger.trace(f'{func.__name__} 进入缓存...')
                 return result
 
+            inner_async.cache = cache  # type: ignore
             return inner_async
         else:
 
             @wraps(func)
             def inner_sync(*args, **kwargs):
-                time_key = time.time()
-                all_args = list(args) + list(kwargs.values())
-                file_key = ''
-                for arg in all_args:
-                    if isinstance(arg, (str, int, float, bool, Tuple, Path)):
-                        file_key += '_' + repr(arg)
-                    elif isinstance(arg, (Dict, List)):
-                        file_key += '_' + str(hash(arg))
-                    else:
-                        continue
-
-                if not file_key:
-                    file_key = repr(func.__name__)
-
-                result = _value = None
-                WILL_DELETE = []
-
-                logger.trace(f'{func.__name__} 开始缓存...')
-                logger.trace(CACHE)
-
-                for key in CACHE:
-                    value = CACHE[key]
-                    if time_key - key <= expire_time:
-                        if file_key in value:
-                            _value = value[file_key]
-                            logger.trace(f'{func.__name__} 命中缓存 {_value}')
-                            break
-                    else:
-                        WILL_DELETE.append(key)
+                _start_sweeper()
+                key = make_key(args, kwargs)
+                value = cache.get(key)
+                if value is not _MISS:
+                    logger.trace(f'{func.__name__} 命中缓存 {key}')
+                    return value
+
+                path = cache.disk_path(key)
+                expire_at = cache.disk_expire_at(path)
+                if expire_at is not None:
+                    value = convert_img_sync(path)
+                    cache.put(key, value, expire_at)
+                    cache.stats['disk_hit'] += 1
+                    return value
+
+                cache.stats['miss'] += 1
+                result = func(*args, **kwargs)
+                if result is None:
+                    return result
+
+                data = to_image_bytes(result)
+                if data is None:
+                    cache.put(key, result)
                 else:
-                    result = func(*args, **kwargs)
-
-                if WILL_DELETE:
-                    for key in WILL_DELETE:
-                        if key in CACHE:
-                            del CACHE[key]
-
-                if _value is not None:
-                    if isinstance(_value, Path):
-                        result = convert_img_sync(_value)
-                    else:
-                        result = _value
-                elif result is not None:
-                    img_data = None
-                    cache_target = IMAGE_CACHE / f'{time_key}_{file_key}.jpg'
-                    if isinstance(result, Image.Image):
-                        result.save(cache_target)
-                    elif isinstance(result, bytes):
-                        img_data = result
-                    elif isinstance(result, str) and result.startswith(
-                        'base64://'
-                    ):
-                        img_data = base64.b64decode(result[9:])
-                    else:
-                        cache_target = result
-
-                    if img_data:
-                        with open(cache_target, 'wb') as f:
-                            f.write(img_data)
-
-                    if time_key not in CACHE:
-                        CACHE[time_key] = {}
-                    if file_key not in CACHE[time_key]:
-                        CACHE[time_key][file_key] = cache_target
-
-                    logger.trace(f'{func.__name__} 进入缓存...')
-
+                    with open(path, 'wb') as f:
+                        f.write(data)
+                    cache.put(key, to_base64(data))
+                logger.trace(f'{func.__name__} 进入缓存...')
                 return result
 
+            inner_sync.cache = cache  # type: ignore
             return inner_sync
 
     return wrapper
@@ -1,14 +1,20 @@
+import asyncio
 from functools import wraps
+from contextvars import ContextVar
+from contextlib import asynccontextmanager
 from typing_extensions import ParamSpec, Concatenate
 from typing import (
     Any,
     Dict,
     List,
     Type,
+    Tuple,
     TypeVar,
     Callable,
+    Iterable,
     Optional,
     Awaitable,
+    AsyncIterator,
 )
 
 from sqlalchemy.sql.expression import func, null, true
@@ -16,6 +22,7 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.asyncio import async_sessionmaker  # type: ignore
 from sqlmodel import Field, SQLModel, col, and_, delete, select, update
 
+from gsuid_core.logger import logger
 from gsuid_core.data_store import get_res_path
 from gsuid_core.utils.plugins_config.gs_config import database_config
 
@@ -85,15 +92,93 @@ except:  # noqa: E722
     )
 
 
+# 当前协程所在工作单元的会话, 以及创建该会话的任务
+_ambient_session: ContextVar[
+    Optional[Tuple[AsyncSession, Optional[asyncio.Task]]]
+] = ContextVar('_ambient_session', default=None)
+
+# 批量查询时单条语句最多携带的参数个数, SQLite默认上限为999
+BATCH_SIZE = 500
+
+
+def _current_session() -> Optional[AsyncSession]:
+    ambient = _ambient_session.get()
+    # 子任务会继承上下文, 但同一会话不能被多个任务并发使用
+    if ambient is None or ambient[1] is not asyncio.current_task():
+        return None
+    return ambient[0]
+
+
+def after_commit(callback: Callable[..., Any], *args: Any):
+    '''📝简单介绍:
+
+    在当前事务结束后调用`callback(*args)`, 不在事务中时立即调用
+
+    用于清理缓存等操作, 若在提交前执行, 其他协程可能读到旧数据并重新缓存;
+    同一事务内相同的回调只会执行一次
+    '''
+    session = _current_session()
+    if session is None:
+        callback(*args)
+    else:
+        session.info.setdefault('after_commit', {})[(callback, args)] = None
+
+
+def _run_after_commit(session: AsyncSession):
+    for callback, args in session.info.pop('after_commit', {}):
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.exception(f'[GsCore] [数据库] 事务回调执行失败: {e}')
+
+
+@asynccontextmanager
+async def unit_of_work() -> AsyncIterator[AsyncSession]:
+    '''📝简单介绍:
+
+        开启一个工作单元, 范围内所有`with_session`方法共用同一个会话与事务
+
+        退出时统一提交, 出现异常则整体回滚; 嵌套使用时复用外层的工作单元
+
+        事务结束后再执行其中登记的`after_commit`回调(包括`on_data_change`)
+
+    🚀使用范例:
+
+        `async with unit_of_work():`
+            `await GsBind.insert_uid(...)`
+            `await GsUser.update_data_by_uid(...)`
+
+    ✅返回值:
+
+        🔸`AsyncSession`: 当前工作单元的会话
+    '''
+    session = _current_session()
+    if session is not None:
+        yield session
+        return
+
+    async with async_maker() as session:
+        token = _ambient_session.set((session, asyncio.current_task()))
+        try:
+            yield session
+            await session.commit()
+        finally:
+            _ambient_session.reset(token)
+            _run_after_commit(session)
+
+
 def with_session(
     func: Callable[Concatenate[Any, AsyncSession, P], Awaitable[R]]
 ) -> Callable[Concatenate[Any, P], Awaitable[R]]:
     @wraps(func)
     async def wrapper(self, *args: P.args, **kwargs: P.kwargs):
-        async with async_maker() as session:
-            data = await func(self, session, *args, **kwargs)
-            await session.commit()
-            return data
+        session = _current_session()
+        if session is not None:
+            # 已处于工作单元中, 由最外层负责提交
+            return await func(self, session, *args, **kwargs)
+
+        async with unit_of_work() as session:
+            return await func(self, session, *args, **kwargs)
 
     return wrapper  # type: ignore
 
@@ -130,6 +215,15 @@ class BaseIDModel(SQLModel):
         else:
             return 'uid'
 
+    @classmethod
+    def on_data_change(
+        cls, uid: Optional[str] = None, game_name: Optional[str] = None
+    ):
+        '''数据写入所在的事务结束后调用, 子类可覆写该方法以清理相关缓存
+
+        传入`uid`时仅该uid的数据发生变动, 否则视为任意数据都可能变动
+        '''
+
     @classmethod
     @with_session
     async def full_insert_data(cls, session: AsyncSession, **data) -> int:
@@ -151,6 +245,7 @@ class BaseIDModel(SQLModel):
             🔸`int`: 恒为0
         '''
         session.add(cls(**data))
+        after_commit(cls.on_data_change)
         return 0
 
     @classmethod
@@ -167,6 +262,7 @@ class BaseIDModel(SQLModel):
         '''
         if cls.data_exist(**data):
             await session.delete(cls(**data))
+            after_commit(cls.on_data_change)
             return 1
         else:
             return 0
@@ -247,6 +343,99 @@ class BaseIDModel(SQLModel):
         '''
         return bool(await cls.base_select_data(**data))
 
+    @classmethod
+    @with_session
+    async def select_many(
+        cls: Type[T_BaseIDModel],
+        session: AsyncSession,
+        values: Iterable[Any],
+        column: str = 'uid',
+        **data,
+    ) -> List[T_BaseIDModel]:
+        '''📝简单介绍:
+
+            数据库基类批量选择数据方法, 一次查询出`column`列在`values`中的全部数据
+
+        🌱参数:
+
+            🔹values (`Iterable[Any]`):
+                    要查找的值, 过多时会分批查询
+
+            🔹column (`str`, 默认是 `uid`):
+                    查找的列名
+
+            🔹`**data`
+                    额外的筛选条件, 入参列名等于数据即可
+
+        🚀使用范例:
+
+            `await GsUser.select_many(['100740568', '100740569'])`
+
+        ✅返回值:
+
+            🔸`List[T_BaseIDModel]`: 选中全部符合条件的数据, 没有则为`[]`
+        '''
+        values = list(dict.fromkeys(values))
+        result: List[T_BaseIDModel] = []
+        for i in range(0, len(values), BATCH_SIZE):
+            chunk = values[i : i + BATCH_SIZE]  # noqa: E203
+            stmt = select(cls).where(col(getattr(cls, column)).in_(chunk))
+            for k, v in data.items():
+                stmt = stmt.where(getattr(cls, k) == v)
+            result.extend((await session.execute(stmt)).scalars().all())
+        return result
+
+    @classmethod
+    @with_session
+    async def bulk_upsert(
+        cls: Type[T_BaseIDModel],
+        session: AsyncSession,
+        rows: List[Dict[str, Any]],
+        by: str = 'uid',
+    ) -> int:
+        '''📝简单介绍:
+
+            数据库基类批量插入或更新数据方法
+
+            按`by`列查找已有数据, 存在则更新, 不存在则插入, 全部在同一事务中完成
+
+        🌱参数:
+
+            🔹rows (`List[Dict[str, Any]]`):
+                    要写入的数据列表, 每项都需包含`by`列
+
+            🔹by (`str`, 默认是 `uid`):
+                    用于判断数据是否已存在的列名
+
+        🚀使用范例:
+
+            `await GsPush.bulk_upsert([{'bot_id': 'onebot', 'uid': '1'}])`
+
+        ✅返回值:
+
+            🔸`int`: 新插入的数据条数
+        '''
+        exist: Dict[Any, List[T_BaseIDModel]] = {}
+        for row in await cls.select_many([i[by] for i in rows], by):
+            exist.setdefault(getattr(row, by), []).append(row)
+
+        inserted = 0
+        for item in rows:
+            targets = exist.get(item[by])
+            if targets:
+                for target in targets:
+                    for k, v in item.items():
+                        setattr(target, k, v)
+            else:
+                new = cls(**item)
+                session.add(new)
+                exist[item[by]] = [new]
+                inserted += 1
+
+        if rows:
+            after_commit(cls.on_data_change)
+        return inserted
+
 
 class BaseBotIDModel(BaseIDModel):
     bot_id: str = Field(title='平台')
@@ -287,6 +476,7 @@ class BaseBotIDModel(BaseIDModel):
             query = sql.values(**data)
             query.execution_options(synchronize_session='fetch')
             await session.execute(query)
+            after_commit(cls.on_data_change, uid, game_name)
             return 0
         return -1
 
@@ -325,6 +515,7 @@ class BaseBotIDModel(BaseIDModel):
             query = sql.values(**data)
             query.execution_options(synchronize_session='fetch')
             await session.execute(query)
+            after_commit(cls.on_data_change)
             return 0
         return -1
 
@@ -378,9 +569,66 @@ class BaseBotIDModel(BaseIDModel):
             query = sql.values(**data)
             query.execution_options(synchronize_session='fetch')
             await session.execute(query)
+            after_commit(cls.on_data_change, uid, game_name)
             return 0
         return -1
 
+    @classmethod
+    @with_session
+    async def bulk_update_by_uid(
+        cls,
+        session: AsyncSession,
+        data: Dict[str, Dict[str, Any]],
+        bot_id: Optional[str] = None,
+        game_name: Optional[str] = None,
+    ) -> int:
+        '''📝简单介绍:
+
+            基类方法，`update_data_by_uid`的批量版本
+
+            一次查询全部`uid`, 存在的数据更新, 不存在的插入, 全部在同一事务中完成
+
+        🌱参数:
+
+            🔹data (`Dict[str, Dict[str, Any]]`)
+                    `uid`到要修改数据的映射
+
+            🔹bot_id (`Optional[str]`, 默认是 `None`)
+                    根据该入参寻找相应数据
+
+            🔹game_name (`Optional[str]`, 默认是 `None`)
+                    根据该入参修改寻找列名
+
+        🚀使用范例:
+
+            `await GsUser.bulk_update_by_uid({'100740568': {'status': None}})`
+
+        ✅返回值:
+
+            🔸`int`: 新插入的数据条数
+        '''
+        uid_name = cls.get_gameid_name(game_name)
+        exist: Dict[str, List[BaseBotIDModel]] = {}
+        for row in await cls.select_many(data, uid_name):
+            exist.setdefault(getattr(row, uid_name), []).append(row)
+
+        inserted = 0
+        for uid, values in data.items():
+            if uid not in exist:
+                session.add(cls(bot_id=bot_id, **{uid_name: uid, **values}))
+                inserted += 1
+                continue
+
+            for row in exist[uid]:
+                if bot_id is None or row.bot_id == bot_id:
+                    for k, v in values.items():
+                        setattr(row, k, v)
+            after_commit(cls.on_data_change, uid, game_name)
+
+        if inserted:
+            after_commit(cls.on_data_change)
+        return inserted
+
     @classmethod
     @with_session
     async def get_all_data(
@@ -507,6 +755,7 @@ class BaseModel(BaseBotIDModel):
             await cls.update_data(user_id, bot_id, **data)
         else:
             session.add(cls(user_id=user_id, bot_id=bot_id, **data))
+            after_commit(cls.on_data_change)
         return 0
 
     @classmethod
@@ -539,6 +788,7 @@ class BaseModel(BaseBotIDModel):
             🔸`int`: 恒为0
         '''
         await session.delete(cls(user_id=user_id, bot_id=bot_id, **data))
+        after_commit(cls.on_data_change)
         return 0
 
     @classmethod
@@ -580,6 +830,7 @@ class BaseModel(BaseBotIDModel):
             query = sql.values(**update_data)
             query.execution_options(synchronize_session='fetch')
             await session.execute(query)
+            after_commit(cls.on_data_change)
             return 0
         return -1
 
@@ -622,6 +873,7 @@ class BaseModel(BaseBotIDModel):
             query = sql.values(**data)
             query.execution_options(synchronize_session='fetch')
             await session.execute(query)
+            after_commit(cls.on_data_change)
             return 0
         return -1
 
@@ -1146,6 +1398,7 @@ class User(BaseModel):
             .values(status=mark)
         )
         await session.execute(sql)
+        after_commit(cls.on_data_change)
         return True
 
     @classmethod
@@ -1406,6 +1659,7 @@ class User(BaseModel):
                 getattr(cls, cls.get_gameid_name(game_name)) == uid
             )
             await session.execute(sql)
+            after_commit(cls.on_data_change, uid, game_name)
             return True
         return False
 
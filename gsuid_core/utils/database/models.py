@@ -1,8 +1,8 @@
-from typing import List, Type, Optional
+from typing import List, Type, Tuple, Iterable, Optional
 
 from sqlalchemy import or_
-from sqlmodel import Field, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import Field, col, select, update
 
 from .base_models import (
     Bind,
@@ -11,6 +11,7 @@ from .base_models import (
     Cache,
     BaseIDModel,
     BaseBotIDModel,
+    after_commit,
     with_session,
 )
 
@@ -131,6 +132,34 @@ class CoreUser(BaseBotIDModel, table=True):
 
         return 1
 
+    @classmethod
+    @with_session
+    async def insert_user_batch(
+        cls,
+        session: AsyncSession,
+        users: Iterable[Tuple[str, str, Optional[str]]],
+    ) -> int:
+        '''批量写入(bot_id, user_id, group_id), 已存在的记录会被跳过'''
+        users = set(users)
+        if not users:
+            return 0
+
+        user_ids = list({i[1] for i in users})
+        exists = set()
+        for i in range(0, len(user_ids), 500):
+            stmt = select(cls.bot_id, cls.user_id, cls.group_id).where(
+                col(cls.user_id).in_(user_ids[i : i + 500])  # noqa: E203
+            )
+            result = await session.execute(stmt)
+            exists.update(tuple(row) for row in result.all())
+
+        new_users = users - exists
+        session.add_all(
+            cls(bot_id=bot_id, user_id=user_id, group_id=group_id)
+            for bot_id, user_id, group_id in new_users
+        )
+        return len(new_users)
+
 
 class CoreGroup(BaseBotIDModel, table=True):
     __table_args__ = {'extend_existing': True}
@@ -180,6 +209,34 @@ class CoreGroup(BaseBotIDModel, table=True):
             )
         return 1
 
+    @classmethod
+    @with_session
+    async def insert_group_batch(
+        cls,
+        session: AsyncSession,
+        groups: Iterable[Tuple[str, str]],
+    ) -> int:
+        '''批量写入(bot_id, group_id), 已存在的记录会被跳过'''
+        groups = set(groups)
+        if not groups:
+            return 0
+
+        group_ids = list({i[1] for i in groups})
+        exists = set()
+        for i in range(0, len(group_ids), 500):
+            stmt = select(cls.bot_id, cls.group_id).where(
+                col(cls.group_id).in_(group_ids[i : i + 500])  # noqa: E203
+            )
+            result = await session.execute(stmt)
+            exists.update(tuple(row) for row in result.all())
+
+        new_groups = groups - exists
+        session.add_all(
+            cls(bot_id=bot_id, group_id=group_id)
+            for bot_id, group_id in new_groups
+        )
+        return len(new_groups)
+
 
 class GsBind(Bind, table=True):
     __table_args__ = {'extend_existing': True}
@@ -258,6 +315,15 @@ class GsUser(User, table=True):
         schema_extra={'json_schema_extra': {'hint': 'mys设备登陆'}},
     )
 
+    @classmethod
+    def on_data_change(
+        cls, uid: Optional[str] = None, game_name: Optional[str] = None
+    ):
+        # 延迟导入, mys_context依赖本模块
+        from .mys_context import mys_context_cache
+
+        mys_context_cache.invalidate(uid, game_name)
+
 
 class GsCache(Cache, table=True):
     __table_args__ = {'extend_existing': True}
@@ -313,6 +379,15 @@ class GsUID(BaseIDModel, table=True):
     uid_3: Optional[str] = Field(title='UID3', default=None)
     uid_4: Optional[str] = Field(title='UID4', default=None)
 
+    @classmethod
+    def on_data_change(
+        cls, uid: Optional[str] = None, game_name: Optional[str] = None
+    ):
+        # 延迟导入, mys_context依赖本模块
+        from .mys_context import mys_context_cache
+
+        mys_context_cache.invalidate()
+
     @classmethod
     @with_session
     async def _get_main_uid(
@@ -387,5 +462,6 @@ class GsUID(BaseIDModel, table=True):
             query = sql.values(**data)
             query.execution_options(synchronize_session='fetch')
             await session.execute(query)
+            after_commit(cls.on_data_change)
             return 0
         return -1
@@ -0,0 +1,133 @@
+import time
+from typing import Dict, Tuple, Optional
+
+from sqlmodel import col, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import GsUID, GsUser
+from .base_models import with_session
+
+CONTEXT_TTL = 300
+MAX_CONTEXT_SIZE = 10000
+
+ContextKey = Tuple[str, Optional[str]]
+
+
+class MysContext:
+    '''单个uid发起米游社请求时所需的数据'''
+
+    __slots__ = (
+        'main_uid',
+        'device_id',
+        'fp',
+        'device_info',
+        'cookie',
+        'expire',
+    )
+
+    def __init__(
+        self,
+        main_uid: str,
+        device_id: Optional[str] = None,
+        fp: Optional[str] = None,
+        device_info: Optional[str] = None,
+        cookie: Optional[str] = None,
+    ):
+        self.main_uid = main_uid
+        self.device_id = device_id
+        self.fp = fp
+        self.device_info = device_info
+        self.cookie = cookie
+        self.expire = time.monotonic() + CONTEXT_TTL
+
+
+class MysContextCache:
+    '''
+    米游社请求上下文缓存
+
+    以(uid, game_name)为键缓存主UID、device_id、fp、device_info与该uid的Cookie,
+    未命中时在同一会话内一次性读取, `GsUser`/`GsUID`写入时自动失效
+    '''
+
+    def __init__(self):
+        self.data: Dict[ContextKey, MysContext] = {}
+        self.version = 0
+
+    async def get(
+        self, uid: str, game_name: Optional[str] = None
+    ) -> MysContext:
+        key = (uid, game_name)
+        ctx = self.data.get(key)
+        if ctx is not None and ctx.expire > time.monotonic():
+            return ctx
+
+        version = self.version
+        ctx = await self._load(uid, game_name)
+        # 读取期间发生过写入则不缓存, 避免存入旧数据
+        if version == self.version:
+            if len(self.data) >= MAX_CONTEXT_SIZE:
+                self.data.clear()
+            self.data[key] = ctx
+        return ctx
+
+    @with_session
+    async def _load(
+        self,
+        session: AsyncSession,
+        uid: str,
+        game_name: Optional[str] = None,
+    ) -> MysContext:
+        stmt = (
+            select(GsUID.main_uid)
+            .where(
+                or_(
+                    GsUID.main_uid == uid,
+                    GsUID.uid_1 == uid,
+                    GsUID.uid_2 == uid,
+                    GsUID.uid_3 == uid,
+                    GsUID.uid_4 == uid,
+                )
+            )
+            .where(GsUID.game_name == game_name)
+            .limit(1)
+        )
+        main_uid = (await session.execute(stmt)).scalar() or uid
+
+        uid_column = getattr(GsUser, GsUser.get_gameid_name(game_name))
+        stmt = select(
+            uid_column,
+            GsUser.device_id,
+            GsUser.fp,
+            GsUser.device_info,
+            GsUser.cookie,
+        ).where(col(uid_column).in_({uid, main_uid}))
+        rows: Dict[str, Tuple] = {}
+        for row_uid, *row in (await session.execute(stmt)).all():
+            rows.setdefault(row_uid, tuple(row))
+
+        # 设备信息跟随主UID, Cookie仍按传入的uid读取
+        main_row = rows.get(main_uid)
+        own_row = rows.get(uid)
+        ctx = MysContext(main_uid, *(main_row[:3] if main_row else ()))
+        ctx.cookie = own_row[3] if own_row else None
+        return ctx
+
+    def invalidate(
+        self, uid: Optional[str] = None, game_name: Optional[str] = None
+    ):
+        self.version += 1
+        if uid is None:
+            self.data.clear()
+            return
+
+        uid_name = GsUser.get_gameid_name(game_name)
+        for key in [
+            k
+            for k, ctx in self.data.items()
+            if uid in (k[0], ctx.main_uid)
+            and GsUser.get_gameid_name(k[1]) == uid_name
+        ]:
+            del self.data[key]
+
+
+mys_context_cache = MysContextCache()
@@ -0,0 +1,88 @@
+import asyncio
+from typing import Set, Tuple, Optional
+
+from gsuid_core.logger import logger
+from gsuid_core.server import on_core_shutdown
+
+from .models import CoreUser, CoreGroup
+
+FLUSH_INTERVAL = 5
+MAX_SEEN_SIZE = 500000
+
+UserKey = Tuple[str, str, Optional[str]]
+GroupKey = Tuple[str, str]
+
+
+class CoreDataBuffer:
+    '''
+    CoreUser/CoreGroup 的写回缓冲
+
+    已见过的用户/群直接跳过, 新出现的记录暂存后每隔`FLUSH_INTERVAL`秒批量写入
+    '''
+
+    def __init__(self):
+        self.seen_user: Set[UserKey] = set()
+        self.seen_group: Set[GroupKey] = set()
+        self.pending_user: Set[UserKey] = set()
+        self.pending_group: Set[GroupKey] = set()
+        self.task: Optional[asyncio.Task] = None
+        self.lock: Optional[asyncio.Lock] = None
+
+    def add(self, bot_id: str, user_id: str, group_id: Optional[str]):
+        user = (bot_id, user_id, group_id)
+        if user not in self.seen_user:
+            self.seen_user.add(user)
+            self.pending_user.add(user)
+
+        if group_id:
+            group = (bot_id, group_id)
+            if group not in self.seen_group:
+                self.seen_group.add(group)
+                self.pending_group.add(group)
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception(f'[GsCore][数据库] 批量写入用户/群失败: {e}')
+
+    async def flush(self):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+
+        async with self.lock:
+            users, self.pending_user = self.pending_user, set()
+            groups, self.pending_group = self.pending_group, set()
+
+            try:
+                if users:
+                    n = await CoreUser.insert_user_batch(users)
+                    logger.debug(f'[GsCore][数据库] 批量写入{n}个新用户')
+                if groups:
+                    n = await CoreGroup.insert_group_batch(groups)
+                    logger.debug(f'[GsCore][数据库] 批量写入{n}个新群组')
+            except Exception:
+                # 写入失败则放回, 下次重试
+                self.pending_user |= users
+                self.pending_group |= groups
+                raise
+
+            if len(self.seen_user) > MAX_SEEN_SIZE:
+                self.seen_user.clear()
+            if len(self.seen_group) > MAX_SEEN_SIZE:
+                self.seen_group.clear()
+
+
+core_data_buffer = CoreDataBuffer()
+
+
+@on_core_shutdown
+async def flush_core_data_buffer():
+    if core_data_buffer.task is not None:
+        core_data_buffer.task.cancel()
+    await core_data_buffer.flush()
@@ -10,6 +10,7 @@ import aiohttp
 from bs4 import BeautifulSoup
 
 from gsuid_core.logger import logger
+from gsuid_core.utils.http_client import get_client
 
 from .download_file import download
 
@@ -18,24 +19,24 @@ NOW_SPEED_TEST = False
 
 
 async def check_url(tag: str, url: str):
-    async with httpx.AsyncClient() as client:
-        try:
-            start_time = time.time()
-            response = await client.get(url)
-            elapsed_time = time.time() - start_time
-            if response.status_code == 200:
-                if 'Index of /' in response.text:
-                    logger.debug(f'{tag} {url} 延时: {elapsed_time}')
-                    return tag, url, elapsed_time
-                else:
-                    logger.info(f'{tag} {url} 未超时但失效...')
-                    return tag, url, float('inf')
+    client = get_client()
+    try:
+        start_time = time.time()
+        response = await client.get(url)
+        elapsed_time = time.time() - start_time
+        if response.status_code == 200:
+            if 'Index of /' in response.text:
+                logger.debug(f'{tag} {url} 延时: {elapsed_time}')
+                return tag, url, elapsed_time
             else:
-                logger.info(f'{tag} {url} 超时...')
+                logger.info(f'{tag} {url} 未超时但失效...')
                 return tag, url, float('inf')
-        except aiohttp.ClientError:
+        else:
             logger.info(f'{tag} {url} 超时...')
             return tag, url, float('inf')
+    except aiohttp.ClientError:
+        logger.info(f'{tag} {url} 超时...')
+        return tag, url, float('inf')
 
 
 async def find_fastest_url(urls: Dict[str, str]):
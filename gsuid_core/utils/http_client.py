@@ -0,0 +1,166 @@
+import asyncio
+import inspect
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Any, Dict, Tuple, Callable, Optional, AsyncIterator
+
+import httpx
+
+from gsuid_core.logger import logger
+from gsuid_core.utils.plugins_config.gs_config import core_plugins_config
+
+max_connections: int = core_plugins_config.get_config(
+    'HttpMaxConnections'
+).data
+max_keepalive: int = core_plugins_config.get_config('HttpMaxKeepalive').data
+max_per_host: int = core_plugins_config.get_config('HttpMaxPerHost').data
+enable_http2: bool = core_plugins_config.get_config('EnableHttp2').data
+
+try:
+    import h2  # noqa: F401
+
+    is_http2 = enable_http2
+except ImportError:
+    is_http2 = False
+
+# httpx 0.26起使用`proxy`参数, 0.28移除了旧的`proxies`参数
+PROXY_ARG = (
+    'proxy'
+    if 'proxy' in inspect.signature(httpx.AsyncClient.__init__).parameters
+    else 'proxies'
+)
+
+# (proxy, verify, base_url)
+ClientKey = Tuple[Optional[str], bool, str]
+
+
+class _ReleaseStream(httpx.AsyncByteStream):
+    '''响应体读取完毕或关闭时释放对应域名的并发名额'''
+
+    def __init__(self, stream: Any, release: Callable[[], None]):
+        self.stream = stream
+        self.release: Optional[Callable[[], None]] = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self.stream:
+            yield chunk
+
+    def release_once(self):
+        if self.release is not None:
+            self.release()
+            self.release = None
+
+    async def aclose(self):
+        try:
+            await self.stream.aclose()
+        finally:
+            self.release_once()
+
+
+class LimitedAsyncClient(httpx.AsyncClient):
+    '''
+    限制同一域名并发请求数的`httpx.AsyncClient`
+
+    连接池的`limits`作用于整个客户端,
+    这里额外为每个域名分配名额, 避免单个域名占满全部连接
+    '''
+
+    def __init__(self, *args, max_per_host: int = 0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_per_host = max_per_host
+        self.host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    async def send(
+        self, request: httpx.Request, *, stream: bool = False, **kwargs
+    ) -> httpx.Response:
+        if self.max_per_host <= 0:
+            return await super().send(request, stream=stream, **kwargs)
+
+        host = request.url.host
+        semaphore = self.host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = self.host_semaphores[host] = asyncio.Semaphore(
+                self.max_per_host
+            )
+
+        await semaphore.acquire()
+        try:
+            response = await super().send(request, stream=True, **kwargs)
+        except BaseException:
+            semaphore.release()
+            raise
+
+        release_stream = _ReleaseStream(response.stream, semaphore.release)
+        response.stream = release_stream
+        if not stream:
+            try:
+                await response.aread()
+            except BaseException:
+                await response.aclose()
+                raise
+            finally:
+                release_stream.release_once()
+        elif response.is_closed:
+            # 响应体已提前读取完毕, 不会再触发关闭
+            release_stream.release_once()
+        return response
+
+
+_clients: Dict[ClientKey, httpx.AsyncClient] = {}
+_is_register = False
+
+
+def get_client(
+    proxy: Optional[str] = None,
+    verify: bool = True,
+    base_url: str = '',
+) -> httpx.AsyncClient:
+    '''
+    :说明:
+      获取共享的`httpx.AsyncClient`, 相同(代理, ssl校验, base_url)复用同一连接池,
+      同一域名的并发请求数受`HttpMaxPerHost`限制。
+
+      共享客户端不会保存响应中的Cookie, 也不要对其调用`aclose`,
+      需要超时等参数时请在单次请求中传入。
+    :参数:
+      * proxy (Optional[str]): 代理地址。
+      * verify (bool): 是否进行ssl校验。
+      * base_url (str): 基础URL。
+    :返回:
+      * client: `httpx.AsyncClient`
+    '''
+    global _is_register
+
+    key = (proxy, verify, base_url)
+    client = _clients.get(key)
+    if client is None or client.is_closed:
+        client = _clients[key] = LimitedAsyncClient(
+            **{PROXY_ARG: proxy},
+            verify=verify,
+            base_url=base_url,
+            http2=is_http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+            ),
+            # 共享客户端间不同用户的请求不能串Cookie
+            cookies=CookieJar(DefaultCookiePolicy(allowed_domains=[])),
+            max_per_host=max_per_host,
+        )
+        logger.debug(f'[GsCore][HTTP] 新建连接池 {base_url or proxy}')
+
+        if not _is_register:
+            # 延迟导入, 避免与server产生循环引用
+            from gsuid_core.server import on_core_shutdown
+
+            on_core_shutdown(close_all_clients)
+            _is_register = True
+
+    return client
+
+
+async def close_all_clients():
+    for client in _clients.values():
+        if not client.is_closed:
+            await client.aclose()
+    _clients.clear()
+    logger.info('[GsCore][HTTP] 已关闭全部连接池')
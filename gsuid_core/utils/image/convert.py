@@ -1,7 +1,8 @@
+import time
 from io import BytesIO
 from pathlib import Path
 from base64 import b64encode
-from typing import Union, overload
+from typing import Union, Optional, overload
 
 import aiofiles
 from PIL import Image, ImageDraw, ImageFont
@@ -10,14 +11,19 @@ from gsuid_core.logger import logger
 from gsuid_core.utils.fonts.fonts import core_font
 from gsuid_core.utils.plugins_config.gs_config import pic_gen_config
 from gsuid_core.utils.image.image_tools import draw_center_text_by_line
+from gsuid_core.utils.image.render_pool import in_render_pool, render_in_pool
 
 pic_quality: int = pic_gen_config.get_config('PicQuality').data
+pic_format: str = pic_gen_config.get_config('PicFormat').data
+pic_optimize: bool = pic_gen_config.get_config('PicOptimize').data
+pic_max_size: int = pic_gen_config.get_config('PicMaxSizeKB').data
 
 
 @overload
 async def convert_img(
     img: Image.Image,
     is_base64: bool = False,
+    fmt: Optional[str] = None,
 ) -> bytes: ...
 
 
@@ -25,6 +31,7 @@ async def convert_img(
 async def convert_img(
     img: Image.Image,
     is_base64: bool = True,
+    fmt: Optional[str] = None,
 ) -> str: ...
 
 
@@ -45,6 +52,7 @@ async def convert_img(
 async def convert_img(
     img: Union[Image.Image, str, Path, bytes],
     is_base64: bool = False,
+    fmt: Optional[str] = None,
 ):
     """
     :说明:
@@ -52,16 +60,14 @@ async def convert_img(
     :参数:
       * img (Image): 图片。
       * is_base64 (bool): 是否转换为base64格式, 不填默认转为bytes。
+      * fmt (str): `JPEG`/`WEBP`/`PNG`, 仅对Image生效, 默认使用配置`PicFormat`。
     :返回:
       * res: bytes对象或base64编码图片。
     """
     logger.info('[GsCore] 处理图片中....')
 
     if isinstance(img, Image.Image):
-        img = img.convert('RGB')
-        result_buffer = BytesIO()
-        img.save(result_buffer, format='JPEG', quality=pic_quality)
-        res = result_buffer.getvalue()
+        res = await render_in_pool(encode_image, img, fmt)
         if is_base64:
             res = 'base64://' + b64encode(res).decode()
         return res
@@ -76,6 +82,71 @@ async def convert_img(
     return f'base64://{b64encode(img).decode()}'
 
 
+def img_to_jpeg(img: Image.Image, quality: int = pic_quality) -> bytes:
+    img = img.convert('RGB')
+    result_buffer = BytesIO()
+    img.save(result_buffer, format='JPEG', quality=quality)
+    return result_buffer.getvalue()
+
+
+def _save_image(img: Image.Image, fmt: str, quality: int) -> bytes:
+    buffer = BytesIO()
+    if fmt == 'JPEG':
+        img.save(
+            buffer,
+            format='JPEG',
+            quality=quality,
+            optimize=pic_optimize,
+            progressive=pic_optimize,
+        )
+    elif fmt == 'WEBP':
+        img.save(buffer, format='WEBP', quality=quality, method=4)
+    else:
+        img.save(buffer, format='PNG', optimize=pic_optimize)
+    return buffer.getvalue()
+
+
+def encode_image(
+    img: Image.Image,
+    fmt: Optional[str] = None,
+    quality: int = pic_quality,
+    max_size: Optional[int] = None,
+) -> bytes:
+    '''
+    :说明:
+      按配置的格式编码图片, 超过大小上限时每次缩小为80%尺寸后重新编码。
+    :参数:
+      * img (Image): 图片。
+      * fmt (str): `JPEG`/`WEBP`/`PNG`, 默认使用配置`PicFormat`。
+      * quality (int): 编码质量, PNG忽略该参数。
+      * max_size (int): 大小上限(KB), 默认使用配置`PicMaxSizeKB`, 0为不限制。
+    :返回:
+      * res: 编码后的bytes。
+    '''
+    start = time.perf_counter()
+    fmt = (fmt or pic_format).upper()
+    max_bytes = (pic_max_size if max_size is None else max_size) * 1024
+
+    if fmt == 'JPEG':
+        img = img.convert('RGB')
+    elif img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+
+    size = img.size
+    data = _save_image(img, fmt, quality)
+    while max_bytes and len(data) > max_bytes and min(img.size) > 64:
+        w, h = img.size
+        img = img.resize((int(w * 0.8), int(h * 0.8)), Image.LANCZOS)
+        data = _save_image(img, fmt, quality)
+
+    logger.debug(
+        f'[GsCore][图片编码] {fmt} {size}->{img.size} '
+        f'{len(data) / 1024:.1f}KB, '
+        f'耗时{(time.perf_counter() - start) * 1000:.1f}ms'
+    )
+    return data
+
+
 def convert_img_sync(img_path: Path):
     with open(img_path, 'rb') as fp:
         img = fp.read()
@@ -143,7 +214,19 @@ def get_height(content: str, size: int) -> int:
     return (line_count + 1) * size
 
 
-async def text2pic(text: str, max_size: int = 800, font_size: int = 24):
+async def text2pic(
+    text: str,
+    max_size: int = 800,
+    font_size: int = 24,
+    fmt: Optional[str] = None,
+):
+    return await _draw_text_pic(text, max_size, font_size, fmt)
+
+
+@in_render_pool
+def _draw_text_pic(
+    text: str, max_size: int, font_size: int, fmt: Optional[str] = None
+) -> bytes:
     if text.endswith('\n'):
         text = text[:-1]
 
@@ -161,4 +244,4 @@ async def text2pic(text: str, max_size: int = 800, font_size: int = 24):
         True,
     )
     img = img.crop((0, 0, max_size, int(y + 80)))
-    return await convert_img(img)
+    return encode_image(img, fmt)
@@ -0,0 +1,162 @@
+from io import BytesIO
+from struct import unpack_from
+from collections import OrderedDict
+from typing import Tuple, Union, Optional
+
+from PIL import Image
+
+from gsuid_core.utils.http_client import get_client
+
+# 最多记录的URL图片尺寸数
+SIZE_CACHE_SIZE = 4096
+# 获取网络图片尺寸时最多读取的字节数, 足以覆盖常见的JPEG EXIF段
+PROBE_MAX_BYTES = 64 * 1024
+
+# 不带长度字段的JPEG标记
+_JPEG_STANDALONE = {0x01, *range(0xD0, 0xD9)}
+# 除DHT/JPG/DAC外的SOFn标记, 其后依次为精度、高、宽
+_JPEG_SOF = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+_size_cache: 'OrderedDict[str, Tuple[int, int]]' = OrderedDict()
+
+
+def _png_size(buf: memoryview) -> Optional[Tuple[int, int]]:
+    if len(buf) >= 24 and buf[12:16] == b'IHDR':
+        return unpack_from('>II', buf, 16)
+    return None
+
+
+def _gif_size(buf: memoryview) -> Optional[Tuple[int, int]]:
+    if len(buf) >= 10:
+        return unpack_from('<HH', buf, 6)
+    return None
+
+
+def _webp_size(buf: memoryview) -> Optional[Tuple[int, int]]:
+    chunk = buf[12:16]
+    if chunk == b'VP8 ' and len(buf) >= 30:
+        w, h = unpack_from('<HH', buf, 26)
+        return w & 0x3FFF, h & 0x3FFF
+    if chunk == b'VP8L' and len(buf) >= 25:
+        bits = unpack_from('<I', buf, 21)[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X' and len(buf) >= 30:
+        w = int.from_bytes(buf[24:27], 'little')
+        h = int.from_bytes(buf[27:30], 'little')
+        return w + 1, h + 1
+    return None
+
+
+def _jpeg_size(buf: memoryview) -> Optional[Tuple[int, int]]:
+    index = 2
+    end = len(buf)
+    while index + 4 <= end:
+        if buf[index] != 0xFF:
+            return None
+        marker = buf[index + 1]
+        if marker == 0xFF:
+            # 填充字节
+            index += 1
+            continue
+        if marker in _JPEG_STANDALONE:
+            index += 2
+            continue
+        if marker in _JPEG_SOF:
+            if index + 9 > end:
+                return None
+            h, w = unpack_from('>HH', buf, index + 5)
+            return w, h
+        index += 2 + unpack_from('>H', buf, index + 2)[0]
+    return None
+
+
+def probe_image_size(
+    data: Union[bytes, bytearray, memoryview],
+) -> Optional[Tuple[int, int]]:
+    '''
+    :说明:
+      仅解析文件头获取图片的宽高, 支持PNG/JPEG/GIF/WebP,
+      其他格式交由PIL识别。
+    :参数:
+      * data (bytes): 图片数据。
+    :返回:
+      * size: `(宽, 高)`, 无法识别时为None。
+    '''
+    buf = memoryview(data)
+    size = _probe_header(buf)
+    if size is not None:
+        return size
+
+    try:
+        with Image.open(BytesIO(buf)) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+def _probe_header(buf: memoryview) -> Optional[Tuple[int, int]]:
+    size = None
+    if buf[:8] == b'\x89PNG\r\n\x1a\n':
+        size = _png_size(buf)
+    elif buf[:3] == b'\xff\xd8\xff':
+        size = _jpeg_size(buf)
+    elif buf[:6] in (b'GIF87a', b'GIF89a'):
+        size = _gif_size(buf)
+    elif buf[:4] == b'RIFF' and buf[8:12] == b'WEBP':
+        size = _webp_size(buf)
+
+    if size is not None:
+        return size[0], size[1]
+    return None
+
+
+async def fetch_image_size(url: str) -> Optional[Tuple[int, int]]:
+    '''
+    :说明:
+      获取网络图片的宽高, 优先使用已记录的尺寸,
+      否则只读取文件头部(最多`PROBE_MAX_BYTES`)进行解析, 不下载整张图片。
+    :参数:
+      * url (str): 图片链接。
+    :返回:
+      * size: `(宽, 高)`, 无法识别时为None。
+    '''
+    size = get_url_size(url)
+    if size is not None:
+        return size
+
+    buf = bytearray()
+    async with get_client().stream(
+        'GET',
+        url,
+        headers={'Range': f'bytes=0-{PROBE_MAX_BYTES - 1}'},
+        follow_redirects=True,
+        timeout=10,
+    ) as resp:
+        if resp.status_code not in (200, 206):
+            return None
+        # 不支持Range的源站会返回完整图片, 读够头部后直接断开
+        async for chunk in resp.aiter_bytes():
+            buf += chunk
+            size = _probe_header(memoryview(buf))
+            if size is not None or len(buf) >= PROBE_MAX_BYTES:
+                break
+
+    if size is None:
+        size = probe_image_size(buf)
+    if size is not None:
+        remember_url_size(url, size)
+    return size
+
+
+def remember_url_size(url: str, size: Tuple[int, int]):
+    _size_cache[url] = size
+    _size_cache.move_to_end(url)
+    while len(_size_cache) > SIZE_CACHE_SIZE:
+        _size_cache.popitem(last=False)
+
+
+def get_url_size(url: str) -> Optional[Tuple[int, int]]:
+    size = _size_cache.get(url)
+    if size is not None:
+        _size_cache.move_to_end(url)
+    return size
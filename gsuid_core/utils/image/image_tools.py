@@ -4,7 +4,6 @@ from io import BytesIO
 from pathlib import Path
 from typing import Tuple, Union, Optional
 
-import httpx
 from httpx import get
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
 
@@ -12,6 +11,7 @@ from gsuid_core.models import Event
 from gsuid_core.utils.image.utils import sget
 from gsuid_core.data_store import get_res_path
 from gsuid_core.utils.fonts.fonts import core_font
+from gsuid_core.utils.http_client import get_client
 
 TEXT_PATH = Path(__file__).parent / 'texture2d'
 BG_PATH = Path(__file__).parents[1] / 'default_bg'
@@ -128,17 +128,16 @@ async def get_pic(url, size: Optional[Tuple[int, int]] = None) -> Image.Image:
     """
     从网络获取图片, 格式化为RGBA格式的指定尺寸
     """
-    async with httpx.AsyncClient(timeout=None) as client:
-        resp = await client.get(url=url)
-        if resp.status_code != 200:
-            if size is None:
-                size = (960, 600)
-            return Image.new('RGBA', size)
-        pic = Image.open(BytesIO(resp.read()))
-        pic = pic.convert("RGBA")
-        if size is not None:
-            pic = pic.resize(size)
-        return pic
+    resp = await get_client().get(url=url, timeout=None)
+    if resp.status_code != 200:
+        if size is None:
+            size = (960, 600)
+        return Image.new('RGBA', size)
+    pic = Image.open(BytesIO(resp.read()))
+    pic = pic.convert("RGBA")
+    if size is not None:
+        pic = pic.resize(size)
+    return pic
 
 
 def draw_center_text_by_line(
@@ -0,0 +1,124 @@
+import time
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from gsuid_core.logger import logger
+from gsuid_core.data_store import image_res
+from gsuid_core.utils.plugins_config.gs_config import core_plugins_config
+
+is_clean_pic: bool = core_plugins_config.get_config('EnableCleanPicSrv').data
+pic_expire_time = core_plugins_config.get_config('ScheduledCleanPicSrv').data
+
+# 后台清理过期图片的间隔(秒)
+SWEEP_INTERVAL = 60
+
+_MEDIA_TYPES = (
+    (b'\x89PNG', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF8', 'image/gif'),
+    (b'RIFF', 'image/webp'),
+)
+
+
+def guess_media_type(head: bytes) -> str:
+    for magic, media_type in _MEDIA_TYPES:
+        if head.startswith(magic):
+            return media_type
+    return 'image/jpeg'
+
+
+class PicStore:
+    '''
+    本地图床
+
+    图片以内容哈希命名, 相同的图片只保存一次; 每次写入都会刷新其过期时间,
+    过期的图片由单个后台任务定期清理
+    '''
+
+    def __init__(self, path: Path, expire_time: int, clean: bool):
+        self.path = path
+        self.expire_time = expire_time
+        self.clean = clean
+        # 图片ID: 过期时间
+        self.index: Dict[str, float] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def put(self, data: bytes) -> str:
+        image_id = hashlib.sha256(data).hexdigest()[:32]
+        path = self.get_path(image_id)
+        # 仅凭索引判断会漏掉已被手动或外部删除的文件
+        if not path.exists():
+            path.write_bytes(data)
+        self.index[image_id] = time.time() + self.expire_time
+        self._start_sweeper()
+        return image_id
+
+    def get_path(self, image_id: str) -> Path:
+        return self.path / f'{image_id}.jpg'
+
+    def get(self, image_id: str) -> Optional[Path]:
+        if not image_id.isalnum():
+            return None
+        path = self.get_path(image_id)
+        return path if path.is_file() else None
+
+    def scan_stale(self) -> List[Path]:
+        '''找出不在索引中且已过期的图片(如重启前遗留), 在线程池中执行'''
+        now = time.time()
+        stale: List[Path] = []
+        for path in self.path.iterdir():
+            if path.stem in self.index:
+                continue
+            try:
+                if now - path.stat().st_mtime > self.expire_time:
+                    stale.append(path)
+            except OSError:
+                continue
+        return stale
+
+    def remove(self, paths: List[Path]):
+        '''
+        删除图片, 必须在事件循环中调用
+
+        与`put()`在同一线程中先检查索引再删除, 清理期间又被写入的图片不会被误删
+        '''
+        for path in paths:
+            if path.stem in self.index:
+                continue
+            try:
+                path.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f'[GsCore][本地图床] 删除图片失败: {e}')
+
+    async def _sweep_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            now = time.time()
+            expired = [k for k, v in self.index.items() if v < now]
+            for image_id in expired:
+                del self.index[image_id]
+            self.remove([self.get_path(i) for i in expired])
+            try:
+                stale = await loop.run_in_executor(None, self.scan_stale)
+            except Exception as e:
+                logger.warning(f'[GsCore][本地图床] 清理图片失败: {e}')
+                continue
+            self.remove(stale)
+
+    def _start_sweeper(self):
+        if not self.clean:
+            return
+        if self.task is not None and not self.task.done():
+            return
+        try:
+            self.task = asyncio.get_running_loop().create_task(
+                self._sweep_loop()
+            )
+        except RuntimeError:
+            pass
+
+
+pic_store = PicStore(image_res, int(pic_expire_time), is_clean_pic)
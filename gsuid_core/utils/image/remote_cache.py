@@ -0,0 +1,104 @@
+import time
+import asyncio
+from typing import Dict, Optional
+from collections import OrderedDict
+
+from gsuid_core.logger import logger
+from gsuid_core.utils.http_client import get_client
+from gsuid_core.utils.plugins_config.gs_config import core_plugins_config
+
+cache_mb: int = core_plugins_config.get_config('RemoteImageCacheMB').data
+
+# 缓存超过该秒数后, 使用时向源站发送条件请求确认图片是否变化
+REVALIDATE_INTERVAL = 600
+
+
+class RemoteImage:
+    __slots__ = ('data', 'etag', 'last_modified', 'check_time')
+
+    def __init__(
+        self,
+        data: bytes,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.check_time = time.monotonic()
+
+
+class RemoteImageCache:
+    '''
+    网络图片缓存
+
+    按URL保存原始bytes, 总大小超过`max_bytes`时淘汰最久未使用的图片;
+    同一URL的并发请求只会下载一次, 过期后使用ETag/Last-Modified重新校验
+    '''
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.data: 'OrderedDict[str, RemoteImage]' = OrderedDict()
+        self.pending: Dict[str, 'asyncio.Task[bytes]'] = {}
+
+    async def get(self, url: str) -> bytes:
+        item = self.data.get(url)
+        if item is not None:
+            self.data.move_to_end(url)
+            if time.monotonic() - item.check_time < REVALIDATE_INTERVAL:
+                return item.data
+
+        task = self.pending.get(url)
+        if task is None:
+            # 下载放在独立任务中, 发起者被取消也不影响其他等待者
+            task = self.pending[url] = asyncio.create_task(
+                self._fetch(url, item)
+            )
+            task.add_done_callback(lambda _: self.pending.pop(url, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, url: str, item: Optional[RemoteImage]) -> bytes:
+        headers = {}
+        if item is not None:
+            if item.etag:
+                headers['If-None-Match'] = item.etag
+            if item.last_modified:
+                headers['If-Modified-Since'] = item.last_modified
+
+        resp = await get_client().get(url, headers=headers, timeout=None)
+        if resp.status_code == 304 and item is not None:
+            item.check_time = time.monotonic()
+            return item.data
+
+        data = resp.content
+        if resp.status_code == 200:
+            self.put(
+                url,
+                RemoteImage(
+                    data,
+                    resp.headers.get('ETag'),
+                    resp.headers.get('Last-Modified'),
+                ),
+            )
+        else:
+            logger.warning(f'[GsCore][网络图片] {url} 返回{resp.status_code}')
+        return data
+
+    def put(self, url: str, item: RemoteImage):
+        self.pop(url)
+        if len(item.data) > self.max_bytes:
+            return
+
+        self.data[url] = item
+        self.size += len(item.data)
+        while self.size > self.max_bytes:
+            self.pop(next(iter(self.data)))
+
+    def pop(self, url: str):
+        item = self.data.pop(url, None)
+        if item is not None:
+            self.size -= len(item.data)
+
+
+remote_image_cache = RemoteImageCache(cache_mb * 1024 * 1024)
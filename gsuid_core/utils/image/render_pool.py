@@ -0,0 +1,158 @@
+import os
+import pickle
+import asyncio
+import importlib
+from multiprocessing import get_context
+from functools import wraps, partial, lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Union, Callable, Optional, Awaitable
+
+from PIL import Image, ImageFile
+
+from gsuid_core.logger import logger
+from gsuid_core.utils.plugins_config.gs_config import pic_gen_config
+
+render_process_num: int = pic_gen_config.get_config('RenderProcessNum').data
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+_render_func: Dict[str, Callable] = {}
+
+
+def get_render_pool() -> Optional[ProcessPoolExecutor]:
+    global _render_pool
+    if render_process_num <= 0:
+        return None
+
+    if _render_pool is None:
+        # 事件循环进程中存在其他线程, fork出的子进程可能继承被占用的锁
+        _render_pool = ProcessPoolExecutor(
+            max_workers=render_process_num,
+            mp_context=get_context('spawn'),
+        )
+        logger.info(f'[GsCore][渲染进程池] 已启动, 进程数{render_process_num}')
+
+        # 延迟导入, 避免与server产生循环引用
+        from gsuid_core.server import on_core_shutdown
+
+        on_core_shutdown(shutdown_render_pool)
+    return _render_pool
+
+
+async def shutdown_render_pool():
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(wait=False)
+        _render_pool = None
+        logger.info('[GsCore][渲染进程池] 已关闭')
+
+
+def _call_pickled(payload: bytes) -> Any:
+    fn, args, kwargs = pickle.loads(payload)
+    return fn(*args, **kwargs)
+
+
+async def render_in_pool(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    '''
+    :说明:
+      在渲染进程池中执行同步的绘图函数, 不阻塞事件循环。
+
+      `fn`与参数需可被pickle(模块级函数、`Image.Image`、基础类型等),
+      否则(如lambda)将退回线程池中执行。
+      直接从文件打开的图片可用`image_ref`包装, 只传递路径。
+    :参数:
+      * fn (Callable): 同步绘图函数。
+      * *args, **kwargs: 传入`fn`的参数。
+    :返回:
+      * res: `fn`的返回值。
+    '''
+    loop = asyncio.get_running_loop()
+    func = partial(fn, *args, **kwargs)
+
+    pool = get_render_pool()
+    if pool is None:
+        return await loop.run_in_executor(None, func)
+
+    try:
+        # 提前序列化, 无法pickle的函数或参数退回线程池执行
+        payload = pickle.dumps((fn, args, kwargs), pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return await loop.run_in_executor(None, func)
+
+    try:
+        return await loop.run_in_executor(pool, _call_pickled, payload)
+    except BrokenProcessPool:
+        logger.warning('[GsCore][渲染进程池] 进程池异常, 已重建...')
+        await shutdown_render_pool()
+        return await loop.run_in_executor(None, func)
+
+
+def _call_render_func(key: str, *args, **kwargs) -> Any:
+    if key not in _render_func:
+        # 子进程中尚未导入该模块时, 导入后装饰器会重新注册
+        importlib.import_module(key.split(':')[0])
+    return _render_func[key](*args, **kwargs)
+
+
+def in_render_pool(func: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+    '''
+    :说明:
+      装饰同步绘图函数, 使其变为在渲染进程池中执行的异步函数。
+
+      ```python
+      @in_render_pool
+      def draw_card(data: Dict) -> Image.Image: ...
+
+      img = await draw_card(data)
+      ```
+    '''
+    key = f'{func.__module__}:{func.__qualname__}'
+    _render_func[key] = func
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await render_in_pool(_call_render_func, key, *args, **kwargs)
+
+    return wrapper
+
+
+class ImageRef:
+    '''以文件路径代替图片传入渲染进程, 由子进程打开'''
+
+    __slots__ = ('path',)
+
+    def __init__(self, path: str):
+        self.path = path
+
+
+ImageLike = Union[Image.Image, ImageRef]
+
+
+def image_ref(img: Image.Image) -> ImageLike:
+    '''
+    :说明:
+      对于刚从文件打开、尚未读取像素数据的图片, 返回其路径引用,
+      避免每次调用都在主进程解码并序列化整张图片; 其他图片原样返回。
+    '''
+    # 尚未读取像素数据的图片不可能被修改过, 可以安全地在子进程中重新打开
+    if (
+        isinstance(img, ImageFile.ImageFile)
+        and img.im is None
+        and img.filename
+    ):
+        return ImageRef(os.path.abspath(img.filename))
+    return img
+
+
+def open_image(img: ImageLike) -> Image.Image:
+    '''在渲染函数中将`ImageRef`还原为图片, 返回的图片可以随意修改'''
+    if isinstance(img, ImageRef):
+        return _open_cached(img.path, os.stat(img.path).st_mtime_ns).copy()
+    return img
+
+
+@lru_cache(maxsize=64)
+def _open_cached(path: str, mtime_ns: int) -> Image.Image:
+    img = Image.open(path)
+    img.load()
+    return img
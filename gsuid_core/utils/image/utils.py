@@ -1,13 +1,12 @@
 from io import BytesIO
 
-import httpx
 from PIL import Image
 
+from gsuid_core.utils.http_client import get_client
+
 
 async def sget(url: str):
-    async with httpx.AsyncClient(timeout=None) as client:
-        resp = await client.get(url=url)
-        return resp
+    return await get_client().get(url=url, timeout=None)
 
 
 async def download_pic_to_image(url: str) -> Image.Image:
@@ -1,6 +1,12 @@
 from typing import Dict
 
-from .models import GSC, GsStrConfig, GsBoolConfig, GsListStrConfig
+from .models import (
+    GSC,
+    GsIntConfig,
+    GsStrConfig,
+    GsBoolConfig,
+    GsListStrConfig,
+)
 
 CONFIG_DEFAULT: Dict[str, GSC] = {
     'StartVENV': GsStrConfig(
@@ -189,4 +195,63 @@ CONFIG_DEFAULT: Dict[str, GSC] = {
             "全部拆成单独消息",
         ],
     ),
+    'HttpMaxConnections': GsIntConfig(
+        '单个HTTP连接池最大连接数',
+        '共享HTTP客户端每个连接池(代理/域名)的最大连接数(重启生效)',
+        100,
+        options=[20, 50, 100, 200],
+    ),
+    'HttpMaxKeepalive': GsIntConfig(
+        '单个HTTP连接池最大保活连接数',
+        '共享HTTP客户端每个连接池保持的空闲长连接数(重启生效)',
+        20,
+        options=[5, 10, 20, 50],
+    ),
+    'HttpMaxPerHost': GsIntConfig(
+        '单个域名最大并发请求数',
+        '共享HTTP客户端对同一域名同时进行的最大请求数, 0为不限制(重启生效)',
+        50,
+        options=[0, 10, 20, 50, 100],
+    ),
+    'EnableHttp2': GsBoolConfig(
+        '启用HTTP/2',
+        '安装h2依赖后共享HTTP客户端将尝试使用HTTP/2(重启生效)',
+        True,
+    ),
+    'SignConcurrency': GsIntConfig(
+        '自动签到并发数',
+        '全部重签时同时进行签到的最大用户数',
+        5,
+        options=[1, 3, 5, 10, 20],
+    ),
+    'SignRatePerMinute': GsIntConfig(
+        '单服务器每分钟签到数',
+        '全部重签时同一游戏的同一服务器每分钟最多签到的用户数',
+        20,
+        options=[2, 6, 10, 20, 30, 60],
+    ),
+    'SignCkRatePerMinute': GsIntConfig(
+        '单Cookie每分钟签到数',
+        '全部重签时使用同一Cookie的UID每分钟最多签到的次数',
+        2,
+        options=[1, 2, 5, 10],
+    ),
+    'SignTimeWindow': GsIntConfig(
+        '签到分散时间窗口',
+        '全部重签时将各用户的开始时间随机分散在该分钟数内, 0为不分散',
+        0,
+        options=[0, 10, 30, 60, 120],
+    ),
+    'BoardCastRatePerMinute': GsIntConfig(
+        '单个Bot每分钟推送数',
+        '推送消息时每个连接的Bot每分钟最多发送的消息数',
+        120,
+        options=[30, 60, 120, 240, 480],
+    ),
+    'RemoteImageCacheMB': GsIntConfig(
+        '网络图片缓存大小(MB)',
+        '发送网络图片时在内存中缓存的图片总大小上限(重启生效)',
+        64,
+        options=[0, 16, 64, 128, 256],
+    ),
 }
@@ -1,9 +1,32 @@
 from typing import Dict
 
-from .models import GSC, GsIntConfig
+from .models import GSC, GsIntConfig, GsStrConfig, GsBoolConfig
 
 PIC_GEN_CONFIG: Dict[str, GSC] = {
     'PicQuality': GsIntConfig(
         '图片生成质量', '设定生成图片的质量, 最高不可超过100', 85, 100
     ),
+    'RenderProcessNum': GsIntConfig(
+        '图片渲染进程数',
+        '用于绘图/编码的进程池大小, 设为0则使用线程池(重启生效)',
+        2,
+        options=[0, 1, 2, 4, 8],
+    ),
+    'PicFormat': GsStrConfig(
+        '图片发送格式',
+        '发送前将生成的图片编码为该格式, WEBP体积最小但部分平台不支持',
+        'JPEG',
+        ['JPEG', 'WEBP', 'PNG'],
+    ),
+    'PicOptimize': GsBoolConfig(
+        '图片编码优化',
+        '编码时进行额外的压缩优化, 体积更小但更耗时',
+        True,
+    ),
+    'PicMaxSizeKB': GsIntConfig(
+        '图片大小上限(KB)',
+        '编码后超过该大小的图片会逐步缩小尺寸, 设为0则不限制',
+        0,
+        options=[0, 512, 1024, 2048, 4096],
+    ),
 }
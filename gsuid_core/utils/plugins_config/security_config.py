@@ -32,4 +32,9 @@ SECURITY_CONFIG: Dict[str, GSC] = {
         '启用违禁词屏蔽', '自动检测发送违禁词并进行屏蔽', False
     ),
     'BanList': GsListStrConfig('违禁词屏蔽列表', '对列表中的词进行屏蔽', []),
+    'BanListNormalize': GsBoolConfig(
+        '违禁词忽略全半角与大小写',
+        '匹配违禁词时统一全角/半角及英文大小写',
+        False,
+    ),
 }
@@ -82,3 +82,28 @@ SEND_PIC_CONFIG: Dict[str, GSC] = {
         ['link', 'base64', 'link_local', 'link_remote'],
     ),
 }
+
+# 平台: (名称, 默认图片编码格式), 为`默认`时使用图片生成配置中的PicFormat
+PIC_FORMAT_DEFAULTS = {
+    'onebot': ('OneBot', '默认'),
+    'red': ('Red', '默认'),
+    'onebot_v12': ('OneBot V12', '默认'),
+    'qqguild': ('QQ Guild', '默认'),
+    'qqgroup': ('QQ Group', '默认'),
+    'telegram': ('Telegram', '默认'),
+    'discord': ('Discord', 'WEBP'),
+    'kook': ('KOOK', '默认'),
+    'dodo': ('DoDo', '默认'),
+    'feishu': ('飞书', '默认'),
+    'ntchat': ('NtChat', '默认'),
+    'villa': ('米游社大别野', '默认'),
+    'console': ('本地client.py', 'PNG'),
+}
+
+for _platform, (_name, _format) in PIC_FORMAT_DEFAULTS.items():
+    SEND_PIC_CONFIG[f'{_platform}_format'] = GsStrConfig(
+        f'{_name}图片编码格式',
+        '发送PIL图片时使用的编码格式, 默认则使用PicFormat',
+        _format,
+        ['默认', 'JPEG', 'WEBP', 'PNG'],
+    )
@@ -15,4 +15,28 @@ SP_CONFIG: Dict[str, GSC] = {
         'dark',
         ['light', 'dark'],
     ),
+    'MaxTaskNum': GsIntConfig(
+        '全局最大并发任务数',
+        '所有Bot同时执行的命令任务上限',
+        64,
+        options=[16, 32, 64, 128, 256],
+    ),
+    'MaxBotTaskNum': GsIntConfig(
+        '单Bot最大并发任务数',
+        '单个Bot连接同时执行的命令任务上限',
+        16,
+        options=[4, 8, 16, 32, 64],
+    ),
+    'MaxSessionTaskNum': GsIntConfig(
+        '单会话最大并发任务数',
+        '同一群聊/私聊同时执行的命令任务上限, 避免单个群占满资源',
+        4,
+        options=[1, 2, 4, 8],
+    ),
+    'MaxQueueSize': GsIntConfig(
+        '单Bot任务队列上限',
+        '排队任务超过该数量时将拒绝新任务并提示繁忙',
+        200,
+        options=[50, 100, 200, 500, 1000],
+    ),
 }
@@ -0,0 +1,51 @@
+import time
+import asyncio
+from typing import Dict, Hashable, Optional
+
+
+class TokenBucket:
+    '''
+    令牌桶限速器
+
+    每秒补充`rate`个令牌, 最多累积`capacity`个, `acquire`在令牌不足时按先后顺序等待
+    '''
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self.lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+
+        async with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.last) * self.rate
+            )
+            self.last = now
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.tokens = 1
+                self.last = time.monotonic()
+            self.tokens -= 1
+
+
+class BucketGroup:
+    '''按键区分的一组令牌桶, 例如按服务器或Cookie分别限速'''
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets: Dict[Hashable, TokenBucket] = {}
+
+    async def acquire(self, key: Hashable):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.rate, self.capacity)
+        await bucket.acquire()
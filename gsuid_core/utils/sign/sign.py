@@ -1,13 +1,20 @@
+import json
+import time
 import random
 import asyncio
-from typing import Dict, List
+from datetime import date
+from typing import Dict, List, Optional
+
+import aiofiles
 
 from gsuid_core.bot import Bot
 from gsuid_core.logger import logger
 from gsuid_core.segment import MessageSegment
+from gsuid_core.data_store import get_res_path
 from gsuid_core.utils.api.mys_api import mys_api
-from gsuid_core.utils.error_reply import get_error, _start
 from gsuid_core.utils.database.models import GsUser
+from gsuid_core.utils.rate_limit import BucketGroup
+from gsuid_core.utils.error_reply import get_error, _start
 from gsuid_core.utils.plugins_config.gs_config import core_plugins_config
 from gsuid_core.utils.boardcast.models import BoardCastMsg, BoardCastMsgDict
 
@@ -17,6 +24,73 @@ GAME_NAME_MAP = {
     'zzz': '绝区零',
 }
 
+sign_concurrency: int = core_plugins_config.get_config('SignConcurrency').data
+sign_rate: int = core_plugins_config.get_config('SignRatePerMinute').data
+sign_ck_rate: int = core_plugins_config.get_config('SignCkRatePerMinute').data
+sign_time_window: int = core_plugins_config.get_config('SignTimeWindow').data
+
+# 每次签到前的随机等待秒数上限
+SIGN_JITTER = 3
+SIGN_PATH = get_res_path(['GsCore', 'sign'])
+
+
+class SignCheckpoint:
+    '''
+    记录当日已完成签到的UID及结果
+
+    全部重签中途重启后, 已记录的UID不再重复签到;
+    每行为一条`[uid, 结果]`, 攒够一批后在后台追加写入, 不阻塞事件循环
+    '''
+
+    def __init__(self, game_name: str):
+        self.game_name = game_name
+        self.path = SIGN_PATH / f'{game_name}_{date.today()}.jsonl'
+        self.done: Dict[str, str] = {}
+        self.pending: List[str] = []
+        self.lock = asyncio.Lock()
+        self.task: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def load(cls, game_name: str) -> 'SignCheckpoint':
+        checkpoint = cls(game_name)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, checkpoint._load)
+        return checkpoint
+
+    def _load(self):
+        for old in SIGN_PATH.glob(f'{self.game_name}_*.json*'):
+            if old != self.path:
+                old.unlink()
+
+        if not self.path.exists():
+            return
+        for line in self.path.read_text('utf-8').splitlines():
+            try:
+                uid, im = json.loads(line)
+            except ValueError:
+                # 写入中途退出时最后一行可能不完整
+                logger.warning(f'[签到] 进度文件{self.path.name}存在损坏行')
+                continue
+            self.done[uid] = im
+
+    def add(self, uid: str, im: str):
+        self.done[uid] = im
+        self.pending.append(json.dumps([uid, im], ensure_ascii=False))
+        if len(self.pending) >= 20 and (self.task is None or self.task.done()):
+            self.task = asyncio.create_task(self.save())
+
+    async def save(self):
+        async with self.lock:
+            if not self.pending:
+                return
+            lines, self.pending = self.pending, []
+            async with aiofiles.open(self.path, 'a', encoding='utf-8') as f:
+                await f.write('\n'.join(lines) + '\n')
+
+
+def is_sign_failed(im: str) -> bool:
+    return '签到失败' in im or im.startswith(('网络有点忙', 'OK', 'ok'))
+
 
 async def sign_error(uid: str, retcode: int, game_name: str = 'gs') -> str:
     sign_title = f'[{game_name}] [签到]'
@@ -33,8 +107,7 @@ async def sign_error(uid: str, retcode: int, game_name: str = 'gs') -> str:
     return f'[{game_name}] 签到失败!{error_msg}'
 
 
-async def sign_in(uid: str, game_name: str = 'gs', bot: Bot = None) -> str:
-
+async def get_captcha_balance() -> str:
     # 检查验证码系统余额
     if core_plugins_config.get_config('CaptchaPass').data:
         logger.info(f'[签到] 正在检查验证码系统余额...')
@@ -44,6 +117,17 @@ async def sign_in(uid: str, game_name: str = 'gs', bot: Bot = None) -> str:
         logger.info(f'[签到] 当前验证码系统余额: US${balance}')
     else:
         balance = "未开启验证码绕过"
+    return balance
+
+
+async def sign_in(
+    uid: str,
+    game_name: str = 'gs',
+    bot: Bot = None,
+    balance: Optional[str] = None,
+) -> str:
+    if balance is None:
+        balance = await get_captcha_balance()
 
     _gn = GAME_NAME_MAP.get(game_name, '未知游戏')
     sign_title = f'[{_gn}] [签到]'
@@ -156,6 +240,18 @@ async def single_daily_sign(
     group_msgs: Dict,
 ):
     im = await sign_in(uid, game_name)
+    add_sign_msg(bot_id, uid, gid, qid, im, private_msgs, group_msgs)
+
+
+def add_sign_msg(
+    bot_id: str,
+    uid: str,
+    gid: str,
+    qid: str,
+    im: str,
+    private_msgs: Dict,
+    group_msgs: Dict,
+):
     if gid == 'on':
         if qid not in private_msgs:
             private_msgs[qid] = []
@@ -171,7 +267,7 @@ async def single_daily_sign(
                 'failed': 0,
                 'push_message': [],
             }
-        if im.startswith(('签到失败', '网络有点忙', 'OK', 'ok')):
+        if is_sign_failed(im):
             group_msgs[gid]['failed'] += 1
             group_msgs[gid]['push_message'].extend(
                 [
@@ -186,66 +282,82 @@ async def single_daily_sign(
 
 
 async def daily_sign(game_name: str):
-    tasks = []
     private_msgs = {}
     group_msgs = {}
-    _user_list: List[GsUser] = await GsUser.get_all_user()
-    uid_list = []
-    user_list: List[GsUser] = []
-    for user in _user_list:
-        _uid = getattr(
-            user,
-            f'{game_name}_uid' if game_name and game_name != 'gs' else 'uid',
-        )
-        _switch = getattr(
-            user,
-            (
-                f'{game_name}_sign_switch'
-                if game_name and game_name != 'gs'
-                else 'sign_switch'
-            ),
-        )
-        if _switch != 'off' and not user.status and _uid:
-            uid_list.append(_uid)
-            user_list.append(user)
+    if game_name and game_name != 'gs':
+        uid_name = f'{game_name}_uid'
+        switch_name = f'{game_name}_sign_switch'
+    else:
+        uid_name = 'uid'
+        switch_name = 'sign_switch'
 
+    _user_list: List[GsUser] = await GsUser.get_all_user()
+    user_list: List[GsUser] = [
+        user
+        for user in _user_list
+        if getattr(user, switch_name) != 'off'
+        and not user.status
+        and getattr(user, uid_name)
+    ]
+    uid_list = [getattr(user, uid_name) for user in user_list]
     logger.info(f'[{game_name}] [全部重签] [UID列表] {uid_list}')
-    for user in user_list:
-        tasks.append(
-            single_daily_sign(
-                user.bot_id,
-                getattr(
-                    user,
-                    (
-                        f'{game_name}_uid'
-                        if game_name and game_name != 'gs'
-                        else 'uid'
-                    ),
-                ),
-                getattr(
-                    user,
-                    (
-                        f'{game_name}_sign_switch'
-                        if game_name and game_name != 'gs'
-                        else 'sign_switch'
-                    ),
-                ),
-                user.user_id,
-                game_name,
-                private_msgs,
-                group_msgs,
-            )
+
+    checkpoint = await SignCheckpoint.load(game_name)
+    balance = await get_captcha_balance()
+    # 同一服务器与同一Cookie分别限速, 并限制同时签到的人数
+    region_limit = BucketGroup(sign_rate / 60)
+    ck_limit = BucketGroup(sign_ck_rate / 60)
+    semaphore = asyncio.Semaphore(max(sign_concurrency, 1))
+    stats = {'success': 0, 'failed': 0, 'skip': 0}
+    start_time = time.perf_counter()
+
+    async def _sign(user: GsUser):
+        uid: str = getattr(user, uid_name)
+        im = checkpoint.done.get(uid)
+        if im is not None:
+            stats['skip'] += 1
+        else:
+            if sign_time_window > 0:
+                await asyncio.sleep(random.uniform(0, sign_time_window * 60))
+            await ck_limit.acquire(user.mys_id or user.cookie)
+            await region_limit.acquire(mys_api.get_server_id(uid, game_name))
+            async with semaphore:
+                await asyncio.sleep(random.uniform(0, SIGN_JITTER))
+                try:
+                    im = await sign_in(uid, game_name, balance=balance)
+                except Exception as e:
+                    logger.exception(f'[{game_name}] [签到] {uid} 出错: {e}')
+                    im = '签到失败...出现未知错误!'
+
+            if is_sign_failed(im):
+                stats['failed'] += 1
+            else:
+                stats['success'] += 1
+                checkpoint.add(uid, im)
+
+        add_sign_msg(
+            user.bot_id,
+            uid,
+            getattr(user, switch_name),
+            user.user_id,
+            im,
+            private_msgs,
+            group_msgs,
         )
-        if len(tasks) >= 1:
-            await asyncio.gather(*tasks)
-            delay = 30 + random.randint(3, 35)
-            logger.info(
-                f'[{game_name}] [签到] 已签到{len(tasks)}个用户, 等待{delay}秒进行下一次签到'
-            )
-            tasks.clear()
-            await asyncio.sleep(delay)
-    await asyncio.gather(*tasks)
-    tasks.clear()
+
+    try:
+        await asyncio.gather(*[_sign(user) for user in user_list])
+    finally:
+        await checkpoint.save()
+
+    cost = time.perf_counter() - start_time
+    signed = stats['success'] + stats['failed']
+    logger.success(
+        f'[{game_name}] [全部重签] 完成! 共{len(user_list)}个UID, '
+        f'成功{stats["success"]}个, 失败{stats["failed"]}个, '
+        f'已跳过(今日已完成){stats["skip"]}个, 耗时{cost:.1f}秒, '
+        f'平均{signed / max(cost, 1) * 60:.1f}个/分钟'
+    )
 
     # 转为广播消息
     private_msg_dict: Dict[str, List[BoardCastMsg]] = {}
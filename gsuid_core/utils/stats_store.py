@@ -0,0 +1,276 @@
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Tuple, Iterable, Optional
+
+# usage表中kind字段的取值
+KIND_GROUP = 0
+KIND_USER = 1
+
+COUNTERS = ('receive', 'send', 'command', 'image')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS names (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS daily (
+    day INTEGER NOT NULL,
+    bot INTEGER NOT NULL,
+    self INTEGER NOT NULL,
+    receive INTEGER NOT NULL DEFAULT 0,
+    send INTEGER NOT NULL DEFAULT 0,
+    command INTEGER NOT NULL DEFAULT 0,
+    image INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (bot, self, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS usage (
+    day INTEGER NOT NULL,
+    bot INTEGER NOT NULL,
+    self INTEGER NOT NULL,
+    kind INTEGER NOT NULL,
+    target INTEGER NOT NULL,
+    keyword INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (bot, self, day, kind, target, keyword)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS user_bitmap (
+    day INTEGER NOT NULL,
+    bot INTEGER NOT NULL,
+    self INTEGER NOT NULL,
+    bitmap BLOB NOT NULL,
+    PRIMARY KEY (bot, self, day)
+) WITHOUT ROWID;
+'''
+
+# (类型, 群/用户ID, 命令关键词, 次数)
+UsageRow = Tuple[int, str, str, int]
+
+
+class StatsStore:
+    '''
+    调用统计的时序存储
+
+    群/用户ID、命令关键词等字符串统一映射为整数编号保存,
+    每日数据以`(bot, self, day)`为主键前缀连续存放,
+    写入时只对传入的条目做UPSERT, 查询时直接在SQLite中聚合。
+
+    所有方法均为同步调用, 请在线程池中执行
+    '''
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.conn: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+        self.names: Dict[str, int] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self.names = dict(conn.execute('SELECT name, id FROM names'))
+            self.conn = conn
+        return self.conn
+
+    def _intern(self, conn: sqlite3.Connection, names: Iterable[str]):
+        new = list({name for name in names if name not in self.names})
+        if new:
+            conn.executemany(
+                'INSERT OR IGNORE INTO names (name) VALUES (?)',
+                [(name,) for name in new],
+            )
+            for i in range(0, len(new), 500):
+                chunk = new[i : i + 500]  # noqa: E203
+                self.names.update(
+                    conn.execute(
+                        'SELECT name, id FROM names WHERE name IN '
+                        f'({",".join("?" * len(chunk))})',
+                        chunk,
+                    )
+                )
+
+    def _lookup(self, *names: str) -> Optional[Tuple[int, ...]]:
+        ids = tuple(self.names.get(name) for name in names)
+        if None in ids:
+            return None
+        return ids  # type: ignore
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def save(
+        self,
+        bot_id: str,
+        bot_self_id: str,
+        day: int,
+        counters: Dict[str, int],
+        usage: List[UsageRow],
+    ):
+        '''写入某日的计数器与给定的调用次数, 已存在的条目会被覆盖'''
+        with self.lock:
+            conn = self._connect()
+            with conn:
+                self._intern(
+                    conn,
+                    [bot_id, bot_self_id]
+                    + [i[1] for i in usage]
+                    + [i[2] for i in usage],
+                )
+                bot, self_id = self.names[bot_id], self.names[bot_self_id]
+                # 数据有变化, 已保存的用户位图需重新计算
+                conn.execute(
+                    'DELETE FROM user_bitmap WHERE bot=? AND self=? AND day=?',
+                    (bot, self_id, day),
+                )
+                conn.execute(
+                    'INSERT INTO daily VALUES (?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (bot, self, day) DO UPDATE SET '
+                    'receive=excluded.receive, send=excluded.send, '
+                    'command=excluded.command, image=excluded.image',
+                    (day, bot, self_id, *(counters[i] for i in COUNTERS)),
+                )
+                conn.executemany(
+                    'INSERT INTO usage VALUES (?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (bot, self, day, kind, target, keyword) '
+                    'DO UPDATE SET count=excluded.count',
+                    [
+                        (
+                            day,
+                            bot,
+                            self_id,
+                            kind,
+                            self.names[target],
+                            self.names[keyword],
+                            count,
+                        )
+                        for kind, target, keyword, count in usage
+                    ],
+                )
+
+    def load(
+        self, bot_id: str, bot_self_id: str, day: int
+    ) -> Optional[Tuple[Dict[str, int], List[UsageRow]]]:
+        '''读取某日的完整数据'''
+        with self.lock:
+            conn = self._connect()
+            ids = self._lookup(bot_id, bot_self_id)
+            if ids is None:
+                return None
+            row = conn.execute(
+                'SELECT receive, send, command, image FROM daily '
+                'WHERE bot=? AND self=? AND day=?',
+                (*ids, day),
+            ).fetchone()
+            if row is None:
+                return None
+            usage = conn.execute(
+                'SELECT kind, t.name, k.name, count FROM usage '
+                'JOIN names t ON t.id=target JOIN names k ON k.id=keyword '
+                'WHERE bot=? AND self=? AND day=?',
+                (*ids, day),
+            ).fetchall()
+        return dict(zip(COUNTERS, row)), usage
+
+    def summary(
+        self, bot_id: str, bot_self_id: str, start: int, end: int
+    ) -> Dict[int, Dict[str, int]]:
+        '''
+        统计`[start, end]`内每日的计数器与活跃群/用户数
+
+        返回`{day: {'receive', 'send', 'command', 'image', 'group', 'user'}}`
+        '''
+        result: Dict[int, Dict[str, int]] = {}
+        with self.lock:
+            conn = self._connect()
+            ids = self._lookup(bot_id, bot_self_id)
+            if ids is None:
+                return result
+            for day, *counters in conn.execute(
+                'SELECT day, receive, send, command, image FROM daily '
+                'WHERE bot=? AND self=? AND day BETWEEN ? AND ?',
+                (*ids, start, end),
+            ):
+                result[day] = {
+                    **dict(zip(COUNTERS, counters)),
+                    'group': 0,
+                    'user': 0,
+                }
+            for day, kind, count in conn.execute(
+                'SELECT day, kind, COUNT(DISTINCT target) FROM usage '
+                'WHERE bot=? AND self=? AND day BETWEEN ? AND ? '
+                'GROUP BY day, kind',
+                (*ids, start, end),
+            ):
+                if day in result:
+                    key = 'group' if kind == KIND_GROUP else 'user'
+                    result[day][key] = count
+        return result
+
+    def user_bitmaps(
+        self,
+        bot_id: str,
+        bot_self_id: str,
+        days: List[int],
+        persist: bool = True,
+    ) -> Dict[int, int]:
+        '''
+        获取每日有调用记录的用户位图, 第n位为1表示编号为n的用户当日活跃
+
+        `persist`为True时, 新计算的位图会保存下来供之后直接读取,
+        仅应对已经结束的日期开启
+        '''
+        result: Dict[int, int] = {}
+        with self.lock:
+            conn = self._connect()
+            ids = self._lookup(bot_id, bot_self_id)
+            if ids is None:
+                return result
+            for day in days:
+                row = conn.execute(
+                    'SELECT bitmap FROM user_bitmap '
+                    'WHERE bot=? AND self=? AND day=?',
+                    (*ids, day),
+                ).fetchone()
+                if row is not None:
+                    result[day] = int.from_bytes(row[0], 'little')
+                    continue
+
+                targets = [
+                    i[0]
+                    for i in conn.execute(
+                        'SELECT DISTINCT target FROM usage '
+                        'WHERE bot=? AND self=? AND day=? AND kind=?',
+                        (*ids, day, KIND_USER),
+                    )
+                ]
+                buf = bytearray(max(targets, default=0) // 8 + 1)
+                for target in targets:
+                    buf[target >> 3] |= 1 << (target & 7)
+                result[day] = int.from_bytes(buf, 'little')
+
+                if persist:
+                    with conn:
+                        conn.execute(
+                            'INSERT OR REPLACE INTO user_bitmap '
+                            'VALUES (?, ?, ?, ?)',
+                            (day, *ids, bytes(buf)),
+                        )
+        return result
+
+    def bots(self) -> Dict[str, List[str]]:
+        result: Dict[str, List[str]] = {}
+        with self.lock:
+            conn = self._connect()
+            rows: List[Any] = conn.execute(
+                'SELECT DISTINCT b.name, s.name FROM daily '
+                'JOIN names b ON b.id=bot JOIN names s ON s.id=self'
+            ).fetchall()
+        for bot_id, bot_self_id in rows:
+            result.setdefault(bot_id, []).append(bot_self_id)
+        return result
@@ -1,5 +1,7 @@
 import asyncio
 from io import BytesIO
+from contextlib import AsyncExitStack
+from typing import Any, List, Optional
 
 import aioboto3
 import aioboto3.session
@@ -7,7 +9,7 @@ import aioboto3.session
 from gsuid_core.logger import logger
 from gsuid_core.utils.plugins_config.gs_config import pic_upload_config
 
-from .utils import is_auto_delete
+from .utils import delete_queue, is_auto_delete
 
 SERVER = pic_upload_config.get_config('PicUploadServer').data
 END_POINT = pic_upload_config.get_config('s3_endpoint').data
@@ -16,6 +18,11 @@ SECRET_KEY = pic_upload_config.get_config('s3_secret_key').data
 REGION = pic_upload_config.get_config('s3_region').data
 DEFAULT_BUCKET = pic_upload_config.get_config('s3_bucket').data
 
+# 超过该大小的图片使用分片并发上传
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+# 分片大小, S3要求除最后一片外不小于5MB
+PART_SIZE = 5 * 1024 * 1024
+
 
 class S3:
     def __init__(self, bucket_id: str = DEFAULT_BUCKET):
@@ -25,34 +32,109 @@ class S3:
             aws_access_key_id=ACCESS_KEY,
             aws_secret_access_key=SECRET_KEY,
         )
+        self.stack: Optional[AsyncExitStack] = None
+        self.client: Any = None
+        self.lock: Optional[asyncio.Lock] = None
+
+    async def get_client(self):
+        '''获取常驻的S3客户端, 首次使用时创建, Core关闭时释放'''
+        if self.client is not None:
+            return self.client
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+
+        async with self.lock:
+            if self.client is None:
+                # 延迟导入, 避免与server产生循环引用
+                from gsuid_core.server import on_core_shutdown
+
+                self.stack = AsyncExitStack()
+                self.client = await self.stack.enter_async_context(
+                    self.session.client(
+                        's3',
+                        endpoint_url=END_POINT,
+                        config=aioboto3.session.AioConfig(
+                            signature_version='s3v4'
+                        ),
+                    )
+                )
+                on_core_shutdown(self.close)
+        return self.client
+
+    async def close(self):
+        if self.stack is not None:
+            await self.stack.aclose()
+        self.stack = None
+        self.client = None
+
+    async def _multipart_upload(self, s3, key: str, body: bytes):
+        upload = await s3.create_multipart_upload(
+            Bucket=self.bucket_id,
+            Key=key,
+        )
+        upload_id = upload['UploadId']
+
+        async def upload_part(number: int, start: int):
+            resp = await s3.upload_part(
+                Bucket=self.bucket_id,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=number,
+                Body=body[start : start + PART_SIZE],  # noqa: E203
+            )
+            return {'PartNumber': number, 'ETag': resp['ETag']}
+
+        try:
+            parts: List[dict] = await asyncio.gather(
+                *[
+                    upload_part(number, start)
+                    for number, start in enumerate(
+                        range(0, len(body), PART_SIZE), 1
+                    )
+                ]
+            )
+        except Exception:
+            await s3.abort_multipart_upload(
+                Bucket=self.bucket_id,
+                Key=key,
+                UploadId=upload_id,
+            )
+            raise
+
+        return await s3.complete_multipart_upload(
+            Bucket=self.bucket_id,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts},
+        )
 
     async def upload(self, file_name: str, files: BytesIO):
         key = f'{file_name}'
-        async with self.session.client(
-            's3',
-            endpoint_url=END_POINT,
-            config=aioboto3.session.AioConfig(signature_version='s3v4'),
-        ) as s3:  # type: ignore
-            logger.info('[S3 / upload] 开始上传...')
+        s3 = await self.get_client()
+        logger.info('[S3 / upload] 开始上传...')
 
+        body = files.getvalue()
+        if len(body) > MULTIPART_THRESHOLD:
+            data = await self._multipart_upload(s3, key, body)
+        else:
             data = await s3.put_object(
                 Bucket=self.bucket_id,
                 Key=key,
-                Body=files,
+                Body=body,
             )
 
-            url = await s3.generate_presigned_url(
-                ClientMethod='get_object',
-                Params={
-                    'Bucket': self.bucket_id,
-                    'Key': key,
-                },
-            )
+        url = await s3.generate_presigned_url(
+            ClientMethod='get_object',
+            Params={
+                'Bucket': self.bucket_id,
+                'Key': key,
+            },
+        )
 
-            logger.debug(data)
-            logger.info('[S3 / upload] 上传成功！')
-            if is_auto_delete:
-                await asyncio.create_task(self.delete(key))
+        logger.debug(data)
+        logger.info('[S3 / upload] 上传成功！')
+        if is_auto_delete:
+            delete_queue.put(self.delete, key)
 
         path = f'{END_POINT}/{self.bucket_id}/{key}'
         logger.debug(f'[S3 / upload] PATH: {path}')
@@ -61,12 +143,8 @@ class S3:
         return url
 
     async def delete(self, file_key: str):
-        await asyncio.sleep(30)
-        async with self.session.client(
-            's3',
-            endpoint_url=END_POINT,
-        ) as s3:  # type: ignore
-            logger.info('[S3 / delete] 开始删除...')
-            data = await s3.delete_object(Bucket=self.bucket_id, Key=file_key)
-            logger.debug(data)
-            logger.info('[S3 / delete] 删除成功！')
+        s3 = await self.get_client()
+        logger.info('[S3 / delete] 开始删除...')
+        data = await s3.delete_object(Bucket=self.bucket_id, Key=file_key)
+        logger.debug(data)
+        logger.info('[S3 / delete] 删除成功！')
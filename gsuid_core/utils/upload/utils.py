@@ -1,3 +1,94 @@
+import time
+import uuid
+import asyncio
+import hashlib
+from io import BytesIO
+from collections import OrderedDict
+from typing import Any, Dict, Tuple, Callable, Optional, Awaitable
+
+from gsuid_core.logger import logger
 from gsuid_core.utils.plugins_config.gs_config import pic_upload_config
 
 is_auto_delete: bool = pic_upload_config.get_config('AutoDelete').data
+
+# 上传后自动删除前的等待时间(秒)
+AUTO_DELETE_DELAY = 30
+# 相同图片复用已上传链接的时间(秒), 开启自动删除时需早于删除时间
+URL_CACHE_TTL = AUTO_DELETE_DELAY // 2 if is_auto_delete else 1800
+# 最多记录的已上传图片数
+URL_CACHE_SIZE = 2048
+
+
+class DeleteQueue:
+    '''
+    自动删除队列
+
+    所有待删除的图片由同一个后台任务按加入顺序在到期后依次删除
+    '''
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def put(self, func: Callable[..., Awaitable[Any]], *args):
+        if self.queue is None:
+            self.queue = asyncio.Queue()
+        self.queue.put_nowait((time.monotonic() + self.delay, func, args))
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._worker(self.queue))
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            due, func, args = await queue.get()
+            await asyncio.sleep(max(due - time.monotonic(), 0))
+            try:
+                await func(*args)
+            except Exception as e:
+                logger.warning(f'[GsCore][图片上传] 自动删除失败: {e}')
+
+
+delete_queue = DeleteQueue(AUTO_DELETE_DELAY)
+
+# 图片哈希: (过期时间, 链接)
+_url_cache: 'OrderedDict[str, Tuple[float, str]]' = OrderedDict()
+_pending: Dict[str, 'asyncio.Task[Optional[str]]'] = {}
+
+
+async def _upload(client: Any, digest: str, data: bytes) -> Optional[str]:
+    # 自动删除时同一图片的多次上传不能共用文件名, 否则会被先前的删除任务误删
+    name = f'{digest}_{uuid.uuid4().hex[:8]}' if is_auto_delete else digest
+    url = await client.upload(f'{name}.jpg', BytesIO(data))
+    if url:
+        _url_cache[digest] = (time.monotonic() + URL_CACHE_TTL, url)
+        while len(_url_cache) > URL_CACHE_SIZE:
+            _url_cache.popitem(last=False)
+    return url
+
+
+async def upload_image(client: Any, data: bytes) -> Optional[str]:
+    '''
+    :说明:
+      上传图片并返回链接, 以内容哈希命名,
+      相同图片在`URL_CACHE_TTL`内只上传一次, 并发上传同一图片时共享结果。
+    :参数:
+      * client: 图床客户端, 需实现`upload(file_name, files)`。
+      * data (bytes): 图片数据。
+    :返回:
+      * url: 图片链接, 上传失败时为None。
+    '''
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    item = _url_cache.get(digest)
+    if item is not None:
+        if item[0] > time.monotonic():
+            _url_cache.move_to_end(digest)
+            return item[1]
+        del _url_cache[digest]
+
+    task = _pending.get(digest)
+    if task is None:
+        task = _pending[digest] = asyncio.create_task(
+            _upload(client, digest, data)
+        )
+        task.add_done_callback(lambda _: _pending.pop(digest, None))
+    return await asyncio.shield(task)
@@ -1,20 +1,18 @@
+import re
 import asyncio
-from io import BytesIO
 from pathlib import Path
 from typing import Dict, List
 from contextlib import asynccontextmanager
 
-from PIL import Image
+from fastapi import FastAPI
 from bs4 import Tag, BeautifulSoup
 from starlette.requests import Request
 from fastapi.staticfiles import StaticFiles
-from fastapi import FastAPI, BackgroundTasks
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, FileResponse, StreamingResponse
 
 from gsuid_core.sv import SL
 from gsuid_core.gss import gss
 import gsuid_core.global_val as gv
-from gsuid_core.data_store import image_res
 from gsuid_core.webconsole.mount_app import site
 from gsuid_core.segment import Message, MessageSegment
 from gsuid_core.config import CONFIG_DEFAULT, core_config
@@ -23,10 +21,8 @@ from gsuid_core.aps import start_scheduler, shutdown_scheduler
 from gsuid_core.server import core_start_def, core_shutdown_def
 from gsuid_core.utils.database.models import CoreUser, CoreGroup
 from gsuid_core.utils.plugins_config.models import GsListStrConfig
-from gsuid_core.utils.plugins_config.gs_config import (
-    all_config_list,
-    core_plugins_config,
-)
+from gsuid_core.utils.plugins_config.gs_config import all_config_list
+from gsuid_core.utils.image.pic_store import pic_store, guess_media_type
 from gsuid_core.utils.plugins_update._plugins import (
     check_status,
     check_plugins,
@@ -36,9 +32,6 @@ from gsuid_core.utils.plugins_update._plugins import (
     get_plugins_list,
 )
 
-is_clean_pic = core_plugins_config.get_config('EnableCleanPicSrv').data
-pic_expire_time = core_plugins_config.get_config('ScheduledCleanPicSrv').data
-
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -188,7 +181,7 @@ async def _get_data_analysis(
         command_data = []
         image_gen_data = []
 
-        seven_data = await gv.get_value_analysis(bot_id, bot_self_id)
+        seven_data = await gv.get_daily_summary(bot_id, bot_self_id)
         for day in seven_data:
             xaxis.append(day)
             local_val = seven_data[day]
@@ -252,12 +245,12 @@ async def _get_usergroup_analysis(
         group_data = []
         user_data = []
 
-        seven_data = await gv.get_value_analysis(bot_id, bot_self_id)
+        seven_data = await gv.get_daily_summary(bot_id, bot_self_id)
         for day in seven_data:
             xaxis.append(day)
             local_val = seven_data[day]
-            group_data.append(len(local_val['group']))
-            user_data.append(len(local_val['user']))
+            group_data.append(local_val['group'])
+            user_data.append(local_val['user'])
 
         series.append({'name': '用户', 'type': 'bar', 'data': user_data})
         series.append(
@@ -393,11 +386,6 @@ async def _batch_push(request: Request, data: Dict):
     return {'status': 0, 'msg': '推送成功！', 'data': '推送成功！'}
 
 
-async def delete_image(image_path: Path):
-    await asyncio.sleep(int(pic_expire_time))
-    image_path.unlink()
-
-
 app.mount(
     "/webstatic",
     StaticFiles(directory=Path(__file__).parent / 'webstatic'),
@@ -407,16 +395,47 @@ app.mount(
 
 @app.head('/genshinuid/image/{image_id}.jpg')
 @app.get('/genshinuid/image/{image_id}.jpg')
-async def get_image(image_id: str, background_tasks: BackgroundTasks):
-    path = image_res / f'{image_id}.jpg'
-    image = Image.open(path).convert('RGB')
-    image_bytes = BytesIO()
-    image.save(image_bytes, format='JPEG')
-    image_bytes.seek(0)
-    response = StreamingResponse(image_bytes, media_type='image/png')
-    if is_clean_pic:
-        asyncio.create_task(delete_image(path))
-    return response
+async def get_image(image_id: str, request: Request):
+    path = pic_store.get(image_id)
+    if path is None:
+        return Response(status_code=404)
+
+    # 图片以内容哈希命名, 同一ID的内容不会改变
+    headers = {
+        'ETag': f'"{image_id}"',
+        'Cache-Control': f'public, max-age={pic_store.expire_time}, immutable',
+        'Accept-Ranges': 'bytes',
+    }
+    if request.headers.get('if-none-match') == headers['ETag']:
+        return Response(status_code=304, headers=headers)
+
+    with open(path, 'rb') as f:
+        media_type = guess_media_type(f.read(12))
+        size = f.seek(0, 2)
+        match = re.fullmatch(
+            r'bytes=(\d*)-(\d*)', request.headers.get('range', '')
+        )
+        if match and any(match.groups()):
+            start, end = match.groups()
+            if not start:
+                start, end = max(size - int(end), 0), size - 1
+            else:
+                start, end = int(start), min(int(end or size - 1), size - 1)
+            if start > end:
+                headers['Content-Range'] = f'bytes */{size}'
+                return Response(status_code=416, headers=headers)
+
+            f.seek(start)
+            headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+            return Response(
+                f.read(end - start + 1),
+                status_code=206,
+                headers=headers,
+                media_type=media_type,
+            )
+
+    # 由服务器支持时以零拷贝方式发送文件
+    return FileResponse(path, headers=headers, media_type=media_type)
 
 
 @app.get("/corelogs")